@@ -0,0 +1,60 @@
+"""
+Cold-start cost of importing pystyx, measured with `python -X importtime`
+in a fresh interpreter per target (best of --repeat runs).
+
+    python benchmarks/importtime.py [--repeat 5] [--top 10]
+"""
+import argparse
+import subprocess
+import sys
+
+TARGETS = ["pystyx", "pystyx.mapper", "pystyx.loader"]
+
+
+def import_times(target):
+    """
+    {module: cumulative microseconds} for a single fresh import of `target`
+    """
+    statement = f"import {target}" if target else "pass"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        (_self, cumulative, name) = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    # Imported by the interpreter itself, before the target
+    startup = set(import_times(None))
+    for target in TARGETS:
+        runs = [import_times(target) for _ in range(args.repeat)]
+        best = min(runs, key=lambda times: times[target])
+        print(f"{target}: {best[target] / 1000:.1f} ms")
+        slowest = sorted(
+            (
+                item
+                for item in best.items()
+                if item[0] != target and item[0] not in startup
+            ),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        for name, cumulative in slowest[: args.top]:
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
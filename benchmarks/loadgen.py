@@ -0,0 +1,83 @@
+"""
+Load generator for `python -m pystyx serve`: N connections, each sending requests
+with a bounded number in flight, then latency percentiles and throughput.
+
+    python benchmarks/loadgen.py --socket /tmp/styx.sock --from-type erp_order \
+        --record order.json [--connections 16] [--requests 10000] [--in-flight 8]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+
+async def connection(args, payload, counter, latencies, errors):
+    if args.socket:
+        (reader, writer) = await asyncio.open_unix_connection(args.socket)
+    else:
+        (reader, writer) = await asyncio.open_connection(args.host, args.port)
+    sent = {}
+
+    async def receive():
+        while sent:
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent.pop(response["id"]))
+            if "error" in response:
+                errors.append(response["error"])
+
+    while True:
+        batch = list(itertools.islice(counter, args.in_flight))
+        if not batch:
+            break
+        for request_id in batch:
+            sent[request_id] = time.perf_counter()
+            writer.write(payload(request_id))
+        await writer.drain()
+        await receive()
+    writer.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def main(args):
+    with open(args.record, encoding="utf-8") as infile:
+        record = json.load(infile)
+
+    def payload(request_id):
+        request = {"id": request_id, "from_type": args.from_type, "record": record}
+        return json.dumps(request).encode("utf-8") + b"\n"
+
+    counter = iter(range(args.requests))
+    (latencies, errors) = ([], [])
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            connection(args, payload, counter, latencies, errors)
+            for _ in range(args.connections)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"requests:   {len(latencies)} ({len(errors)} errors)")
+    print(f"throughput: {len(latencies) / elapsed:,.0f} records/s")
+    print(f"p50:        {percentile(latencies, 0.50) * 1000:.2f} ms")
+    print(f"p99:        {percentile(latencies, 0.99) * 1000:.2f} ms")
+    if errors:
+        print(f"first error: {errors[0]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--socket", help="Unix domain socket path (instead of TCP).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--from-type", required=True)
+    parser.add_argument("--record", required=True, help="JSON file with one record.")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--in-flight", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
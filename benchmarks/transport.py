@@ -0,0 +1,59 @@
+"""
+MapperPool throughput with the pickle and shared_memory transports, on a generated
+flat definition (in a temporary maps directory).
+
+    python benchmarks/transport.py [--fields 20] [--records 20000] [--batch 1000]
+"""
+import argparse
+import copy
+import os
+import tempfile
+import time
+from concurrent.futures import wait
+
+from pystyx.parallel import TRANSPORTS, MapperPool
+
+
+def write_definition(directory, fields):
+    os.mkdir(os.path.join(directory, "maps"))
+    lines = ['from_type = "record"', 'to_type = "Record"']
+    for i in range(fields):
+        lines += [f"[fields.field_{i}]", f'input_paths = ["source.value_{i}"]']
+    with open(os.path.join(directory, "maps", "record.styx"), "w") as outfile:
+        outfile.write("\n".join(lines))
+    with open(os.path.join(directory, "functions.styx"), "w") as outfile:
+        outfile.write('functions = ["parse_json", "to_camel_case", "parse_bool"]')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fields", type=int, default=20)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    values = {
+        f"value_{i}": f"value number {i}" if i % 2 else i for i in range(args.fields)
+    }
+    record = {"source": values}
+    # Distinct objects: pickle would only write a repeated record once
+    batches = [
+        [copy.deepcopy(record) for _ in range(min(args.batch, args.records - start))]
+        for start in range(0, args.records, args.batch)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        write_definition(directory, args.fields)
+        os.chdir(directory)
+        for transport in TRANSPORTS:
+            with MapperPool(processes=args.processes, transport=transport) as pool:
+                # Warm up: start the workers and load the maps
+                wait([pool.submit("record", [record]) for _ in range(args.processes)])
+                start = time.perf_counter()
+                wait([pool.submit("record", batch) for batch in batches])
+                elapsed = time.perf_counter() - start
+            print(f"{transport:>13}: {args.records / elapsed:,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
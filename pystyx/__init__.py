@@ -1,36 +1,45 @@
-import os
-from pathlib import Path
-from typing import Dict, Generator
+"""
+Everything is imported on first use, so `import pystyx` stays cheap for
+short-lived processes. `pystyx.create_maps` pulls in TOML parsing, mapping
+records only needs `pystyx.mapper`.
+"""
+import importlib
 
-import toml
-from munch import munchify
+__all__ = [
+    "create_maps",
+    "DefinitionLoadError",
+    "FunctionRegistry",
+    "get_lookup",
+    "MapSets",
+    "Metrics",
+    "pipeline",
+    "Router",
+    "styx_function",
+]
 
-from .functions import TomlFunction, styx_function
-from .mapper import Mapper
+_exports = {
+    "create_maps": "loader",
+    "DefinitionLoadError": "errors",
+    "FunctionRegistry": "functions",
+    "get_lookup": "lookups",
+    "Mapper": "mapper",
+    "MapSets": "mapsets",
+    "Metrics": "metrics",
+    "pipeline": "pipelines",
+    "Router": "routing",
+    "styx_function": "functions",
+    "TomlFunction": "functions",
+}
 
-__all__ = ["create_maps", "styx_function"]
 
+def __getattr__(name):
+    module_name = _exports.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
 
-def empty_functions():
-    return munchify({"functions": []})
 
-
-def create_maps(
-    maps_location="maps", functions_location="functions.styx"
-) -> Dict[str, Mapper]:
-    cwd = Path(os.getcwd())
-    styx_files: Generator[Path] = cwd.glob(f"{maps_location}/*.styx")
-    functions_file: Path = cwd / functions_location
-    functions_toml = (
-        munchify(toml.load(functions_file))
-        if functions_file.exists()
-        else empty_functions()
-    )
-    functions = TomlFunction.parse_functions(functions_toml)
-    map_objects = (munchify(toml.load(path)) for path in styx_files)
-    mappers = (Mapper(map_, functions) for map_ in map_objects)
-    maps = {mapper.from_type: mapper for mapper in mappers}
-    # Mutation. Add "definitions" to Mappers
-    for map_ in maps.values():
-        map_.update_definitions(maps)
-    return maps
+def __dir__():
+    return sorted([*globals(), *_exports])
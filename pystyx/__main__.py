@@ -1,10 +1,11 @@
+import argparse
 import json
 import os
 from pathlib import Path
 from typing import Dict
 
+from .loader import create_maps
 from .mapper import Mapper
-from . import create_maps
 
 
 def main():
@@ -23,5 +24,68 @@ def main():
     print(mapped_object)
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pystyx")
+    commands = parser.add_subparsers(dest="command")
+
+    serve = commands.add_parser("serve", help="Run a local NDJSON mapping server.")
+    serve.add_argument("--maps", default="maps", help="Directory of .styx files.")
+    serve.add_argument("--functions", default="functions.styx")
+    serve.add_argument(
+        "--module",
+        action="append",
+        default=[],
+        dest="modules",
+        help="Module registering @styx_function functions (repeatable).",
+    )
+    serve.add_argument("--socket", help="Unix domain socket path (instead of TCP).")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Worker processes (default: one per CPU, 0 maps in the server).",
+    )
+    serve.add_argument(
+        "--window-ms",
+        type=float,
+        default=2.0,
+        help="How long a request waits for others to batch with.",
+    )
+    serve.add_argument("--max-batch", type=int, default=256)
+    serve.add_argument(
+        "--max-line-mb",
+        type=float,
+        default=16.0,
+        help="Longest request line accepted, in MiB.",
+    )
+    serve.add_argument(
+        "--transport",
+        choices=["pickle", "shared_memory"],
+        default="pickle",
+        help="How batches reach the worker processes.",
+    )
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.command == "serve":
+        from .server import serve
+
+        serve(
+            args.maps,
+            args.functions,
+            socket_path=args.socket,
+            host=args.host,
+            port=args.port,
+            processes=args.processes,
+            modules=args.modules,
+            window=args.window_ms / 1000,
+            max_batch=args.max_batch,
+            transport=args.transport,
+            line_limit=int(args.max_line_mb * 1024 * 1024),
+        )
+    else:
+        main()
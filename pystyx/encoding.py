@@ -0,0 +1,175 @@
+"""
+NDJSON output for mapped records.
+
+For flat object definitions (every field lands on a top-level key), the encoder
+writes each record straight to JSON text from the field values: the output keys
+are escaped once, from the definition's output schema, and no output dict is built
+only to be walked again by `json.dumps`. Other definitions are mapped as usual and
+the result is serialized, with the same output.
+
+    with open("orders.ndjson", "wb") as out:
+        encoder = NDJSONEncoder(maps["erp_order"], out)
+        encoder.write_many(orders)
+"""
+import json
+from json.encoder import encode_basestring, encode_basestring_ascii
+from typing import BinaryIO, List, Optional, Tuple
+
+from .mapper import Mapper
+
+
+def direct_blocker(mapper: Mapper) -> Optional[str]:
+    """
+    Why records of `mapper` can't be encoded straight from the field values, or
+    None if they can.
+    """
+    definition = mapper.definition
+    if definition.__type__ != "object":
+        return f"{mapper.from_type} doesn't output an object"
+    if definition.get("postprocess"):
+        return f"{mapper.from_type} has postprocess steps"
+    keys = set()
+    for (field_name, parent_keys, key) in definition.output_schema:
+        if parent_keys != ():
+            return f"{mapper.from_type}.{field_name} isn't a top-level key"
+        if key in keys:
+            return f"{mapper.from_type} sets {key!r} more than once"
+        keys.add(key)
+    if definition.include_type and "__type__" in keys:
+        return f"{mapper.from_type} sets '__type__' more than once"
+    return None
+
+
+class NDJSONEncoder:
+    """
+    Map records with `mapper` and encode them as newline-delimited JSON bytes.
+
+    `out` is a binary file for `write`/`write_many`; `encode` works without one.
+    `many` definitions produce one line per mapped record, and records rejected by
+    the definition's filter none.
+    """
+
+    mapper: Mapper
+    out: Optional[BinaryIO]
+    direct: bool
+    blocker: Optional[str]
+    fragments: List[Tuple[str, dict, str]]
+
+    def __init__(self, mapper, out=None, ensure_ascii=True, default=None):
+        self.mapper = mapper
+        self.out = out
+        self.encoder = json.JSONEncoder(
+            ensure_ascii=ensure_ascii, separators=(",", ":"), default=default
+        )
+        self.encode_string = (
+            encode_basestring_ascii if ensure_ascii else encode_basestring
+        )
+        self.blocker = direct_blocker(mapper)
+        self.direct = self.blocker is None
+        if self.direct:
+            definition = mapper.definition
+            self.head = (
+                [f'"__type__":{self.encoder.encode(definition.to_type)}']
+                if definition.include_type
+                else []
+            )
+            # (field_name, field_definition, escaped key)
+            self.fragments = [
+                (field_name, definition.fields[field_name], self.encode_string(key))
+                for (field_name, _parent_keys, key) in definition.output_schema
+            ]
+
+    def __call__(self, from_obj):
+        self.write(from_obj)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def encode(self, from_obj) -> bytes:
+        """
+        The NDJSON lines for a single input object.
+        """
+        mapper = self.mapper
+        if (
+            not self.direct
+            or mapper.metrics is not None
+            or mapper.fieldsMapper.tracer is not None
+        ):
+            return self.encode_mapped(mapper(from_obj))
+
+        record = mapper.preprocessMapper(from_obj)
+        filter_mapper = mapper.filterMapper
+        if mapper.definition.fields["many"]:
+            if filter_mapper.predicates:
+                record = filter_mapper(record, lazy=True)
+            text = "".join(self.encode_fields(element) for element in record)
+        elif filter_mapper.predicates and not filter_mapper.accepts(record):
+            return b""
+        else:
+            text = self.encode_fields(record)
+        return text.encode("utf-8")
+
+    def encode_mapped(self, to_obj) -> bytes:
+        """
+        Encode already mapped output (a record, a row, or a list of them for `many`
+        definitions). Records rejected by a filter (None) write nothing.
+        """
+        if to_obj is None:
+            return b""
+        to_objs = to_obj if self.mapper.definition.fields["many"] else [to_obj]
+        return "".join(
+            f"{self.encoder.encode(self.jsonable(to_obj))}\n" for to_obj in to_objs
+        ).encode("utf-8")
+
+    def jsonable(self, to_obj):
+        if hasattr(to_obj, "_asdict"):
+            # Rows: keyed by field name, like the object output
+            return to_obj._asdict()
+        return to_obj
+
+    def encode_fields(self, from_obj) -> str:
+        fields_mapper = self.mapper.fieldsMapper
+        plan = fields_mapper.definition.get("path_plan")
+        resolved = fields_mapper.resolve_paths(from_obj, plan) if plan else None
+        encode_value = self.encode_value
+        parts = list(self.head)
+        for (field_name, field_definition, fragment) in self.fragments:
+            (value, skip) = fields_mapper.get_field_value(
+                field_name, from_obj, field_definition, resolved
+            )
+            if not skip:
+                parts.append(f"{fragment}:{encode_value(value)}")
+        return "{" + ",".join(parts) + "}\n"
+
+    def encode_value(self, value) -> str:
+        value_type = type(value)
+        if value_type is str:
+            return self.encode_string(value)
+        if value_type is int:
+            return int.__repr__(value)
+        if value is None:
+            return "null"
+        if value is True:
+            return "true"
+        if value is False:
+            return "false"
+        return self.encoder.encode(value)
+
+    def write(self, from_obj):
+        self.out.write(self.encode(from_obj))
+
+    def write_many(self, from_objs, errors=None, max_errors=None):
+        """
+        Encode and write each of `from_objs`. `errors` and `max_errors` work as in
+        `Mapper.batch`: failed records are reported and write nothing.
+        """
+        batch = self.mapper.batch_each(from_objs, self.encode, errors, max_errors)
+        for (_index, lines) in batch:
+            self.out.write(lines)
+
+    def close(self):
+        if self.out is not None:
+            self.out.flush()
@@ -0,0 +1,85 @@
+"""
+Structured errors for batch runs.
+
+When a field or processor throws, the exception is annotated with where it happened
+(`styx_context`) so a failed record can be reported without re-running the batch.
+"""
+from typing import Any, Dict, List, Optional
+
+
+def annotate_exception(exc: Exception, **context) -> Exception:
+    """
+    The innermost annotation wins, so errors from nested from_types keep their own context.
+    """
+    if getattr(exc, "styx_context", None) is None:
+        try:
+            exc.styx_context = context
+        except AttributeError:
+            pass
+    return exc
+
+
+class RecordError:
+    """
+    A record that failed to map in a batch.
+    """
+
+    index: int
+    record: Any
+    from_type: Optional[str]
+    field_name: Optional[str]
+    processor_key: Optional[str]
+    input_paths: Optional[List[str]]
+    exception: Exception
+
+    def __init__(self, index, record, from_type, exception):
+        context: Dict[str, Any] = getattr(exception, "styx_context", None) or {}
+        self.index = index
+        self.record = record
+        self.from_type = context.get("from_type", from_type)
+        self.field_name = context.get("field_name")
+        self.processor_key = context.get("processor_key")
+        self.input_paths = context.get("input_paths")
+        self.exception = exception
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "from_type": self.from_type,
+            "field_name": self.field_name,
+            "processor_key": self.processor_key,
+            "input_paths": self.input_paths,
+            "error": f"{type(self.exception).__name__}: {self.exception}",
+        }
+
+    def __repr__(self):
+        location = self.field_name or self.processor_key or "?"
+        return f"<RecordError #{self.index} {self.from_type}.{location}: {self.exception!r}>"
+
+
+class TooManyErrors(RuntimeError):
+    """
+    Raised by `Mapper.batch` once more than `max_errors` records failed.
+    """
+
+    errors: List[RecordError]
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(
+            f"Aborting batch after {len(errors)} failed records. Last error: {errors[-1]!r}"
+        )
+
+
+class DefinitionLoadError(TypeError):
+    """
+    A Styx definition file that could not be read or parsed.
+    """
+
+    path: str
+    exception: Exception
+
+    def __init__(self, path, exception):
+        self.path = str(path)
+        self.exception = exception
+        super().__init__(f"{self.path}: {exception}")
@@ -1,7 +1,9 @@
+import inspect
 import json
-from typing import Callable, Dict
+import threading
+import weakref
+from typing import Callable, Dict, Optional, Tuple
 
-from munch import munchify
 
 # Adapted from this response in Stackoverflow
 # http://stackoverflow.com/a/19053800/1072990
@@ -12,13 +14,200 @@ def _to_camel_case(snake_str):
     return components[0] + "".join(x.capitalize() if x else "_" for x in components[1:])
 
 
-class TomlFunction:
-    _functions: Dict[str, Callable] = {}
+class FunctionMetadata:
+    """
+    What the runtime may assume about a registered function:
 
-    @staticmethod
-    def _parse_functions(functions_toml):
+    - pure: same output for the same input, no side effects (safe to cache or fold)
+    - vectorized: takes one list per input path and returns a list of results,
+      so `many` processors call it once per batch instead of once per record
+    - asynchronous: a coroutine function, run to completion by the mapper
+    - arity: (min, max) number of arguments, max None for *args
+    - cost: relative cost hint (1 is cheap)
+    """
+
+    name: str
+    function: Callable
+    pure: bool
+    vectorized: bool
+    asynchronous: bool
+    arity: Optional[Tuple[int, Optional[int]]]
+    cost: float
+
+    def __init__(
+        self,
+        name,
+        function,
+        pure=False,
+        vectorized=False,
+        asynchronous=False,
+        arity=None,
+        cost=1,
+    ):
+        self.name = name
+        self.function = function
+        self.pure = pure
+        self.vectorized = vectorized
+        self.asynchronous = asynchronous
+        self.arity = arity
+        self.cost = cost
+
+    @classmethod
+    def from_function(cls, name, function, **kwargs):
+        target = function.function if isinstance(function, styx_function) else function
+        if kwargs.get("asynchronous") is None:
+            kwargs["asynchronous"] = inspect.iscoroutinefunction(target)
+        arity = kwargs.pop("arity", None)
+        if isinstance(arity, int):
+            arity = (arity, arity)
+        return cls(name, function, arity=arity or signature_arity(target), **kwargs)
+
+    def accepts(self, argument_count):
+        if self.arity is None:
+            return True
+        (minimum, maximum) = self.arity
+        return minimum <= argument_count and (
+            maximum is None or argument_count <= maximum
+        )
+
+    def describe_arity(self):
+        (minimum, maximum) = self.arity
+        if maximum is None:
+            return f"at least {minimum}"
+        if minimum == maximum:
+            return str(minimum)
+        return f"{minimum} to {maximum}"
+
+
+def signature_arity(function):
+    try:
+        parameters = inspect.signature(function).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    positional = (
+        inspect.Parameter.POSITIONAL_ONLY,
+        inspect.Parameter.POSITIONAL_OR_KEYWORD,
+    )
+    minimum, maximum = 0, 0
+    for parameter in parameters:
+        if parameter.kind == inspect.Parameter.VAR_POSITIONAL:
+            maximum = None
+        elif parameter.kind in positional:
+            if maximum is not None:
+                maximum += 1
+            if parameter.default is inspect.Parameter.empty:
+                minimum += 1
+    return (minimum, maximum)
+
+
+_event_loops = threading.local()
+
+
+def run_sync(function):
+    """
+    Wrap a coroutine function so mappers can call it like any other function.
+    Each thread reuses one event loop.
+    """
+
+    def run(*args):
+        loop = getattr(_event_loops, "loop", None)
+        if loop is None:
+            import asyncio
+
+            loop = _event_loops.loop = asyncio.new_event_loop()
+            # Closed with its thread (e.g. an executor's), not left to the GC
+            weakref.finalize(threading.current_thread(), loop.close)
+        return loop.run_until_complete(function(*args))
+
+    run.__name__ = getattr(function, "__name__", "run")
+    run.__wrapped__ = function
+    return run
+
+
+def scalarize(function):
+    """
+    Call a vectorized function on a single set of values
+    """
+
+    def call(*values):
+        return function(*[[value] for value in values])[0]
+
+    call.__name__ = getattr(function, "__name__", "call")
+    call.__wrapped__ = function
+    return call
+
+
+class FunctionRegistry:
+    """
+    A set of functions Styx definitions can reference by name.
+
+    The global registry (`default_registry`, filled by @styx_function) is used by
+    default. Pass a registry of your own to `create_maps` / `Mapper` to load map sets
+    with different functions side by side in one process:
+
+        registry = FunctionRegistry()
+
+        @registry.function(pure=True)
+        def to_upper_case(value): ...
+    """
+
+    functions: Dict[str, Callable]
+    _metadata: Dict[str, FunctionMetadata]
+
+    def __init__(self, functions: Optional[Dict[str, Callable]] = None):
+        self.functions = {}
+        self._metadata = {}
+        for name, function in (functions or {}).items():
+            self.register(function, name=name)
+
+    def __contains__(self, function_name):
+        return function_name in self.functions
+
+    def __getitem__(self, function_name):
+        return self.functions[function_name]
+
+    def function(self, function: Callable = None, **options):
+        """
+        Decorator registering a function here, with the same options as @styx_function
+        """
+        return styx_function(function, registry=self, **options)
+
+    def register(self, function: Callable, name=None, **options):
+        if isinstance(function, styx_function):
+            function = function.function
+        function_name = name or function.__name__
+        if function_name in self.functions:
+            raise RuntimeError(
+                f"Duplicate name found in toml_functions: {function_name}"
+            )
+        self.functions[function_name] = function
+        self._metadata[function_name] = FunctionMetadata.from_function(
+            function_name, function, **options
+        )
+
+    def metadata(self, function_name) -> FunctionMetadata:
+        """
+        Metadata declared with @styx_function(...), or derived from the function itself
+        """
+        metadata = self._metadata.get(function_name)
+        function = self.functions.get(function_name)
+        if isinstance(function, styx_function):
+            function = function.function
+        if metadata is None or metadata.function is not function:
+            metadata = FunctionMetadata.from_function(function_name, function)
+        return metadata
+
+    def is_pure(self, function_name):
+        """
+        Pure functions (declared with @styx_function(pure=True)) always return the
+        same output for the same input and have no side effects, so their results can
+        be cached.
+        """
+        return function_name in self.functions and self.metadata(function_name).pure
+
+    def _parse_functions(self, functions_toml):
         declared_functions = set(functions_toml.functions)
-        decorated_functions = set(TomlFunction._functions.keys())
+        decorated_functions = set(self.functions.keys())
 
         extra_declared_functions = declared_functions - decorated_functions
         extra_decorated_functions = decorated_functions - declared_functions
@@ -37,47 +226,128 @@ class TomlFunction:
             msg = f"Found extra functions decorated with @toml_function that were not declared in functions.styx!\nFunction names were: {functions}"
             raise TypeError(msg)
 
-        return TomlFunction._functions
+        return self.functions
 
-    @staticmethod
-    def parse_functions(functions_toml):
+    def parse_functions(self, functions_toml):
         if hasattr(functions_toml, "functions"):
             if not isinstance(functions_toml.functions, list):
                 raise TypeError(
                     "functions.styx was malformed. 'functions' key must be a list."
                 )
-            return TomlFunction._parse_functions(functions_toml)
+            return self._parse_functions(functions_toml)
         else:
             raise TypeError("functions.styx was malformed. No 'functions' list found.")
 
 
+class TomlFunction:
+    """
+    The global registry. Kept as class attributes for backwards compatibility;
+    `default_registry` is the FunctionRegistry view of it.
+    """
+
+    _functions: Dict[str, Callable] = {}
+    _metadata: Dict[str, FunctionMetadata] = {}
+
+    @staticmethod
+    def metadata(function_name) -> FunctionMetadata:
+        return default_registry.metadata(function_name)
+
+    @staticmethod
+    def is_pure(function_name):
+        return default_registry.is_pure(function_name)
+
+    @staticmethod
+    def parse_functions(functions_toml):
+        return default_registry.parse_functions(functions_toml)
+
+
+class GlobalFunctionRegistry(FunctionRegistry):
+    """
+    Reads TomlFunction's class attributes on every access, so rebinding them
+    (e.g. in tests) is picked up.
+    """
+
+    def __init__(self):
+        pass
+
+    @property
+    def functions(self):
+        return TomlFunction._functions
+
+    @property
+    def _metadata(self):
+        return TomlFunction._metadata
+
+
+default_registry = GlobalFunctionRegistry()
+
+
 class styx_function:
+    """
+    Register a function for use in Styx definitions:
+
+        @styx_function
+        def to_upper_case(value): ...
+
+        @styx_function(pure=True, cost=5)
+        def to_upper_case(value): ...
+
+    See FunctionMetadata for the available flags. Functions are registered in
+    `default_registry` unless another FunctionRegistry is given as `registry`.
+    """
+
     function: Callable
-    _functions = {}
+    options: dict
+    registry: FunctionRegistry
+
+    def __init__(
+        self,
+        function: Callable = None,
+        *,
+        pure=False,
+        vectorized=False,
+        asynchronous=None,
+        arity=None,
+        cost=1,
+        registry: Optional[FunctionRegistry] = None,
+    ):
+        self.function = None
+        self.registry = registry if registry is not None else default_registry
+        self.options = dict(
+            pure=pure,
+            vectorized=vectorized,
+            asynchronous=asynchronous,
+            arity=arity,
+            cost=cost,
+        )
+        if function is not None:
+            self.register(function)
 
-    def __init__(self, function: Callable):
+    def register(self, function: Callable):
         self.function = function
-        function_name = function.__name__
-        if function_name in TomlFunction._functions:
-            raise RuntimeError(
-                f"Duplicate name found in toml_functions: {function_name}"
-            )
-        TomlFunction._functions[function_name] = function
+        self.registry.register(function, **self.options)
 
     def __call__(self, *args, **kwargs):
+        if self.function is None:
+            # Used with arguments, i.e. @styx_function(pure=True)
+            (function,) = args
+            self.register(function)
+            return self
         return self.function(*args, **kwargs)
 
 
-@styx_function
+@styx_function(pure=True)
 def to_camel_case(snake_str):
     return _to_camel_case(snake_str)
 
 
-@styx_function
+@styx_function(pure=True)
 def parse_json(s):
+    from munch import munchify
+
     return munchify(json.loads(s))
 
 
-@styx_function
+@styx_function(pure=True)
 def parse_bool(s):
     return s.lower() in ("true", "1", "t", "y", "yes")
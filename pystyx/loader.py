@@ -0,0 +1,125 @@
+"""
+Loading Styx definition files into Mappers.
+
+Files are read and their TOML parsed in a pool of `workers` threads (or processes
+with `processes=True`, since TOML parsing is pure Python). Results come back in
+path order, so a broken file is always reported the same way.
+"""
+import os
+from pathlib import Path
+from typing import Dict, List
+
+import toml
+from munch import Munch, munchify
+
+from .errors import DefinitionLoadError
+from .functions import FunctionRegistry, default_registry
+from .lookups import register_lookups
+from .mapper import Mapper
+
+
+def read_styx_file(path: Path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return toml.load(f)
+
+
+def load_definitions(paths, workers=None, processes=False) -> List[Munch]:
+    """
+    Read and parse every file in `paths`. Raises DefinitionLoadError naming the
+    first broken file (in `paths` order).
+    """
+    paths = list(paths)
+    if not workers or workers <= 1:
+        results = [_read(path) for path in paths]
+    else:
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with executor_class(max_workers=workers) as executor:
+            futures = [executor.submit(_read, path) for path in paths]
+            results = [future.result() for future in futures]
+
+    definitions = []
+    for path, (toml_map, exc) in zip(paths, results):
+        if exc is not None:
+            raise DefinitionLoadError(path, exc) from exc
+        definitions.append(munchify(toml_map))
+    return definitions
+
+
+def _read(path):
+    """
+    Returns (toml_map, exception) so every worker runs to completion
+    """
+    try:
+        return read_styx_file(path), None
+    except Exception as exc:
+        return None, exc
+
+
+def empty_functions():
+    return munchify({"functions": []})
+
+
+def create_maps(
+    maps_location="maps",
+    functions_location="functions.styx",
+    metrics=None,
+    registry: FunctionRegistry = None,
+    definition_cache=None,
+    workers=None,
+    processes=False,
+) -> Dict[str, Mapper]:
+    """
+    Load every Styx definition in `maps_location`, keyed by `from_type`.
+
+    Pass a `pystyx.Metrics` to export counters and latencies for every Mapper.
+    Functions are resolved in `registry` (by default, the global @styx_function one).
+    Mappers share parsed definitions through `definition_cache`, see `MapSets`.
+
+    With `workers`, definition files are read and parsed concurrently (in threads, or
+    processes with `processes=True`). A broken definition raises DefinitionLoadError
+    naming the file; files are handled in sorted order either way.
+    """
+    registry = registry if registry is not None else default_registry
+    cwd = Path(os.getcwd())
+    styx_files: List[Path] = sorted(cwd.glob(f"{maps_location}/*.styx"))
+    functions_file: Path = cwd / functions_location
+    functions_toml = (
+        munchify(read_styx_file(functions_file))
+        if functions_file.exists()
+        else empty_functions()
+    )
+    functions = registry.parse_functions(functions_toml)
+    if functions_toml.get("lookups"):
+        register_lookups(functions_toml.lookups, base=functions_file.parent)
+    map_objects = load_definitions(styx_files, workers, processes)
+    # Every definition's [lookups] first, so any definition can use them, with
+    # paths relative to the file declaring them
+    for path, map_ in zip(styx_files, map_objects):
+        lookups = map_.pop("lookups", None)
+        if lookups:
+            try:
+                register_lookups(lookups, base=path.parent)
+            except TypeError as exc:
+                raise DefinitionLoadError(path, exc) from exc
+    maps = {}
+    paths = {}
+    for path, map_ in zip(styx_files, map_objects):
+        try:
+            mapper = Mapper(
+                map_, functions, registry=registry, definition_cache=definition_cache
+            )
+        except TypeError as exc:
+            raise DefinitionLoadError(path, exc) from exc
+        maps[mapper.from_type] = mapper
+        paths[mapper.from_type] = path
+    # Mutation. Add "definitions" to Mappers
+    for from_type, map_ in maps.items():
+        try:
+            map_.update_definitions(maps)
+        except TypeError as exc:
+            raise DefinitionLoadError(paths[from_type], exc) from exc
+        if metrics is not None:
+            map_.set_metrics(metrics)
+    return maps
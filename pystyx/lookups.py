@@ -0,0 +1,349 @@
+"""
+External lookup tables for field `mapping`s.
+
+Tables referenced with `mapping_file` are loaded from CSV or JSON files once per
+process and shared by every field (and every definition) referencing the same file.
+
+Tables declared under `[lookups]` are compiled into a memory-mapped file instead,
+so they are shared between processes too.
+"""
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+
+def _parse_bool_key(s):
+    if isinstance(s, bool):
+        return s
+    return str(s).lower() in ("true", "1", "t", "y", "yes")
+
+
+MAPPING_KEY_TYPES: Dict[str, Callable] = {
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": _parse_bool_key,
+}
+
+_tables: Dict[Tuple[str, float, Optional[str]], dict] = {}
+_MISSING = object()
+
+
+def coerce_keys(mapping, key_type):
+    """
+    '__default__' is never coerced so the default can live alongside typed keys.
+    """
+    if key_type is None:
+        return dict(mapping)
+    coerce = MAPPING_KEY_TYPES[key_type]
+    return {
+        key if key == "__default__" else coerce(key): value
+        for key, value in mapping.items()
+    }
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def read_lookup_file(path: Path) -> dict:
+    """
+    CSV files use the first column as key and the second as value (the first row is a header).
+    JSON files must contain a single object.
+    """
+    if path.suffix == ".json":
+        with path.open(encoding="utf-8") as infile:
+            table = json.load(infile)
+        if not isinstance(table, dict):
+            raise TypeError(f"Lookup file must contain a JSON object: {path}")
+        return table
+
+    if path.suffix == ".csv":
+        with path.open(encoding="utf-8", newline="") as infile:
+            rows = csv.reader(infile)
+            next(rows, None)
+            # Lookup values repeat a lot (country codes, statuses...), so intern them
+            return {row[0]: _intern(row[1]) for row in rows if len(row) >= 2}
+
+    raise TypeError(f"Unknown lookup file type (expected .csv or .json): {path}")
+
+
+def _lookup_path(path) -> Path:
+    path = Path(path)
+    return path if path.is_absolute() else Path(os.getcwd()) / path
+
+
+def load_lookup(path, key_type=None) -> dict:
+    """
+    Load a lookup table once per process. Reloads if the file changed on disk.
+    """
+    path = _lookup_path(path)
+    if not path.exists():
+        raise TypeError(f"Lookup file not found: {path}")
+
+    cache_key = (str(path.resolve()), path.stat().st_mtime, key_type)
+    table = _tables.get(cache_key)
+    if table is None:
+        table = coerce_keys(read_lookup_file(path), key_type)
+        _tables[cache_key] = table
+    return table
+
+
+def lookup_fingerprints(toml_map) -> list:
+    """
+    [name or path, file, mtime] of every lookup table the fields of a (raw)
+    definition read: parsed definitions hold the tables themselves.
+    """
+    fingerprints = []
+    for field in (toml_map.get("fields") or {}).values():
+        if not isinstance(field, dict):
+            continue
+        if isinstance(field.get("lookup"), str):
+            table = _mapped_lookups.get(field["lookup"])
+            fingerprints.append(
+                [field["lookup"], table and table.path, table and table.mtime]
+            )
+        if isinstance(field.get("mapping_file"), str):
+            path = _lookup_path(field["mapping_file"])
+            mtime = path.stat().st_mtime if path.exists() else None
+            fingerprints.append([field["mapping_file"], str(path.resolve()), mtime])
+    return sorted(fingerprints, key=repr)
+
+
+def clear_lookups():
+    _tables.clear()
+    _mapped_lookups.clear()
+
+
+# Memory-mapped lookup tables
+#
+# Large tables are compiled once into a read-only file and opened with mmap, so every
+# worker process shares the same pages instead of holding its own dict.
+#
+# Layout (little endian):
+#   magic (8 bytes) | count (u64) | key_type (8 bytes, empty when keys are kept as-is)
+#   key offsets ((count + 1) * u64) | value offsets ((count + 1) * u64)
+#   key blob (sorted, encoded keys) | value blob (JSON encoded values)
+MAPPED_LOOKUP_MAGIC = b"STYXLKP2"
+MAPPED_LOOKUP_SUFFIX = ".styxlookup"
+_HEADER = struct.Struct("<8sQ8s")
+_OFFSET = struct.Struct("<Q")
+
+_mapped_lookups: Dict[str, "MappedLookup"] = {}
+
+
+def encode_lookup_key(key) -> bytes:
+    """
+    Strings are stored as-is, other key types get a type tag so 1, 1.0, True and "1"
+    don't collide.
+    """
+    if isinstance(key, str):
+        return key.encode("utf-8")
+    if isinstance(key, bool):
+        return b"\x00b" + (b"1" if key else b"0")
+    if isinstance(key, int):
+        return b"\x00i" + str(key).encode("ascii")
+    if isinstance(key, float):
+        return b"\x00f" + repr(key).encode("ascii")
+    raise TypeError(f"Unsupported lookup key type: {type(key).__name__}")
+
+
+def read_lookup_header(path) -> Optional[Tuple[int, Optional[str]]]:
+    """
+    (count, key_type) of a compiled lookup file, or None if it isn't one (in the
+    current format).
+    """
+    with open(path, "rb") as infile:
+        header = infile.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    magic, count, key_type = _HEADER.unpack(header)
+    if magic != MAPPED_LOOKUP_MAGIC:
+        return None
+    return (count, key_type.rstrip(b"\x00").decode("ascii") or None)
+
+
+def build_mapped_lookup(source, target=None, key_type=None) -> Path:
+    """
+    Compile a CSV/JSON lookup file into the memory-mapped format.
+    Skipped if the target is newer than the source and was built with the same
+    key_type. Written atomically, so concurrent workers building the same table
+    never see a partial file.
+    """
+    source = Path(source)
+    target = Path(target) if target else source.with_suffix(MAPPED_LOOKUP_SUFFIX)
+    if target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+        header = read_lookup_header(target)
+        if header is not None and header[1] == key_type:
+            return target
+
+    table = coerce_keys(read_lookup_file(source), key_type)
+    items = sorted(
+        (encode_lookup_key(key), json.dumps(value).encode("utf-8"))
+        for key, value in table.items()
+    )
+
+    key_offsets, value_offsets = [0], [0]
+    for key, value in items:
+        key_offsets.append(key_offsets[-1] + len(key))
+        value_offsets.append(value_offsets[-1] + len(value))
+
+    import tempfile
+
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as outfile:
+            outfile.write(
+                _HEADER.pack(
+                    MAPPED_LOOKUP_MAGIC,
+                    len(items),
+                    (key_type or "").encode("ascii"),
+                )
+            )
+            outfile.write(struct.pack(f"<{len(key_offsets)}Q", *key_offsets))
+            outfile.write(struct.pack(f"<{len(value_offsets)}Q", *value_offsets))
+            outfile.write(b"".join(key for key, _value in items))
+            outfile.write(b"".join(value for _key, value in items))
+        os.replace(tmp_name, target)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+    return target
+
+
+class MappedLookup:
+    """
+    Read-only lookup table backed by a memory-mapped file. Lookups binary search the
+    sorted key blob; nothing is loaded into the python heap up front.
+    """
+
+    path: str
+    count: int
+    key_type: Optional[str]
+    mtime: float
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, "rb") as infile:
+            self.mtime = os.fstat(infile.fileno()).st_mtime
+            self._mmap = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, key_type = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAPPED_LOOKUP_MAGIC:
+            raise TypeError(f"Not a styx lookup file: {self.path}")
+        self.key_type = key_type.rstrip(b"\x00").decode("ascii") or None
+        self._key_offsets = _HEADER.size
+        self._value_offsets = self._key_offsets + (self.count + 1) * _OFFSET.size
+        self._keys = self._value_offsets + (self.count + 1) * _OFFSET.size
+        self._values = self._keys + self._offset(self._key_offsets, self.count)
+        self.default = self.get("__default__")
+
+    def __reduce__(self):
+        # Workers re-open the file instead of receiving a pickled copy of the table
+        return (MappedLookup, (self.path,))
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def _offset(self, table, index):
+        return _OFFSET.unpack_from(self._mmap, table + index * _OFFSET.size)[0]
+
+    def _key(self, index):
+        start = self._keys + self._offset(self._key_offsets, index)
+        end = self._keys + self._offset(self._key_offsets, index + 1)
+        return self._mmap[start:end]
+
+    def _find(self, key):
+        try:
+            encoded = encode_lookup_key(key)
+        except TypeError:
+            return -1
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._key(low) == encoded:
+            return low
+        return -1
+
+    def get(self, key, default=None):
+        index = self._find(key)
+        if index < 0:
+            return default
+        start = self._values + self._offset(self._value_offsets, index)
+        end = self._values + self._offset(self._value_offsets, index + 1)
+        return json.loads(self._mmap[start:end])
+
+    def close(self):
+        self._mmap.close()
+
+
+def register_lookups(lookups_toml, base=None):
+    """
+    Register the `[lookups]` table of functions.styx or a definition:
+
+        [lookups]
+        countries = "lookups/countries.csv"
+        statuses = { path = "lookups/statuses.json", key_type = "int" }
+    """
+    base = Path(base) if base else Path(os.getcwd())
+    for name, declaration in lookups_toml.items():
+        if isinstance(declaration, str):
+            path, key_type = declaration, None
+        elif isinstance(declaration, dict) and isinstance(declaration.get("path"), str):
+            path, key_type = declaration["path"], declaration.get("key_type")
+        else:
+            raise TypeError(
+                f"Lookup '{name}' must be a path or a table with a 'path' key."
+            )
+
+        if key_type is not None and key_type not in MAPPING_KEY_TYPES:
+            raise TypeError(f"Unknown 'key_type' given for lookup '{name}': {key_type}")
+
+        source = Path(path) if Path(path).is_absolute() else base / path
+        if not source.exists():
+            raise TypeError(f"Lookup file not found: {source}")
+        if source.suffix != MAPPED_LOOKUP_SUFFIX:
+            try:
+                source = build_mapped_lookup(source, key_type=key_type)
+            except ValueError as exc:
+                raise TypeError(
+                    f"Unable to coerce keys of lookup '{name}' to {key_type}: {exc}"
+                ) from exc
+
+        existing = _mapped_lookups.get(name)
+        if (
+            existing is None
+            or existing.path != str(source)
+            # Rebuilt since it was opened (e.g. with another key_type)
+            or existing.mtime != source.stat().st_mtime
+        ):
+            _mapped_lookups[name] = MappedLookup(source)
+    return _mapped_lookups
+
+
+def get_lookup(name) -> MappedLookup:
+    """
+    Access a registered lookup table, e.g. from a custom @styx_function.
+    """
+    try:
+        return _mapped_lookups[name]
+    except KeyError:
+        raise TypeError(f"unknown lookup: {name}")
@@ -1,26 +1,51 @@
+import time
+from collections.abc import Iterator
 from copy import copy
-from typing import Callable, Dict, Literal
+from typing import Callable, Dict, Literal, Optional
 
 from munch import Munch, munchify
-from pydash import get, set_
 
+from .errors import RecordError, TooManyErrors, annotate_exception
+from .functions import FunctionRegistry, default_registry
+from .lookups import lookup_fingerprints
+from .memo import MemoCache
+from .metrics import Metrics
 from .parser import Parser
-from .shared import OnThrowValue, parse_const
+from .shared import (
+    AMBIGUOUS_PATH,
+    MISSING_VALUE,
+    NO_MATCHING_PATH,
+    Failure,
+    OnThrowValue,
+    content_hash,
+    function_fingerprint,
+    get_path,
+    parse_const,
+    referenced_functions,
+    set_path,
+)
+from .tracing import Tracer, start_field_trace, start_record_trace
 
 
 def empty_functions_toml():
     return munchify({"functions": []})
 
 
-def handle_exception(definition, exc):
-    on_throw_enum = definition.get("on_throw")
-    on_throw_enum_value = getattr(on_throw_enum, "value", None)
-    if on_throw_enum_value == OnThrowValue.Skip.value:
+def handle_failure(definition, failure: Failure):
+    """
+    Apply the definition's 'on_throw' policy. Only 'throw' builds an exception.
+    """
+    on_throw = definition.get("on_throw")
+    if on_throw is OnThrowValue.Skip:
         return None, True
-    elif on_throw_enum_value == OnThrowValue.OrElse.value:
+    elif on_throw is OnThrowValue.OrElse:
         return definition.or_else, False
     else:
-        raise exc
+        raise failure.to_exception()
+
+
+def handle_exception(definition, exc):
+    return handle_failure(definition, Failure(exc=exc))
 
 
 class ProcessMapper:
@@ -28,19 +53,24 @@ class ProcessMapper:
     definitions: Dict[str, Munch]
     functions: Dict[str, Callable]
     processor_key: Literal["preprocess", "postprocess"] = NotImplementedError
+    metrics: Optional[Metrics] = None
 
     def __init__(self, definition, functions, definitions):
         self.definition = definition
         self.definitions = definitions
         self.functions = functions
 
-    def __call__(self, obj):
+    def __call__(self, obj, lazy=False):
         """
         Depending on whether it is preprocess or postprocess,
         the obj will either be the from_obj or the to_obj.
 
         That is, preprocess prepares the from_obj for processing.
         Postprocess polishes the to_obj for final export.
+
+        With `lazy`, processors marked `many` are composed as generators instead
+        of building a list per step. A processor not marked `many` needs the whole
+        collection, so a pending stream is materialized before it runs.
         """
         if self.definition.get(self.processor_key):
             process_dict = getattr(self.definition, self.processor_key)
@@ -48,16 +78,66 @@ class ProcessMapper:
                 [(key, value) for key, value in process_dict.items()],
                 key=lambda pair: pair[0],
             )
-            for (_key, processor) in processors:
-                many = processor.pop("many")
-                if many:
-                    objs = obj
-                    obj = [self.process(obj, processor) for obj in objs]
-                else:
-                    obj = self.process(obj, processor)
+            for (key, processor) in processors:
+                many = processor.get("many", False)
+                try:
+                    if many and lazy:
+                        obj = self.process_many(obj, processor)
+                    elif many and processor.get("vectorized_function"):
+                        obj = self.process_vectorized(obj, processor)
+                    elif many:
+                        objs = obj
+                        obj = [self.process(obj, processor) for obj in objs]
+                    else:
+                        if lazy and isinstance(obj, Iterator):
+                            obj = list(obj)
+                        obj = self.process(obj, processor)
+                except Exception as exc:
+                    annotate_exception(
+                        exc,
+                        from_type=self.definition.get("from_type"),
+                        processor_key=f"{self.processor_key}.{key}",
+                        input_paths=processor.input_paths,
+                    )
+                    raise
 
         return obj
 
+    def process_vectorized(self, objs, processor):
+        """
+        Call a vectorized function once for all objs (one list per input path).
+        If it throws, fall back to one call per obj so 'on_throw' applies per record.
+        It must return exactly one value per obj.
+        """
+        objs = list(objs)
+        if processor.input_paths == ["."]:
+            columns = [objs]
+        else:
+            rows = [self.process_paths(obj, processor) for obj in objs]
+            columns = [list(column) for column in zip(*rows)] or [
+                [] for _path in processor.input_paths
+            ]
+
+        function = processor.vectorized_function
+        try:
+            new_values = list(function(*columns))
+        except Exception:
+            return [self.process(obj, processor) for obj in objs]
+
+        if len(new_values) != len(objs):
+            name = getattr(function, "__name__", repr(function))
+            raise TypeError(
+                f"Vectorized function '{name}' returned {len(new_values)} value(s) for {len(objs)} record(s)."
+            )
+        return [
+            self.output_value(obj, processor.output_path, new_value)
+            for obj, new_value in zip(objs, new_values)
+        ]
+
+    def process_many(self, objs, processor):
+        for obj in objs:
+            yield self.process(obj, processor)
+
     def process(self, obj, processor):
         if processor.input_paths == ["."]:
             old_values = [obj]
@@ -67,6 +147,8 @@ class ProcessMapper:
         try:
             new_value = processor.function(*old_values)
         except Exception as exc:
+            if self.metrics is not None:
+                self.count_failure(processor)
             (new_value, skip) = handle_exception(processor, exc)
             if skip:
                 return obj
@@ -74,6 +156,19 @@ class ProcessMapper:
         obj = self.output_value(obj, processor.output_path, new_value)
         return obj
 
+    def count_failure(self, processor):
+        processor_name = next(
+            key
+            for key, value in self.definition[self.processor_key].items()
+            if value is processor
+        )
+        labels = (
+            ("from_type", self.definition.get("from_type")),
+            ("processor", f"{self.processor_key}.{processor_name}"),
+            ("outcome", processor.get("on_throw", OnThrowValue.Throw).value),
+        )
+        self.metrics.inc("pystyx_processor_failures", labels)
+
     def process_paths(self, obj, processor):
         old_values = []
 
@@ -82,7 +177,7 @@ class ProcessMapper:
             value = (
                 value
                 if is_const
-                else get(
+                else get_path(
                     obj,
                     path,
                     processor.or_else if hasattr(processor, "or_else") else None,
@@ -97,7 +192,7 @@ class ProcessMapper:
             # Allows changing the entire structure by using the 'cwd' alias
             return new_value
         else:
-            return set_(obj, output_path, new_value)
+            return set_path(obj, output_path, new_value)
 
 
 class PreprocessMapper(ProcessMapper):
@@ -108,17 +203,89 @@ class PostprocessMapper(ProcessMapper):
     processor_key = "postprocess"
 
 
+class FilterMapper:
+    """
+    Drops records failing any of the definition's 'filter' predicates, after
+    preprocess and before any field is mapped.
+    """
+
+    definition: Munch
+    definitions: Dict[str, Munch]
+    functions: Dict[str, Callable]
+    metrics: Optional[Metrics] = None
+
+    def __init__(self, definition, functions, definitions):
+        self.definition = definition
+        self.definitions = definitions
+        self.functions = functions
+        # (name, predicate, [(path, const, is_const)])
+        self.predicates = [
+            (
+                name,
+                predicate,
+                [(path, *parse_const(path)) for path in predicate.input_paths]
+                if "function" in predicate
+                else None,
+            )
+            for name, predicate in (definition.get("filter") or {}).items()
+        ]
+
+    def __call__(self, objs, lazy=False):
+        """
+        The accepted records of a `many` definition (a generator with `lazy`)
+        """
+        accepted = (obj for obj in objs if self.accepts(obj))
+        return accepted if lazy else list(accepted)
+
+    def accepts(self, obj):
+        for (name, predicate, paths) in self.predicates:
+            try:
+                if paths is None:
+                    accepted = get_path(obj, predicate.field) in predicate["values"]
+                else:
+                    accepted = predicate.function(
+                        *(
+                            const if is_const else get_path(obj, path)
+                            for (path, const, is_const) in paths
+                        )
+                    )
+            except Exception as exc:
+                annotate_exception(
+                    exc,
+                    from_type=self.definition.get("from_type"),
+                    processor_key=f"filter.{name}",
+                    input_paths=predicate.get("input_paths") or [predicate.field],
+                )
+                raise
+            if not accepted:
+                if self.metrics is not None:
+                    labels = (
+                        ("from_type", self.definition.get("from_type")),
+                        ("predicate", name),
+                    )
+                    self.metrics.inc("pystyx_filtered_records", labels)
+                return False
+        return True
+
+
 class FieldsMapper:
     definition: Munch
     definitions: Dict[str, "Mapper"]
     functions: Dict[str, Callable]
+    tracer: Optional[Tracer] = None
+    metrics: Optional[Metrics] = None
+    _field_trace: Optional[dict] = None
 
     def __init__(self, definition, functions, definitions):
         self.definition = definition
         self.definitions = definitions
         self.functions = functions
 
-    def __call__(self, from_obj):
+    def __call__(self, from_obj, lazy=False):
+        """
+        `many` definitions accept any iterable of from_objs. With `lazy`, they
+        return a generator instead of a list so records are mapped one at a time.
+        """
         # TODO: Add other structures potentially besides JSON
         type_ = self.definition.__type__
         if type_ == "object":
@@ -128,6 +295,8 @@ class FieldsMapper:
                 to_obj = {}
         elif type_ == "list":
             to_obj = []
+        elif type_ == "row":
+            return self._map_rows(from_obj, lazy)
         else:
             raise RuntimeError(
                 f"Unknown type declaration found: {type_}. How did the parser not catch this?"
@@ -135,54 +304,217 @@ class FieldsMapper:
 
         many = self.definition.fields["many"]
 
-        if many:
+        if many and lazy:
+            return self._map_many(from_obj, to_obj)
+        elif many:
             from_objs = from_obj
             return [self._map(from_obj, copy(to_obj)) for from_obj in from_objs]
         else:
             return self._map(from_obj, to_obj)
 
+    def map_record(self, from_obj):
+        """
+        Map a single from_obj, even for `many` definitions
+        """
+        if not self.definition.fields["many"]:
+            return self(from_obj)
+        return next(self([from_obj], lazy=True))
+
+    def _map_many(self, from_objs, to_obj):
+        for from_obj in from_objs:
+            yield self._map(from_obj, copy(to_obj))
+
+    def _map_rows(self, from_obj, lazy=False):
+        if self.definition.fields["many"]:
+            rows = (self._map_row(from_obj) for from_obj in from_obj)
+            return rows if lazy else list(rows)
+        else:
+            return self._map_row(from_obj)
+
+    def _map_row(self, from_obj):
+        tracer = self.tracer
+        if tracer is not None and tracer.should_sample():
+            field_values = self._get_field_values_traced(from_obj, tracer)
+            return self.definition.row_class._make(
+                None if skip else value for (_name, value, skip) in field_values
+            )
+
+        plan = self.definition.get("path_plan")
+        resolved = self.resolve_paths(from_obj, plan) if plan else None
+        values = []
+        for field_name, field_definition in self.definition.fields.items():
+            if field_name == "many":
+                continue
+            (value, skip) = self.get_field_value(
+                field_name, from_obj, field_definition, resolved
+            )
+            values.append(None if skip else value)
+        return self.definition.row_class._make(values)
+
     def _map(self, from_obj, to_obj):
+        tracer = self.tracer
+        if tracer is not None and tracer.should_sample():
+            for (field_name, value, skip) in self._get_field_values_traced(
+                from_obj, tracer
+            ):
+                if not skip:
+                    set_path(to_obj, field_name, value)
+            return to_obj
+
+        plan = self.definition.get("path_plan")
+        resolved = self.resolve_paths(from_obj, plan) if plan else None
+
+        schema = self.definition.get("output_schema")
+        if schema is not None:
+            return self._map_schema(from_obj, to_obj, schema, resolved)
+
         for field_name, field_definition in self.definition.fields.items():
             if field_name == "many":
                 continue
-            to_obj = self.map_field(from_obj, to_obj, field_name, field_definition)
+            to_obj = self.map_field(
+                from_obj, to_obj, field_name, field_definition, resolved
+            )
+        return to_obj
+
+    def resolve_paths(self, from_obj, plan):
+        """
+        Resolve the definition's shared paths (see Parser.parse_path_plan) once for
+        this record. Returns {path: value}, like read_path would.
+        """
+        resolved = {}
+        for (path, base, keys) in plan:
+            value = from_obj if base is None else resolved[base]
+            for key in keys:
+                if value is None:
+                    break
+                if not isinstance(value, dict):
+                    # Attributes, list indexes...: leave it to pydash
+                    value = get_path(from_obj, path, None)
+                    break
+                value = value.get(key)
+            resolved[path] = value
+        return resolved
+
+    def _map_schema(self, from_obj, to_obj, schema, resolved=None):
+        """
+        Build the output from the schema derived at parse time. Nested sub-dicts
+        are created once per record and reused by every field below them.
+        """
+        fields = self.definition.fields
+        parents = None
+        for (field_name, parent_keys, key) in schema:
+            (value, skip) = self.get_field_value(
+                field_name, from_obj, fields[field_name], resolved
+            )
+            if skip:
+                continue
+            if not parent_keys:
+                if parent_keys is None:
+                    set_path(to_obj, field_name, value)
+                else:
+                    to_obj[key] = value
+                continue
+
+            if parents is None:
+                parents = {}
+            parent = parents.get(parent_keys)
+            if parent is None:
+                parent = self._make_parents(to_obj, parent_keys, parents)
+            if parent is None:
+                set_path(to_obj, field_name, value)
+            else:
+                parent[key] = value
         return to_obj
 
-    def map_field(self, from_obj, to_obj, field_name, field_definition):
-        (value, skip) = self.get_field_value(field_name, from_obj, field_definition)
+    def _make_parents(self, to_obj, parent_keys, parents):
+        parent = to_obj
+        for index, key in enumerate(parent_keys):
+            prefix = parent_keys[: index + 1]
+            child = parents.get(prefix)
+            if child is None:
+                child = parent.get(key)
+                if child is None:
+                    child = parent[key] = {}
+                elif not isinstance(child, dict):
+                    # Something else already lives here, let pydash decide
+                    return None
+                parents[prefix] = child
+            parent = child
+        return parent
+
+    def _get_field_values_traced(self, from_obj, tracer):
+        """
+        Slow path for sampled records: same results as the fast path, plus a trace.
+        """
+        trace = start_record_trace(self.definition)
+        field_values = []
+        try:
+            for field_name, field_definition in self.definition.fields.items():
+                if field_name == "many":
+                    continue
+                field_trace = start_field_trace(
+                    field_name, field_definition, from_obj, self.read_path
+                )
+                trace["fields"].append(field_trace)
+                self._field_trace = field_trace
+                start = time.perf_counter()
+                try:
+                    (value, skip) = self.get_field_value(
+                        field_name, from_obj, field_definition
+                    )
+                finally:
+                    field_trace["elapsed_ms"] = (time.perf_counter() - start) * 1000
+                field_values.append((field_name, value, skip))
+        finally:
+            self._field_trace = None
+            tracer.record(trace)
+        return field_values
+
+    def map_field(self, from_obj, to_obj, field_name, field_definition, resolved=None):
+        (value, skip) = self.get_field_value(
+            field_name, from_obj, field_definition, resolved
+        )
         if not skip:
-            set_(to_obj, field_name, value)
+            set_path(to_obj, field_name, value)
         return to_obj
 
-    def get_field_value(self, field_name, from_obj, field_definition):
+    def get_field_value(self, field_name, from_obj, field_definition, resolved=None):
+        """
+        `resolved` holds paths already read for this record (see resolve_paths)
+        """
+        if "_constant" in field_definition:
+            # Folded at parse time
+            return field_definition._constant, False
+
         if field_definition.get("possible_paths"):
             options = [
-                get(from_obj, path, None) for path in field_definition.possible_paths
+                self.read_path(from_obj, path, resolved)
+                for path in field_definition.possible_paths
             ]
             condition = field_definition.path_condition
             potential_values = list(
                 filter(
-                    lambda val: get(val, condition.field) == condition.value, options,
+                    lambda val: get_path(val, condition.field) == condition.value,
+                    options,
                 )
             )
 
             if len(potential_values) > 1:
-                exc = RuntimeError(
-                    "Unable to determine input path. Found more than one option satisfying predicate."
-                )
-                return handle_exception(field_definition, exc)
+                return self.handle_failure(field_name, field_definition, AMBIGUOUS_PATH)
 
             if not potential_values:
-                exc = RuntimeError(
-                    "Unable to determine input path. Unable to find option satisfying predicate."
+                return self.handle_failure(
+                    field_name, field_definition, NO_MATCHING_PATH
                 )
-                return handle_exception(field_definition, exc)
 
-            (value, skip) = self.apply_function_to_values(
-                field_definition, potential_values
-            )
+            value = self.apply_function_to_values(field_definition, potential_values)
+        else:
+            value = self.apply_function(field_definition, from_obj, resolved)
+
+        if value.__class__ is Failure:
+            (value, skip) = self.handle_failure(field_name, field_definition, value)
         else:
-            (value, skip) = self.apply_function(field_definition, from_obj)
+            skip = False
 
         if skip:
             return None, skip
@@ -190,10 +522,9 @@ class FieldsMapper:
         if field_definition.get("from_type"):
             value = self.map_nested_type(field_name, field_definition, from_obj, value)
 
-        if field_definition.get("mapping"):
-            mapping = field_definition.get("mapping")
-            default = mapping.get("__default__")
-            value = mapping.get(value, default)
+        mapping = field_definition.get("mapping")
+        if mapping is not None:
+            value = mapping.get(value, field_definition.mapping_default)
 
         return value, False
 
@@ -205,42 +536,71 @@ class FieldsMapper:
             )
 
         extended_value = self.copy_fields(field_name, field_definition, from_obj, value)
-        return nested_mapper(extended_value)
+        return nested_mapper.map_nested(extended_value)
 
     def copy_fields(self, field_name, field_definition, from_obj, value):
         """
         Non-reserved words are used to copy extra data to the nested object for mapping
         """
-        for key in field_definition._copy_fields:
-            path = get(field_definition, [field_name, key])
-            s, is_const = parse_const(path)
-            if is_const:
-                value[key] = s
-            else:
-                value[key] = get(from_obj, path)
+        copy_constants = field_definition._copy_constants
+        if copy_constants:
+            value.update(copy_constants)
+        for (key, path) in field_definition._copy_paths:
+            value[key] = get_path(from_obj, path)
 
         return value
 
-    def apply_function(self, field_definition, from_obj):
-        values = []
-        for path in field_definition.input_paths:
-            value, is_const = parse_const(path)
-            values.append(value if is_const else get(from_obj, path, None))
-
+    def read_path(self, from_obj, path, resolved=None):
+        if resolved is not None and path in resolved:
+            return resolved[path]
+        value, is_const = parse_const(path)
+        return value if is_const else get_path(from_obj, path, None)
+
+    def apply_function(self, field_definition, from_obj, resolved=None):
+        values = [
+            self.read_path(from_obj, path, resolved)
+            for path in field_definition.input_paths
+        ]
         return self.apply_function_to_values(field_definition, values)
 
     def apply_function_to_values(self, field_definition, values):
+        """
+        Returns the value, or a Failure for the caller to resolve with 'on_throw'
+        """
+        function = field_definition.get("function")
+        if function is None:
+            value = values[0]
+            return MISSING_VALUE if value is None else value
         try:
-            skip = False
-            if field_definition.get("function"):
-                return field_definition.function(*values), skip
-            else:
-                value = values[0]
-                if value is None:
-                    raise ValueError(f"No value found for path.")
-                return value, skip
-        except Exception as e:
-            return handle_exception(field_definition, e)
+            return function(*values)
+        except Exception as exc:
+            return Failure(exc=exc)
+
+    def handle_failure(self, field_name, field_definition, failure):
+        field_trace = self._field_trace
+        if field_trace is not None:
+            field_trace["outcome"] = field_definition.get(
+                "on_throw", OnThrowValue.Throw
+            ).value
+            field_trace["error"] = repr(failure.to_exception())
+        if self.metrics is not None:
+            labels = (
+                ("from_type", self.definition.get("from_type")),
+                ("field", field_name),
+                ("outcome", field_definition.get("on_throw", OnThrowValue.Throw).value),
+            )
+            self.metrics.inc("pystyx_field_failures", labels)
+        try:
+            return handle_failure(field_definition, failure)
+        except Exception as exc:
+            annotate_exception(
+                exc,
+                from_type=self.definition.get("from_type"),
+                field_name=field_name,
+                input_paths=field_definition.get("input_paths")
+                or field_definition.get("possible_paths"),
+            )
+            raise
 
 
 class Mapper:
@@ -248,26 +608,58 @@ class Mapper:
     definitions: Dict[str, Munch]
     fieldsMapper: FieldsMapper
     fieldsMapperClass = FieldsMapper
+    filterMapper: FilterMapper
+    filterMapperClass = FilterMapper
     from_type: str
     functions: Dict[str, Callable]
     preprocessMapper: PreprocessMapper
     preprocessMapperClass = PreprocessMapper
     postprocessMapper: PostprocessMapper
     postprocessMapperClass = PostprocessMapper
+    definition_key: tuple
+    memo: Optional[MemoCache]
+    metrics: Optional[Metrics] = None
     raw_map: Munch
+    registry: FunctionRegistry
     to_type: str
-
-    def __init__(self, toml_map, functions, definitions=None):
-        self.raw_map = toml_map
-        (self.from_type, self.to_type, self.definition) = self.parse_definition(
-            self.raw_map
+    version: str
+
+    def __init__(
+        self,
+        toml_map,
+        functions,
+        definitions=None,
+        registry=None,
+        definition_cache=None,
+    ):
+        """
+        `definition_cache` (a dict) shares parsed definitions between Mappers built
+        from identical Styx definitions that resolve to the same functions.
+        """
+        self.registry = registry if registry is not None else default_registry
+        # Before parsing: the parser pops keys off the raw map
+        self.version = self.definition_version(toml_map)
+        self.definition_key = self.definition_cache_key(toml_map)
+        cached = (
+            definition_cache.get(self.definition_key)
+            if definition_cache is not None
+            else None
         )
+        if cached is None:
+            parsed = self.parse_definition(toml_map)
+            cached = (toml_map, parsed)
+            if definition_cache is not None:
+                definition_cache[self.definition_key] = cached
+        (self.raw_map, (self.from_type, self.to_type, self.definition)) = cached
         self.definitions = definitions if definitions is not None else {}
         self.functions = functions
 
         self.preprocessMapper = self.preprocessMapperClass(
             self.definition, functions, self.definitions
         )
+        self.filterMapper = self.filterMapperClass(
+            self.definition, functions, self.definitions
+        )
         self.fieldsMapper = self.fieldsMapperClass(
             self.definition, functions, self.definitions
         )
@@ -275,20 +667,192 @@ class Mapper:
             self.definition, functions, self.definitions
         )
 
+        memoize = self.definition.get("memoize")
+        self.memo = MemoCache(memoize.size, memoize.scope) if memoize else None
+
+    def set_tracer(self, tracer: Optional[Tracer]):
+        """
+        Enable (or with None, disable) sampled field-level tracing for this Mapper.
+        """
+        self.fieldsMapper.tracer = tracer
+
+    def set_metrics(self, metrics: Optional[Metrics]):
+        """
+        Export counters and latencies for this Mapper to `metrics` (None disables).
+        """
+        self.metrics = metrics
+        self.preprocessMapper.metrics = metrics
+        self.filterMapper.metrics = metrics
+        self.fieldsMapper.metrics = metrics
+        self.postprocessMapper.metrics = metrics
+        if metrics is not None:
+            metrics.watch_functions(self.functions)
+            if self.memo is not None:
+                metrics.watch_functions({f"mapper:{self.from_type}": self.memo})
+
     def __call__(self, from_obj: any):
+        if self.metrics is not None:
+            return self._map_measured(from_obj)
+        return self._map(from_obj)
+
+    def _map(self, from_obj):
+        """
+        None when the record is rejected by the definition's 'filter'
+        """
         from_obj = self.preprocessMapper(from_obj)
+        if self.filterMapper.predicates:
+            if self.definition.fields["many"]:
+                from_obj = self.filterMapper(from_obj)
+            elif not self.filterMapper.accepts(from_obj):
+                return None
         to_obj = self.fieldsMapper(from_obj)
         to_obj = self.postprocessMapper(to_obj)
         return to_obj
 
+    def _map_measured(self, from_obj):
+        labels = (("from_type", self.from_type),)
+        start = time.perf_counter()
+        to_obj = self._map(from_obj)
+        self.metrics.observe("pystyx_map_seconds", labels, time.perf_counter() - start)
+        many = self.definition.fields["many"] and isinstance(to_obj, list)
+        if to_obj is not None:
+            self.metrics.inc("pystyx_records", labels, len(to_obj) if many else 1)
+        return to_obj
+
+    def batch(self, from_objs, errors=None, max_errors=None, rejected=None):
+        """
+        Map each of `from_objs` as its own record, yielding the mapped records.
+
+        With an `errors` side channel (a list, or anything with `append`), a record
+        that fails to map is reported there as a RecordError and the batch continues.
+        Once more than `max_errors` records have failed, TooManyErrors is raised.
+        Without `errors`, the first failure is raised as-is.
+
+        Records rejected by the definition's 'filter' are left out; pass a
+        `rejected` list to collect their indexes.
+        """
+        filtering = bool(self.filterMapper.predicates)
+        for (index, to_obj) in self.batch_each(from_objs, self, errors, max_errors):
+            if filtering and to_obj is None:
+                if rejected is not None:
+                    rejected.append(index)
+                continue
+            yield to_obj
+
+    def batch_each(self, from_objs, map_record, errors=None, max_errors=None):
+        """
+        Yield (index, map_record(from_obj)) for each of `from_objs`, as one batch:
+        memos scoped to the batch start empty, and `errors`/`max_errors` work as
+        in `batch` (failed records are reported and skipped).
+        """
+        for mapper in [self, *self.nested_mappers()]:
+            if mapper.memo is not None and mapper.memo.scope == "batch":
+                mapper.memo.clear()
+
+        failed = []
+        for index, from_obj in enumerate(from_objs):
+            if errors is None:
+                yield (index, map_record(from_obj))
+                continue
+
+            try:
+                result = map_record(from_obj)
+            except Exception as exc:
+                error = RecordError(index, from_obj, self.from_type, exc)
+                errors.append(error)
+                failed.append(error)
+                if max_errors is not None and len(failed) > max_errors:
+                    raise TooManyErrors(failed) from exc
+                continue
+            yield (index, result)
+
+    def map_nested(self, from_obj):
+        """
+        Entry point for nested `from_type` fields. Memoized when the definition
+        declares `memoize`; for `many` definitions without pre/postprocessing or a
+        filter, each element of the list is memoized on its own.
+        """
+        if self.memo is None:
+            return self(from_obj)
+        if (
+            self.definition.fields["many"]
+            and isinstance(from_obj, list)
+            and not self.definition.get("preprocess")
+            and not self.definition.get("filter")
+            and not self.definition.get("postprocess")
+        ):
+            map_record = self.fieldsMapper.map_record
+            return [self.memo(map_record, item) for item in from_obj]
+        return self.memo(self, from_obj)
+
+    def nested_mappers(self):
+        """
+        Every Mapper reachable through nested `from_type` fields (excluding self)
+        """
+        seen = {self.from_type}
+        pending = [self]
+        while pending:
+            current = pending.pop()
+            for field_name, field_definition in current.definition.fields.items():
+                if field_name == "many" or not field_definition.get("from_type"):
+                    continue
+                # self.definitions: nested Mappers may not be linked yet
+                nested = self.definitions.get(field_definition.from_type)
+                if nested is not None and nested.from_type not in seen:
+                    seen.add(nested.from_type)
+                    pending.append(nested)
+                    yield nested
+
+    def stream(self, from_obj: any):
+        """
+        Like calling the Mapper, but for `many` definitions: returns a generator of
+        mapped records instead of a list, so a huge payload streams through with
+        bounded memory. Preprocess and postprocess steps marked `many` are applied
+        lazily per record.
+        """
+        if not self.definition.fields["many"]:
+            raise TypeError(
+                f"Only 'many' definitions can be streamed: {self.from_type}"
+            )
+        from_obj = self.preprocessMapper(from_obj, lazy=True)
+        if self.filterMapper.predicates:
+            from_obj = self.filterMapper(from_obj, lazy=True)
+        to_objs = self.fieldsMapper(from_obj, lazy=True)
+        return self.postprocessMapper(to_objs, lazy=True)
+
     def __str__(self):
         return f"<Mapper: {self.from_type} -> {self.to_type}>"
 
     def __repr__(self):
         return self.__str__()
 
+    def definition_version(self, toml_map: Munch) -> str:
+        """
+        Changes whenever the definition, the code of a function it references or a
+        lookup table it reads changes.
+        """
+        fingerprints = {
+            name: function_fingerprint(self.registry[name])
+            for name in sorted(referenced_functions(toml_map))
+            if name in self.registry
+        }
+        return content_hash([toml_map, fingerprints, lookup_fingerprints(toml_map)])
+
+    def definition_cache_key(self, toml_map: Munch) -> tuple:
+        """
+        The parsed definition holds the function objects themselves, so it can only
+        be shared between Mappers resolving names to the very same functions. The
+        lookup tables it holds are part of `version`.
+        """
+        functions = tuple(
+            (name, id(self.registry[name]))
+            for name in sorted(referenced_functions(toml_map))
+            if name in self.registry
+        )
+        return (self.version, functions)
+
     def parse_definition(self, toml_map: Munch) -> Munch:
-        parser = Parser()
+        parser = Parser(self.registry)
         return parser.parse(toml_map)
 
     def update_definitions(self, definitions):
@@ -297,5 +861,17 @@ class Mapper:
         """
         self.definitions = definitions
         self.preprocessMapper.definitions = definitions
+        self.filterMapper.definitions = definitions
         self.fieldsMapper.definitions = definitions
         self.postprocessMapper.definitions = definitions
+
+        if self.memo is not None:
+            impure = sorted(
+                mapper.from_type
+                for mapper in self.nested_mappers()
+                if not mapper.definition.pure
+            )
+            if impure:
+                raise TypeError(
+                    f"'memoize' on {self.from_type} requires nested definitions to only use pure functions. Impure definitions were: {', '.join(impure)}"
+                )
@@ -0,0 +1,73 @@
+"""
+Several named map sets (e.g. one per tenant) in one process.
+
+Identical Styx definitions are parsed once and their parsed definition is shared by
+every map set that loads them, as long as they resolve to the same functions and
+read the same (unchanged) lookup tables. Each map set still gets its own Mappers, so
+nested `from_type` links, metrics and memoization stay per map set.
+"""
+from typing import Dict, Iterator
+
+from .functions import FunctionRegistry
+from .loader import create_maps
+from .mapper import Mapper
+
+
+class MapSets:
+    map_sets: Dict[str, Dict[str, Mapper]]
+    definition_cache: Dict[tuple, tuple]
+
+    def __init__(self):
+        self.map_sets = {}
+        self.definition_cache = {}
+
+    def load(
+        self,
+        name,
+        maps_location="maps",
+        functions_location="functions.styx",
+        metrics=None,
+        registry: FunctionRegistry = None,
+    ) -> Dict[str, Mapper]:
+        """
+        Load (or reload) the map set `name`, see `pystyx.create_maps`.
+        """
+        maps = create_maps(
+            maps_location,
+            functions_location,
+            metrics=metrics,
+            registry=registry,
+            definition_cache=self.definition_cache,
+        )
+        self.map_sets[name] = maps
+        self.prune()
+        return maps
+
+    def unload(self, name):
+        del self.map_sets[name]
+        self.prune()
+
+    def prune(self):
+        """
+        Drop parsed definitions no loaded map set uses anymore.
+        """
+        used = {
+            mapper.definition_key
+            for maps in self.map_sets.values()
+            for mapper in maps.values()
+        }
+        for key in list(self.definition_cache):
+            if key not in used:
+                del self.definition_cache[key]
+
+    def __getitem__(self, name) -> Dict[str, Mapper]:
+        return self.map_sets[name]
+
+    def __contains__(self, name):
+        return name in self.map_sets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.map_sets)
+
+    def __len__(self):
+        return len(self.map_sets)
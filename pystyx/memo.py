@@ -0,0 +1,62 @@
+"""
+Bounded, content-hash keyed cache for memoized definitions.
+"""
+
+from collections import OrderedDict, namedtuple
+from copy import deepcopy
+
+from .shared import content_hash
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+_MISSING = object()
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+
+def copy_output(obj):
+    """
+    A copy of a mapped output: dicts and lists are rebuilt, immutable values shared.
+    """
+    obj_type = type(obj)
+    if obj_type is dict:
+        return {key: copy_output(value) for key, value in obj.items()}
+    if obj_type is list:
+        return [copy_output(value) for value in obj]
+    if obj_type in _IMMUTABLE:
+        return obj
+    return deepcopy(obj)
+
+
+class MemoCache:
+    """
+    LRU cache of mapped outputs. Every call returns its own copy of the cached
+    output: parent definitions (e.g. a postprocess `output_path`) write into them.
+    """
+
+    def __init__(self, size=1024, scope="process"):
+        self.size = size
+        self.scope = scope
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __call__(self, map_, from_obj):
+        key = content_hash(from_obj)
+        to_obj = self._entries.get(key, _MISSING)
+        if to_obj is not _MISSING:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return copy_output(to_obj)
+
+        self.misses += 1
+        to_obj = map_(from_obj)
+        self._entries[key] = to_obj
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return copy_output(to_obj)
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.size, len(self._entries))
+
+    def clear(self):
+        self._entries.clear()
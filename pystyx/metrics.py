@@ -0,0 +1,156 @@
+"""
+OpenMetrics-style counters for the mapping runtime.
+
+No network dependency: `Metrics.render()` returns the text exposition format
+(serve it from whatever endpoint your worker already has), and callbacks
+registered with `Metrics.on_collect` receive every collected sample.
+
+Exported metrics:
+- pystyx_records_total{from_type}
+- pystyx_map_seconds{from_type} (histogram of Mapper.__call__ latency)
+- pystyx_field_failures_total{from_type, field, outcome}
+- pystyx_processor_failures_total{from_type, processor, outcome}
+- pystyx_filtered_records{from_type, predicate} (records dropped by each filter)
+- pystyx_function_cache_hits_total / pystyx_function_cache_misses_total{function}
+  for memoized (functools.lru_cache) functions
+"""
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from typing import Callable, Dict, List, Tuple
+
+Sample = namedtuple("Sample", ["name", "labels", "value"])
+
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return f"{{{pairs}}}"
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class Metrics:
+    buckets: Tuple[float, ...]
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, list]] = {}
+        self._functions: Dict[str, Callable] = {}
+        self._callbacks: List[Callable[[List[Sample]], None]] = []
+
+    def inc(self, name, labels: Labels = (), amount=1):
+        with self._lock:
+            counter = self._counters.setdefault(name, {})
+            counter[labels] = counter.get(labels, 0) + amount
+
+    def observe(self, name, labels: Labels, value):
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {})
+            series = histogram.get(labels)
+            if series is None:
+                # Bucket counts (+Inf last), then count and sum
+                series = histogram[labels] = [0] * (len(self.buckets) + 1) + [0, 0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def watch_functions(self, functions: Dict[str, Callable]):
+        """
+        Export hit rates of memoized functions (anything exposing `cache_info()`).
+        """
+        for name, function in functions.items():
+            if hasattr(function, "cache_info"):
+                self._functions[name] = function
+
+    def on_collect(self, callback: Callable[[List[Sample]], None]):
+        self._callbacks.append(callback)
+
+    def collect(self) -> List[Sample]:
+        samples = []
+        with self._lock:
+            for name, counter in sorted(self._counters.items()):
+                for labels, value in counter.items():
+                    samples.append(Sample(f"{name}_total", dict(labels), value))
+
+            for name, histogram in sorted(self._histograms.items()):
+                for labels, series in histogram.items():
+                    cumulative = 0
+                    bounds = [*self.buckets, "+Inf"]
+                    for bound, count in zip(bounds, series):
+                        cumulative += count
+                        bucket_labels = {**dict(labels), "le": str(bound)}
+                        samples.append(
+                            Sample(f"{name}_bucket", bucket_labels, cumulative)
+                        )
+                    samples.append(Sample(f"{name}_count", dict(labels), series[-2]))
+                    samples.append(Sample(f"{name}_sum", dict(labels), series[-1]))
+
+        for name, function in sorted(self._functions.items()):
+            info = function.cache_info()
+            labels = {"function": name}
+            samples.append(
+                Sample("pystyx_function_cache_hits_total", labels, info.hits)
+            )
+            samples.append(
+                Sample("pystyx_function_cache_misses_total", labels, info.misses)
+            )
+
+        for callback in self._callbacks:
+            callback(samples)
+        return samples
+
+    def render(self) -> str:
+        """
+        Text exposition of all samples, in the OpenMetrics format.
+        """
+        types = {name: "counter" for name in self._counters}
+        types.update({name: "histogram" for name in self._histograms})
+        if self._functions:
+            types["pystyx_function_cache_hits"] = "counter"
+            types["pystyx_function_cache_misses"] = "counter"
+
+        lines = []
+        family = None
+        for sample in self.collect():
+            name = sample.name
+            for suffix in ("_total", "_bucket", "_count", "_sum"):
+                if name.endswith(suffix) and name[: -len(suffix)] in types:
+                    name = name[: -len(suffix)]
+                    break
+            if name != family:
+                family = name
+                lines.append(f"# TYPE {family} {types.get(family, 'unknown')}")
+            labels = _format_labels(tuple(sample.labels.items()))
+            lines.append(f"{sample.name}{labels} {_format_value(sample.value)}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
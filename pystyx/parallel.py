@@ -0,0 +1,193 @@
+"""
+Mapping batches of records in a pool of worker processes.
+
+Every worker loads the maps once (`create_maps`, after importing the modules that
+register functions) and then maps whole batches, so a batch costs one round trip
+instead of one per record.
+
+With `transport="shared_memory"`, batches don't go through the pipe: the records are
+marshalled into a `multiprocessing.shared_memory` segment and the worker writes the
+marshalled results into a second one, so only segment names and sizes are pickled.
+`marshal` (workers run the same interpreter) is faster than pickle for the builtin
+types records are made of; batches holding anything else (rows, dates...) fall back
+to pickle.
+"""
+import importlib
+import marshal
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence
+
+from .mapper import Mapper
+
+TRANSPORTS = ("pickle", "shared_memory")
+
+_worker_maps: Optional[Dict[str, Mapper]] = None
+
+
+def batch_results(mapper: Mapper, records: list) -> List[dict]:
+    """
+    {"result": to_obj} or {"error": message} for every record, in order. Records
+    rejected by the definition's filter get {"result": None}.
+    """
+    errors = []
+    results: List[dict] = [None] * len(records)
+    for (index, to_obj) in mapper.batch_each(records, mapper, errors):
+        results[index] = {"result": to_obj}
+    for error in errors:
+        results[error.index] = {"error": error.to_dict()["error"]}
+    return results
+
+
+def map_batch(maps: Dict[str, Mapper], from_type, records) -> List[dict]:
+    mapper = maps.get(from_type)
+    if mapper is None:
+        return [{"error": f"Unknown from_type: {from_type}"} for _record in records]
+    return batch_results(mapper, records)
+
+
+def attach_segment(name) -> shared_memory.SharedMemory:
+    """
+    Open a segment the pool's parent process created (and will unlink).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers it again, with the resource tracker the workers
+        # share with their parent: a no-op for a segment it already tracks
+        return shared_memory.SharedMemory(name=name)
+
+
+def init_worker(maps_location, functions_location, modules):
+    global _worker_maps
+    from .loader import create_maps
+
+    for module in modules:
+        importlib.import_module(module)
+    _worker_maps = create_maps(maps_location, functions_location)
+
+
+def map_batch_in_worker(from_type, records):
+    return map_batch(_worker_maps, from_type, records)
+
+
+def map_shared_batch_in_worker(from_type, input_name, input_size, output_name):
+    """
+    Map the marshalled records in segment `input_name` and marshal the results into
+    segment `output_name`. Returns (size, None), or (None, results) when they can't
+    be marshalled or don't fit.
+    """
+    segment = attach_segment(input_name)
+    try:
+        with segment.buf[:input_size] as view:
+            records = marshal.loads(view)
+    finally:
+        segment.close()
+
+    results = map_batch(_worker_maps, from_type, records)
+    try:
+        data = marshal.dumps(results)
+    except ValueError:
+        return (None, results)
+
+    segment = attach_segment(output_name)
+    try:
+        if len(data) > segment.size:
+            return (None, results)
+        segment.buf[: len(data)] = data
+        return (len(data), None)
+    finally:
+        segment.close()
+
+
+class MapperPool:
+    """
+    A ProcessPoolExecutor whose workers each hold their own maps.
+
+    `modules` are imported in every worker before loading the maps, so functions
+    registered with @styx_function at import time exist there too. `transport` is
+    "pickle" or "shared_memory" (see the module docstring).
+    """
+
+    def __init__(
+        self,
+        maps_location="maps",
+        functions_location="functions.styx",
+        modules: Sequence[str] = (),
+        processes=None,
+        transport="pickle",
+    ):
+        if transport not in TRANSPORTS:
+            raise TypeError(
+                f"Unknown transport: {transport}. Expected one of {', '.join(TRANSPORTS)}"
+            )
+        self.transport = transport
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=init_worker,
+            initargs=(maps_location, functions_location, tuple(modules)),
+        )
+
+    def submit(self, from_type, records) -> Future:
+        if self.transport == "shared_memory":
+            return self.submit_shared(from_type, records)
+        return self.executor.submit(map_batch_in_worker, from_type, records)
+
+    def submit_shared(self, from_type, records) -> Future:
+        # Generators can only be read once: the fallback needs the records too
+        records = list(records)
+        try:
+            data = marshal.dumps(records)
+        except ValueError:
+            return self.executor.submit(map_batch_in_worker, from_type, records)
+
+        input_segment = shared_memory.SharedMemory(create=True, size=len(data))
+        input_segment.buf[: len(data)] = data
+        # Pages are only allocated once written, so leave plenty of room
+        output_segment = shared_memory.SharedMemory(
+            create=True, size=4 * len(data) + 65536
+        )
+
+        def release():
+            for segment in (input_segment, output_segment):
+                segment.close()
+                segment.unlink()
+
+        def done(future):
+            try:
+                (size, results) = future.result()
+                if size is not None:
+                    with output_segment.buf[:size] as view:
+                        results = marshal.loads(view)
+                result.set_result(results)
+            except BaseException as exc:
+                result.set_exception(exc)
+            finally:
+                release()
+
+        result = Future()
+        try:
+            future = self.executor.submit(
+                map_shared_batch_in_worker,
+                from_type,
+                input_segment.name,
+                len(data),
+                output_segment.name,
+            )
+        except BaseException:
+            release()
+            raise
+        future.add_done_callback(done)
+        return result
+
+    def map_batch(self, from_type, records) -> List[dict]:
+        return self.submit(from_type, records).result()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,16 +1,32 @@
 """
 Parse, don't validate. - Alexis King
 """
+from collections import Counter
+
 from munch import Munch
 
-from .functions import TomlFunction
-from .shared import OnThrowValue
+from .functions import FunctionRegistry, default_registry, run_sync, scalarize
+from .lookups import (
+    MAPPING_KEY_TYPES,
+    coerce_keys,
+    get_lookup,
+    load_lookup,
+    register_lookups,
+)
+from .rows import make_row_class
+from .shared import OnThrowValue, parse_const, referenced_functions, simple_path
 
 
 def parse_on_throw(from_obj, to_obj):
     """
     Expects "or_else" to already have been processed on "to_obj"
+
+    Without an explicit 'on_throw', the policy is resolved to 'throw' here
+    so the mapper never has to work out the default per record.
     """
+    if not from_obj.get("on_throw"):
+        return OnThrowValue.Throw
+
     throw_action = {
         "or_else": OnThrowValue.OrElse,
         "throw": OnThrowValue.Throw,
@@ -25,7 +41,36 @@ def parse_on_throw(from_obj, to_obj):
     return throw_action
 
 
+def parse_function(function_name, argument_count, registry: FunctionRegistry):
+    """
+    Resolve a function by name, checking its arity against the number of input paths.
+
+    Returns (function, vectorized_function). Asynchronous functions are wrapped to run
+    synchronously; vectorized functions get a per-record adapter as `function`.
+    """
+    if function_name not in registry:
+        raise TypeError(f"unknown function: {function_name}")
+
+    metadata = registry.metadata(function_name)
+    if not metadata.accepts(argument_count):
+        raise TypeError(
+            f"Function '{function_name}' takes {metadata.describe_arity()} argument(s), but {argument_count} input path(s) were given."
+        )
+
+    function = registry[function_name]
+    if metadata.asynchronous:
+        function = run_sync(function)
+    if metadata.vectorized:
+        return scalarize(function), function
+    return function, None
+
+
 class ProcessParser:
+    registry: FunctionRegistry
+
+    def __init__(self, registry: FunctionRegistry = None):
+        self.registry = registry if registry is not None else default_registry
+
     def process(self, process):
         process_obj = Munch()
 
@@ -47,10 +92,12 @@ class ProcessParser:
         else:
             raise TypeError("output_path must be a string.")
 
-        if action.function in TomlFunction._functions:
-            action_obj.function = TomlFunction._functions[action.function]
-        else:
-            raise TypeError(f"unknown function: {action.function}")
+        (function, vectorized_function) = parse_function(
+            action.function, len(action_obj.input_paths), self.registry
+        )
+        action_obj.function = function
+        if vectorized_function is not None:
+            action_obj.vectorized_function = vectorized_function
 
         many = action.pop("many", False) is True
         action_obj.many = many
@@ -58,9 +105,7 @@ class ProcessParser:
         if action.get("or_else"):
             action_obj.or_else = action.or_else
 
-        if action.get("on_throw"):
-            throw_action = parse_on_throw(action, action_obj)
-            action_obj.on_throw = throw_action
+        action_obj.on_throw = parse_on_throw(action, action_obj)
 
         return action_obj
 
@@ -75,6 +120,63 @@ class PostprocessParser(ProcessParser):
         return self.process(postprocess)
 
 
+class FilterParser:
+    registry: FunctionRegistry
+
+    def __init__(self, registry: FunctionRegistry = None):
+        self.registry = registry if registry is not None else default_registry
+
+    def parse(self, filter_):
+        """
+        Named predicates a record must all satisfy to be mapped, checked in order:
+        { field = "status", value = "active" } (or 'values' = [...]), or
+        { function = "is_active", input_paths = [...] } for a truthy result.
+        """
+        if not isinstance(filter_, dict):
+            raise TypeError("'filter' must be a table of predicates.")
+
+        filter_obj = Munch()
+        for name, predicate in filter_.items():
+            filter_obj[name] = self.parse_predicate(name, predicate)
+        return filter_obj
+
+    def parse_predicate(self, name, predicate):
+        if not isinstance(predicate, dict):
+            raise TypeError(f"'filter.{name}' must be a table.")
+        if ("field" in predicate) == ("function" in predicate):
+            raise TypeError(
+                f"'filter.{name}' must declare either 'field' or 'function'."
+            )
+
+        predicate_obj = Munch()
+        if "field" in predicate:
+            if not isinstance(predicate["field"], str):
+                raise TypeError(f"'filter.{name}.field' must be a string.")
+            if ("value" in predicate) == ("values" in predicate):
+                raise TypeError(
+                    f"'filter.{name}' must declare either 'value' or 'values'."
+                )
+            values = (
+                predicate["values"] if "values" in predicate else [predicate["value"]]
+            )
+            if not isinstance(values, list) or not values:
+                raise TypeError(f"'filter.{name}.values' must be a non-empty list.")
+            predicate_obj.field = predicate["field"]
+            predicate_obj["values"] = values
+            return predicate_obj
+
+        input_paths = predicate.get("input_paths")
+        if not isinstance(input_paths, list) or not all(
+            isinstance(element, str) for element in input_paths
+        ):
+            raise TypeError("input_paths must be a list of strings.")
+        predicate_obj.input_paths = input_paths
+        (predicate_obj.function, _vectorized_function) = parse_function(
+            predicate["function"], len(input_paths), self.registry
+        )
+        return predicate_obj
+
+
 class FieldsParser:
     reserved_words = {
         "input_paths",
@@ -86,8 +188,16 @@ class FieldsParser:
         "or_else",
         "on_throw",
         "mapping",
+        "mapping_file",
+        "mapping_key_type",
+        "lookup",
     }
 
+    registry: FunctionRegistry
+
+    def __init__(self, registry: FunctionRegistry = None):
+        self.registry = registry if registry is not None else default_registry
+
     def parse(self, fields):
         field_objs = Munch()
 
@@ -113,26 +223,101 @@ class FieldsParser:
         if hasattr(field, "or_else"):
             field_obj.or_else = field.or_else
 
-        if field.get("on_throw"):
-            throw_action = parse_on_throw(field, field_obj)
-            field_obj.on_throw = throw_action
+        field_obj.on_throw = parse_on_throw(field, field_obj)
 
         if field.get("from_type"):
             # TODO: Is it possible to check valid definitions during parse?
             field_obj.from_type = field.from_type
 
-        if field.get("mapping"):
+        if field.get("lookup"):
+            if field.get("mapping") or field.get("mapping_file"):
+                raise TypeError(
+                    "'lookup' cannot be combined with 'mapping' or 'mapping_file'."
+                )
+            field_obj.mapping = get_lookup(field.lookup)
+            field_obj.mapping_default = field_obj.mapping.default
+        elif field.get("mapping") or field.get("mapping_file"):
             # TODO: 'mapping' and 'from_type' should not both be possible
-            field_obj.mapping = field.mapping
+            (field_obj.mapping, field_obj.mapping_default) = self.parse_mapping(field)
 
         if field.get("function"):
-            if field.function in TomlFunction._functions:
-                field_obj.function = TomlFunction._functions[field.function]
-            else:
-                raise TypeError(f"unknown function: {field.function}")
+            # A function on possible_paths receives the single matching value
+            argument_count = len(field_obj.get("input_paths") or [None])
+            (field_obj.function, _vectorized) = parse_function(
+                field.function, argument_count, self.registry
+            )
+
+        if field_obj.get("input_paths") and not field_obj.get("from_type"):
+            self.fold_constant(field, field_obj)
 
         return field_obj
 
+    def fold_constant(self, field, field_obj):
+        """
+        Fields reading only const('...') inputs are evaluated once, here, when the
+        result can't differ between records: without a function, or with a pure one.
+        """
+        values = []
+        for path in field_obj.input_paths:
+            (value, is_const) = parse_const(path)
+            if not is_const:
+                return
+            values.append(value)
+
+        if field.get("function"):
+            if not self.registry.is_pure(field.function):
+                return
+            try:
+                value = field_obj.function(*values)
+            except Exception:
+                # Left to 'on_throw' for every record, as before
+                return
+        else:
+            value = values[0]
+
+        mapping = field_obj.get("mapping")
+        if mapping is not None:
+            value = mapping.get(value, field_obj.mapping_default)
+
+        # Shared by every output record, so only immutable values are folded
+        if value is None or isinstance(value, (str, int, float, bool)):
+            field_obj._constant = value
+
+    def parse_mapping(self, field):
+        """
+        Compile 'mapping' (and/or an external 'mapping_file') into a plain dict.
+
+        TOML keys are always strings, so 'mapping_key_type' optionally coerces them
+        to the type of the input values. The '__default__' entry is resolved once here.
+        """
+        key_type = field.get("mapping_key_type")
+        if key_type is not None and key_type not in MAPPING_KEY_TYPES:
+            types = ", ".join(MAPPING_KEY_TYPES)
+            raise TypeError(
+                f"Unknown 'mapping_key_type' given: {key_type}. Expected one of: {types}"
+            )
+
+        inline = field.get("mapping") or {}
+        if not isinstance(inline, dict):
+            raise TypeError("'mapping' must be a table.")
+
+        try:
+            table = (
+                load_lookup(field.mapping_file, key_type)
+                if field.get("mapping_file")
+                else {}
+            )
+            if inline:
+                # Inline entries override the shared table; only then is it copied
+                table = {**table, **coerce_keys(inline, key_type)}
+        except ValueError as exc:
+            raise TypeError(
+                f"Unable to coerce 'mapping' keys to {key_type}: {exc}"
+            ) from exc
+
+        default = table.get("__default__")
+        return table, default
+
     def parse_paths(self, field, field_obj):
         if not hasattr(field, "input_paths") and not hasattr(field, "possible_paths"):
             raise TypeError(
@@ -185,6 +370,9 @@ class FieldsParser:
         """
         from_type = field.get("from_type")
         field_obj["_copy_fields"] = []
+        # const('...') values are resolved here, paths are read per record
+        field_obj["_copy_constants"] = {}
+        field_obj["_copy_paths"] = []
 
         for key, value in field.items():
             if key in self.reserved_words:
@@ -199,13 +387,23 @@ class FieldsParser:
                 )
 
             field_obj[key] = value
-            for nested_key in value:
+            for nested_key, path in value.items():
                 field_obj["_copy_fields"].append(nested_key)
+                (const, is_const) = parse_const(path)
+                if is_const:
+                    field_obj["_copy_constants"][nested_key] = const
+                else:
+                    field_obj["_copy_paths"].append((nested_key, path))
 
         return field_obj
 
 
 class Parser:
+    registry: FunctionRegistry
+
+    def __init__(self, registry: FunctionRegistry = None):
+        self.registry = registry if registry is not None else default_registry
+
     def parse(self, toml_obj: Munch):
         if not hasattr(toml_obj, "from_type"):
             raise TypeError("'from_type' must be declared at the top-level.")
@@ -217,29 +415,188 @@ class Parser:
 
         type_ = toml_obj.pop("__type__", "object")
         include_type = toml_obj.pop("include_type", True) is True
+        memoize = toml_obj.pop("memoize", False)
+        impure_functions = sorted(
+            name
+            for name in referenced_functions(toml_obj)
+            if not self.registry.is_pure(name)
+        )
 
-        if type_ not in ("object", "list"):
+        if type_ not in ("object", "list", "row"):
             raise TypeError(
-                f"Only declared types available for __type__ are: object, list. Found: {type_}"
+                f"Only declared types available for __type__ are: object, list, row. Found: {type_}"
             )
 
         parsed_obj = Munch()
+        parsed_obj.from_type = from_type
         parsed_obj.to_type = to_type
         parsed_obj.__type__ = type_
         parsed_obj.include_type = include_type
+        parsed_obj.pure = not impure_functions
+
+        if memoize:
+            parsed_obj.memoize = self.parse_memoize(memoize, impure_functions)
+
+        if toml_obj.get("lookups"):
+            register_lookups(toml_obj.lookups)
+
+        if toml_obj.get("match"):
+            parsed_obj.match = self.parse_match(toml_obj.match)
 
         if toml_obj.get("preprocess"):
-            parser = PreprocessParser()
+            parser = PreprocessParser(self.registry)
             parsed_obj["preprocess"] = parser.parse(toml_obj.preprocess)
 
+        if toml_obj.get("filter"):
+            parser = FilterParser(self.registry)
+            parsed_obj["filter"] = parser.parse(toml_obj["filter"])
+
         if not hasattr(toml_obj, "fields"):
             raise TypeError(
                 "'fields' is a required field for a Styx definition mapping."
             )
-        fields_parser = FieldsParser()
+        fields_parser = FieldsParser(self.registry)
         parsed_obj["fields"] = fields_parser.parse(toml_obj.fields)
 
+        if type_ == "object":
+            parsed_obj["output_schema"] = self.parse_output_schema(parsed_obj.fields)
+
+        path_plan = self.parse_path_plan(parsed_obj.fields)
+        if path_plan:
+            parsed_obj["path_plan"] = path_plan
+
+        if type_ == "row":
+            parsed_obj["row_class"] = self.parse_row_class(
+                to_type, parsed_obj.fields
+            )
+
         if toml_obj.get("postprocess"):
-            parser = PostprocessParser()
+            if type_ == "row":
+                raise TypeError(
+                    "'postprocess' cannot be used with __type__ = 'row'. Rows are immutable."
+                )
+            parser = PostprocessParser(self.registry)
             parsed_obj["postprocess"] = parser.parse(toml_obj.postprocess)
         return from_type, to_type, parsed_obj
+
+    def parse_memoize(self, memoize, impure_functions):
+        """
+        memoize = true, or a table: { size = 1024, scope = "process" | "batch" }
+        """
+        if impure_functions:
+            functions = ", ".join(impure_functions)
+            raise TypeError(
+                f"'memoize' requires every function to be declared pure. Impure functions were: {functions}"
+            )
+
+        memoize_obj = Munch(size=1024, scope="process")
+        if memoize is True:
+            return memoize_obj
+        if not isinstance(memoize, dict):
+            raise TypeError("'memoize' must be true or a table.")
+
+        memoize_obj.update(memoize)
+        if not isinstance(memoize_obj.size, int) or memoize_obj.size < 1:
+            raise TypeError("'memoize.size' must be a positive integer.")
+        if memoize_obj.scope not in ("process", "batch"):
+            raise TypeError(
+                f"'memoize.scope' must be 'process' or 'batch'. Found: {memoize_obj.scope}"
+            )
+        return memoize_obj
+
+    def parse_match(self, match):
+        """
+        Which records a Router sends here: { path = "kind", value = "order" },
+        or with 'values' = [...] for several discriminator values.
+        """
+        if not isinstance(match, dict):
+            raise TypeError("'match' must be a table.")
+        if not isinstance(match.get("path"), str):
+            raise TypeError("'match.path' must be a string.")
+        if ("value" in match) == ("values" in match):
+            raise TypeError("'match' must declare either 'value' or 'values'.")
+
+        values = match["values"] if "values" in match else [match["value"]]
+        if not isinstance(values, list) or not values:
+            raise TypeError("'match.values' must be a non-empty list.")
+        return Munch(path=match["path"], values=values)
+
+    def parse_output_schema(self, fields):
+        """
+        Derive where each field lands in the output object, so the mapper doesn't
+        re-split dotted field names per record: (field_name, parent_keys, key).
+
+        parent_keys is () for top-level keys, and None for names the mapper must
+        leave to pydash (list indexes, brackets, escapes).
+        """
+        schema = []
+        for field_name in fields:
+            if field_name == "many":
+                continue
+            keys = field_name.split(".")
+            if any(
+                not key or key.isdigit() or "[" in key or "\\" in key for key in keys
+            ):
+                schema.append((field_name, None, field_name))
+            else:
+                schema.append((field_name, tuple(keys[:-1]), keys[-1]))
+        return schema
+
+    def parse_path_plan(self, fields):
+        """
+        Common-subexpression elimination for input paths. Every prefix shared by
+        several paths (or a path read more than once) is resolved once per record,
+        and the paths below it are read from there.
+
+        A list of (path, base_path, keys) in resolution order. base_path is None
+        for paths read from the record itself.
+        """
+        counts = Counter()
+        paths = set()
+        for field_name, field in fields.items():
+            if field_name == "many" or "_constant" in field:
+                continue
+            for path in field.get("input_paths") or field.get("possible_paths"):
+                keys = simple_path(path)
+                if not keys or parse_const(path)[1]:
+                    continue
+                paths.add(keys)
+                for depth in range(1, len(keys) + 1):
+                    counts[keys[:depth]] += 1
+
+        children = Counter(keys[:-1] for keys in counts if len(keys) > 1)
+        # Prefixes that only lead to a single longer prefix are skipped over
+        shared = {
+            keys
+            for keys, count in counts.items()
+            if count > 1 and (keys in paths or children[keys] > 1)
+        }
+        if not shared:
+            return []
+
+        planned = shared | {
+            keys
+            for keys in paths
+            if any(keys[:depth] in shared for depth in range(1, len(keys)))
+        }
+        plan = []
+        for keys in sorted(planned, key=lambda keys: (len(keys), keys)):
+            base = next(
+                (
+                    keys[:depth]
+                    for depth in range(len(keys) - 1, 0, -1)
+                    if keys[:depth] in shared
+                ),
+                (),
+            )
+            plan.append((".".join(keys), ".".join(base) or None, keys[len(base) :]))
+        return plan
+
+    def parse_row_class(self, to_type, fields):
+        field_names = [field_name for field_name in fields if field_name != "many"]
+        try:
+            return make_row_class(to_type, field_names)
+        except ValueError as exc:
+            raise TypeError(
+                f"Field names must be valid identifiers when __type__ = 'row': {exc}"
+            )
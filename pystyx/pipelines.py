@@ -0,0 +1,272 @@
+"""
+Chained definitions: the output of each Mapper is the input of the next.
+
+    orders = pystyx.pipeline(maps, ["raw_order", "order", "warehouse_order"])
+    warehouse_order = orders(raw_order)
+
+When every stage allows it (see `fusion_blocker`), the stages are fused into a
+single pass: no intermediate objects are built, and each stage reads the fields of
+the stage before it straight from the original input. Fields of intermediate
+stages that no later stage reads are only evaluated when they could reject the
+record (see `may_raise`), so a fused pipeline accepts exactly the records the
+Mappers run one after the other would. Otherwise the Mappers run one after the
+other.
+"""
+from typing import Dict, List, Optional
+
+from .mapper import Mapper
+from .shared import OnThrowValue, get_path, parse_const, simple_path
+
+# Fused stages read their inputs from `resolved` only
+NO_INPUT = {}
+_SKIPPED = object()
+
+
+def fusion_blocker(mappers: List[Mapper]) -> Optional[str]:
+    """
+    Why the stages can't be fused, or None if they can.
+    """
+    for index, mapper in enumerate(mappers):
+        definition = mapper.definition
+        name = mapper.from_type
+        if definition.__type__ != "object":
+            return f"{name} doesn't output an object"
+        if definition.fields["many"]:
+            return f"{name} is a 'many' definition"
+        if index < len(mappers) - 1:
+            if definition.get("postprocess"):
+                return f"{name} has postprocess steps"
+            if output_tree(definition) is None:
+                return f"{name} has output fields pydash has to place"
+        if index == 0:
+            continue
+        if definition.get("preprocess"):
+            return f"{name} has preprocess steps"
+        if definition.get("filter"):
+            return f"{name} has a filter"
+        for field_name, field in definition.fields.items():
+            if field_name == "many":
+                continue
+            if field.get("possible_paths") or field.get("_copy_paths"):
+                return f"{name}.{field_name} reads paths outside of 'input_paths'"
+            for path in field.input_paths:
+                if not parse_const(path)[1] and not simple_path(path):
+                    return f"{name}.{field_name} reads {path!r}"
+    return None
+
+
+def may_raise(field) -> bool:
+    """
+    Whether mapping the field can raise despite its 'on_throw' policy
+    """
+    if "_constant" in field:
+        return False
+    return (
+        field.get("on_throw", OnThrowValue.Throw) is OnThrowValue.Throw
+        or bool(field.get("from_type"))
+        or field.get("mapping") is not None
+    )
+
+
+def output_tree(definition):
+    """
+    The shape of the definition's output: nested dicts of output keys, with
+    ("field", field_name) or ("const", value) leaves. None if a field lands
+    somewhere only pydash can work out.
+    """
+    tree = {}
+    if definition.include_type:
+        tree["__type__"] = ("const", definition.to_type)
+    for (field_name, parent_keys, key) in definition.output_schema:
+        if parent_keys is None:
+            return None
+        node = tree
+        for parent_key in parent_keys:
+            node = node.setdefault(parent_key, {})
+            if not isinstance(node, dict):
+                return None
+        if key in node:
+            return None
+        node[key] = ("field", field_name)
+    return tree
+
+
+def compile_reader(tree, path):
+    """
+    How to read `path` from a stage's output without building it:
+    (leaf, rest_of_path), ("subtree", node) or None when nothing lands there.
+    """
+    keys = simple_path(path)
+    node = tree
+    for depth, key in enumerate(keys):
+        node = node.get(key)
+        if node is None:
+            return None
+        if isinstance(node, tuple):
+            return (node, ".".join(keys[depth + 1 :]))
+    return (("subtree", node), "")
+
+
+class Pipeline:
+    mappers: List[Mapper]
+    fused: bool
+    blocker: Optional[str]
+
+    def __init__(self, mappers: List[Mapper]):
+        if not mappers:
+            raise TypeError("A pipeline needs at least one Mapper.")
+        self.mappers = list(mappers)
+        self.blocker = fusion_blocker(self.mappers)
+        self.fused = self.blocker is None
+        if self.fused:
+            self.trees = [output_tree(mapper.definition) for mapper in self.mappers]
+            # Per intermediate stage: fields evaluated even when nothing reads them
+            self.checked = [
+                [
+                    field_name
+                    for field_name, field in mapper.definition.fields.items()
+                    if field_name != "many" and may_raise(field)
+                ]
+                for mapper in self.mappers[:-1]
+            ]
+            # Per stage (but the first): field_name -> [(path, reader)]
+            self.readers = [None] + [
+                self.compile_readers(mapper.definition, previous_tree)
+                for mapper, previous_tree in zip(self.mappers[1:], self.trees)
+            ]
+
+    def compile_readers(self, definition, tree) -> Dict[str, list]:
+        readers = {}
+        for field_name, field in definition.fields.items():
+            if field_name == "many" or "_constant" in field:
+                continue
+            readers[field_name] = [
+                (path, compile_reader(tree, path))
+                for path in field.input_paths
+                if not parse_const(path)[1]
+            ]
+        return readers
+
+    def __call__(self, from_obj):
+        """
+        None when a stage's filter rejects the record
+        """
+        if not self.fused:
+            for mapper in self.mappers:
+                from_obj = mapper(from_obj)
+                if from_obj is None and mapper.filterMapper.predicates:
+                    return None
+            return from_obj
+        return self._map_fused(from_obj)
+
+    def batch(self, from_objs):
+        """
+        Yield the mapped records, leaving out the rejected ones
+        """
+        for from_obj in from_objs:
+            to_obj = self(from_obj)
+            if to_obj is not None:
+                yield to_obj
+
+    def __repr__(self):
+        stages = " -> ".join(mapper.from_type for mapper in self.mappers)
+        return f"<Pipeline: {stages}{' (fused)' if self.fused else ''}>"
+
+    def _map_fused(self, from_obj):
+        first = self.mappers[0]
+        record = first.preprocessMapper(from_obj)
+        if first.filterMapper.predicates and not first.filterMapper.accepts(record):
+            return None
+        if len(self.mappers) == 1:
+            return first.postprocessMapper(first.fieldsMapper(record))
+
+        cache = {}
+        last_index = len(self.mappers) - 1
+        for index in range(last_index):
+            # Raise where the sequential Mappers would, even for unread fields
+            for field_name in self.checked[index]:
+                self.field_value(index, field_name, record, cache)
+        last = self.mappers[last_index]
+        resolved = self.resolve(last_index, self.readers[last_index], record, cache)
+        definition = last.definition
+        to_obj = {"__type__": definition.to_type} if definition.include_type else {}
+        to_obj = last.fieldsMapper._map_schema(
+            NO_INPUT, to_obj, definition.output_schema, resolved
+        )
+        return last.postprocessMapper(to_obj)
+
+    def resolve(self, index, readers, record, cache):
+        """
+        Values of every path stage `index` reads, taken from stage `index - 1`
+        """
+        resolved = {}
+        for field_readers in readers.values():
+            for (path, reader) in field_readers:
+                if path not in resolved:
+                    resolved[path] = self.read(index - 1, reader, record, cache)
+        return resolved
+
+    def read(self, index, reader, record, cache):
+        if reader is None:
+            return None
+        ((kind, payload), rest) = reader
+        if kind == "subtree":
+            # Parents only exist once a field below them is set
+            return self.materialize(index, payload, record, cache) or None
+        if kind == "const":
+            value = payload
+        else:
+            value = self.field_value(index, payload, record, cache)
+            if value is _SKIPPED:
+                return None
+        return get_path(value, rest, None) if rest else value
+
+    def materialize(self, index, node, record, cache):
+        """
+        Build the part of stage `index`'s output below `node`, when a later stage
+        reads it as a whole.
+        """
+        obj = {}
+        for key, child in node.items():
+            if isinstance(child, dict):
+                value = self.materialize(index, child, record, cache)
+                if value:
+                    obj[key] = value
+            elif child[0] == "const":
+                obj[key] = child[1]
+            else:
+                value = self.field_value(index, child[1], record, cache)
+                if value is not _SKIPPED:
+                    obj[key] = value
+        return obj
+
+    def field_value(self, index, field_name, record, cache):
+        key = (index, field_name)
+        if key in cache:
+            return cache[key]
+
+        fields_mapper = self.mappers[index].fieldsMapper
+        field = fields_mapper.definition.fields[field_name]
+        if index == 0:
+            (from_obj, resolved) = (record, None)
+        else:
+            readers = {field_name: self.readers[index].get(field_name, [])}
+            (from_obj, resolved) = (
+                NO_INPUT,
+                self.resolve(index, readers, record, cache),
+            )
+        (value, skip) = fields_mapper.get_field_value(
+            field_name, from_obj, field, resolved
+        )
+        cache[key] = _SKIPPED if skip else value
+        return cache[key]
+
+
+def pipeline(maps: Dict[str, Mapper], from_types: List[str]) -> Pipeline:
+    """
+    Chain the Mappers of `from_types` (from `create_maps`), in order.
+    """
+    unknown = [from_type for from_type in from_types if from_type not in maps]
+    if unknown:
+        raise TypeError(f"Unknown from_type in pipeline: {', '.join(unknown)}")
+    return Pipeline([maps[from_type] for from_type in from_types])
@@ -0,0 +1,138 @@
+"""
+Dispatch records of a mixed stream to the right Mapper.
+
+A Router indexes the Mappers from `create_maps` by discriminator value: with a
+`discriminator` path, a record goes to the Mapper whose `from_type` equals the
+value found there; definitions can also declare their own rule:
+
+    [match]
+    path = "event.kind"
+    values = ["order.created", "order.updated"]
+
+`Router.batch` groups records by Mapper, so each Mapper maps a contiguous run of
+records (one `Mapper.batch` per group) before the results are put back in order.
+"""
+from typing import Any, Dict, List, Optional
+
+from .errors import RecordError, TooManyErrors
+from .mapper import Mapper
+from .shared import get_path
+
+
+class Router:
+    index: Dict[str, Dict[Any, Mapper]]
+    paths: List[str]
+    default: Optional[Mapper]
+
+    def __init__(self, maps: Dict[str, Mapper], discriminator=None, default=None):
+        """
+        `default` (a from_type) receives records no rule matches.
+        """
+        self.index = {}
+        if discriminator is not None:
+            for from_type, mapper in maps.items():
+                if not mapper.definition.get("match"):
+                    self.add_route(discriminator, from_type, mapper)
+        for mapper in maps.values():
+            match = mapper.definition.get("match")
+            if match:
+                for value in match["values"]:
+                    self.add_route(match.path, value, mapper)
+        self.paths = list(self.index)
+        self.default = maps[default] if default is not None else None
+
+    def add_route(self, path, value, mapper):
+        routes = self.index.setdefault(path, {})
+        try:
+            existing = routes.setdefault(value, mapper)
+        except TypeError:
+            raise TypeError(
+                f"Unhashable match value for {mapper.from_type}: {value!r}"
+            ) from None
+        if existing is not mapper:
+            raise TypeError(
+                f"{path} = {value!r} matches both {existing.from_type} and {mapper.from_type}"
+            )
+
+    def route(self, record) -> Optional[Mapper]:
+        """
+        The Mapper for `record`, or the default one (None without a default)
+        """
+        for path in self.paths:
+            value = get_path(record, path, None)
+            try:
+                mapper = self.index[path].get(value)
+            except TypeError:
+                # Unhashable values never match
+                continue
+            if mapper is not None:
+                return mapper
+        return self.default
+
+    def __call__(self, record):
+        mapper = self.route(record)
+        if mapper is None:
+            raise ValueError("No Mapper matches record.")
+        return mapper(record)
+
+    def group(self, records):
+        """
+        {Mapper: [(index, record)]} in order of first appearance; records without
+        a Mapper are grouped under None.
+        """
+        groups: Dict[Optional[Mapper], list] = {}
+        for index, record in enumerate(records):
+            groups.setdefault(self.route(record), []).append((index, record))
+        return groups
+
+    def batch(self, records, errors=None, max_errors=None, rejected=None):
+        """
+        Map every record with its Mapper, one group of records per Mapper, and
+        return the mapped records in input order.
+
+        `errors`, `max_errors` and `rejected` work as in `Mapper.batch`, counted
+        over the whole batch; reported indexes are indexes in `records`. Records no
+        Mapper matches fail with a ValueError.
+        """
+        results = {}
+        failed: List[RecordError] = []
+        for mapper, group in self.group(records).items():
+            if mapper is None:
+                for (index, record) in group:
+                    exc = ValueError("No Mapper matches record.")
+                    if errors is None:
+                        raise exc
+                    failed.append(RecordError(index, record, None, exc))
+                    errors.append(failed[-1])
+                    if max_errors is not None and len(failed) > max_errors:
+                        raise TooManyErrors(failed) from exc
+                continue
+
+            indexes = [index for (index, _record) in group]
+            filtering = bool(mapper.filterMapper.predicates)
+            group_errors = [] if errors is not None else None
+            mapped = mapper.batch_each(
+                [record for (_index, record) in group],
+                mapper,
+                errors=group_errors,
+                max_errors=None if max_errors is None else max_errors - len(failed),
+            )
+            try:
+                for (position, to_obj) in mapped:
+                    if filtering and to_obj is None:
+                        if rejected is not None:
+                            rejected.append(indexes[position])
+                        continue
+                    results[indexes[position]] = to_obj
+            except TooManyErrors as exc:
+                too_many = exc
+            else:
+                too_many = None
+            for error in group_errors or ():
+                error.index = indexes[error.index]
+                failed.append(error)
+                errors.append(error)
+            if too_many is not None:
+                # Only this group's errors: report those of the whole batch
+                raise TooManyErrors(failed) from too_many
+        return [results[index] for index in sorted(results)]
@@ -0,0 +1,30 @@
+"""
+Fixed-schema rows for definitions declared with `__type__ = "row"`.
+
+Rows are tuples, so they carry no per-record dict. The field names and
+`__type__` live on the shared row class.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+
+def make_row_class(to_type, field_names):
+    return _row_class(to_type, tuple(field_names))
+
+
+@lru_cache(maxsize=None)
+def _row_class(to_type, field_names):
+    typename = to_type if to_type.isidentifier() else "Row"
+    row_class = namedtuple(typename, field_names)
+    row_class.__type__ = to_type
+    # The class is built at runtime, so pickle can't find it by name: rebuild it
+    # from the schema instead (rows sent back from worker processes)
+    row_class.__reduce__ = lambda row: (
+        _rebuild_row,
+        (to_type, row._fields, tuple(row)),
+    )
+    return row_class
+
+
+def _rebuild_row(to_type, field_names, values):
+    return make_row_class(to_type, field_names)._make(values)
@@ -0,0 +1,223 @@
+"""
+A local mapping server: `python -m pystyx serve`.
+
+Maps are loaded once and shared by every client. Clients send NDJSON requests over
+a Unix domain socket (or localhost TCP), one per line:
+
+    {"id": 1, "from_type": "erp_order", "record": {...}}
+
+and get one line back per request, in completion order:
+
+    {"id": 1, "result": {...}}    or    {"id": 1, "error": "ValueError: ..."}
+
+Concurrent requests for the same from_type are micro-batched: the first request
+of a batch waits at most `window` seconds for others to join (or until
+`max_batch` requests are pending), then the whole batch is mapped at once, in a
+MapperPool when the server runs with worker processes.
+
+Request lines longer than `line_limit` bytes are skipped and answered with an error.
+"""
+import asyncio
+import importlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .mapper import Mapper
+from .parallel import MapperPool, map_batch
+
+LINE_LIMIT = 16 * 1024 * 1024
+
+
+class MappingServer:
+    maps: Optional[Dict[str, Mapper]]
+    pool: Optional[MapperPool]
+    executor: Optional[ThreadPoolExecutor]
+    window: float
+    max_batch: int
+    line_limit: int
+
+    def __init__(
+        self, maps=None, pool=None, window=0.002, max_batch=256, line_limit=LINE_LIMIT
+    ):
+        """
+        Map in `pool` when given, otherwise in this process with `maps`.
+        """
+        if (maps is None) == (pool is None):
+            raise TypeError("MappingServer needs either maps or a pool.")
+        self.maps = maps
+        self.pool = pool
+        # A single thread: batches must not overlap, Mappers (memo caches, tracing)
+        # aren't thread-safe
+        self.executor = ThreadPoolExecutor(max_workers=1) if pool is None else None
+        self.window = window
+        self.max_batch = max_batch
+        self.line_limit = line_limit
+        self.pending: Dict[str, List[Tuple[dict, asyncio.Future]]] = {}
+        self.batches = 0
+
+    async def submit(self, from_type, record):
+        """
+        Map a single record, as part of the next batch for its from_type.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self.pending.setdefault(from_type, [])
+        pending.append((record, future))
+        if len(pending) >= self.max_batch:
+            self.flush(from_type)
+        elif len(pending) == 1:
+            loop.call_later(self.window, self.flush, from_type)
+        return await future
+
+    def flush(self, from_type):
+        batch = self.pending.pop(from_type, None)
+        if not batch:
+            return
+        self.batches += 1
+        asyncio.ensure_future(self.run_batch(from_type, batch))
+
+    async def run_batch(self, from_type, batch):
+        records = [record for (record, _future) in batch]
+        try:
+            if self.pool is not None:
+                future = self.pool.submit(from_type, records)
+                results = await asyncio.wrap_future(future)
+            else:
+                # Off the event loop: it stays responsive, and async functions
+                # (run_sync) need a thread without a running loop
+                loop = asyncio.get_running_loop()
+                results = await loop.run_in_executor(
+                    self.executor, map_batch, self.maps, from_type, records
+                )
+        except Exception as exc:
+            results = [{"error": f"{type(exc).__name__}: {exc}"} for _ in records]
+        for (_record, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def handle_request(self, line, writer, write_lock):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            (from_type, record) = (request["from_type"], request["record"])
+        except (ValueError, KeyError, AttributeError) as exc:
+            response = {"error": f"Malformed request: {exc!r}"}
+        else:
+            response = await self.submit(from_type, record)
+        await self.respond({"id": request_id, **response}, writer, write_lock)
+
+    async def respond(self, response, writer, write_lock):
+        async with write_lock:
+            writer.write(json.dumps(response, default=repr).encode("utf-8") + b"\n")
+            await writer.drain()
+
+    async def skip_line(self, reader, consumed):
+        """
+        Discard a line longer than the reader's limit, `consumed` bytes at a time.
+        """
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b"\n")
+                return
+            except asyncio.LimitOverrunError as exc:
+                consumed = exc.consumed
+            except asyncio.IncompleteReadError:
+                return
+
+    async def handle_connection(self, reader, writer):
+        tasks = set()
+        write_lock = asyncio.Lock()
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as exc:
+                    # Last line without a newline, or b"" once the client is done
+                    line = exc.partial
+                except asyncio.LimitOverrunError as exc:
+                    await self.skip_line(reader, exc.consumed)
+                    error = f"Request line longer than {self.line_limit} bytes"
+                    await self.respond({"id": None, "error": error}, writer, write_lock)
+                    continue
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.ensure_future(
+                    self.handle_request(line, writer, write_lock)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    async def start(self, socket_path=None, host="127.0.0.1", port=8765):
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            return await asyncio.start_unix_server(
+                self.handle_connection, path=socket_path, limit=self.line_limit
+            )
+        return await asyncio.start_server(
+            self.handle_connection, host, port, limit=self.line_limit
+        )
+
+
+def serve(
+    maps_location="maps",
+    functions_location="functions.styx",
+    socket_path=None,
+    host="127.0.0.1",
+    port=8765,
+    processes=None,
+    modules=(),
+    window=0.002,
+    max_batch=256,
+    transport="pickle",
+    line_limit=LINE_LIMIT,
+):
+    """
+    Run the server until interrupted. `processes=0` maps in the server process.
+    """
+    from .loader import create_maps
+
+    if processes == 0:
+        for module in modules:
+            importlib.import_module(module)
+        server = MappingServer(
+            maps=create_maps(maps_location, functions_location),
+            window=window,
+            max_batch=max_batch,
+            line_limit=line_limit,
+        )
+    else:
+        pool = MapperPool(
+            maps_location, functions_location, modules, processes, transport
+        )
+        server = MappingServer(
+            pool=pool, window=window, max_batch=max_batch, line_limit=line_limit
+        )
+
+    async def run():
+        listener = await server.start(socket_path, host, port)
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
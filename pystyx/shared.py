@@ -1,4 +1,8 @@
+import hashlib
+import inspect
+import json
 from enum import Enum
+from types import CodeType
 
 
 class OnThrowValue(Enum):
@@ -7,9 +11,154 @@ class OnThrowValue(Enum):
     Skip = "skip"
 
 
+class Failure:
+    """
+    Result of a missing value, an unmatched path or a raising function.
+
+    Returned instead of raising, so 'skip' and 'or_else' policies never pay for
+    building and unwinding an exception. Only the 'throw' policy raises.
+    """
+
+    __slots__ = ("error_class", "message", "exc")
+
+    def __init__(self, error_class=None, message=None, exc=None):
+        self.error_class = error_class
+        self.message = message
+        self.exc = exc
+
+    def to_exception(self):
+        if self.exc is not None:
+            return self.exc
+        return self.error_class(self.message)
+
+
+MISSING_VALUE = Failure(ValueError, "No value found for path.")
+NO_MATCHING_PATH = Failure(
+    RuntimeError,
+    "Unable to determine input path. Unable to find option satisfying predicate.",
+)
+AMBIGUOUS_PATH = Failure(
+    RuntimeError,
+    "Unable to determine input path. Found more than one option satisfying predicate.",
+)
+
+
 def parse_const(s):
     is_const = False
     if s.startswith("const('") and s.endswith("')"):
         is_const = True
         return s[7:-2], is_const
     return s, is_const
+
+
+_MISSING = object()
+_simple_paths = {}
+
+
+def simple_path(path):
+    """
+    The keys of a plain dotted path ("a.b.c"), or () for anything pydash has to
+    interpret (list indexes, brackets, escapes, empty keys).
+    """
+    keys = _simple_paths.get(path)
+    if keys is None:
+        keys = tuple(path.split("."))
+        if any(
+            not key or key.isdigit() or "[" in key or "\\" in key for key in keys
+        ):
+            keys = ()
+        if len(_simple_paths) < 4096:
+            _simple_paths[path] = keys
+    return keys
+
+
+def get_path(obj, path, default=None):
+    """
+    pydash.get for plain dotted paths through dicts, without importing pydash.
+    Anything else (e.g. attributes of other objects) falls back to pydash.
+    """
+    keys = simple_path(path) if path.__class__ is str else ()
+    if keys:
+        value = obj
+        for key in keys:
+            if not isinstance(value, dict):
+                break
+            value = value.get(key, _MISSING)
+            if value is _MISSING:
+                # What pydash returns too
+                return default
+        else:
+            return value
+
+    from pydash import get
+
+    return get(obj, path, default)
+
+
+def set_path(obj, path, value):
+    """
+    pydash.set_ for plain dotted paths through dicts, without importing pydash.
+    """
+    keys = simple_path(path) if path.__class__ is str else ()
+    if keys and isinstance(obj, dict):
+        target = obj
+        for key in keys[:-1]:
+            child = target.get(key, _MISSING)
+            if child is _MISSING:
+                child = target[key] = {}
+            elif not isinstance(child, dict):
+                break
+            target = child
+        else:
+            target[keys[-1]] = value
+            return obj
+
+    from pydash import set_
+
+    return set_(obj, path, value)
+
+
+def content_hash(obj) -> str:
+    """
+    Stable hash of a JSON-like object (key order doesn't matter).
+    """
+    encoded = json.dumps(obj, sort_keys=True, default=repr, separators=(",", ":"))
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _code_fingerprint(code: CodeType, digest):
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode("utf-8"))
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            _code_fingerprint(const, digest)
+        else:
+            digest.update(repr(const).encode("utf-8"))
+
+
+def function_fingerprint(function) -> str:
+    """
+    Changes whenever the function's code (or a default argument) changes.
+    """
+    function = inspect.unwrap(function)
+    digest = hashlib.blake2b(digest_size=16)
+    code = getattr(function, "__code__", None)
+    if code is None:
+        name = getattr(function, "__qualname__", repr(function))
+        digest.update(f"{getattr(function, '__module__', '')}.{name}".encode("utf-8"))
+    else:
+        _code_fingerprint(code, digest)
+        digest.update(repr(getattr(function, "__defaults__", None)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def referenced_functions(toml_map):
+    """
+    Names of every 'function' referenced by a (raw) definition.
+    """
+    names = set()
+    for section in ("preprocess", "filter", "fields", "postprocess"):
+        for value in (toml_map.get(section) or {}).values():
+            if isinstance(value, dict) and isinstance(value.get("function"), str):
+                names.add(value["function"])
+    return names
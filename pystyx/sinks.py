@@ -0,0 +1,289 @@
+"""
+Columnar sinks for mapped output.
+
+A sink maps records with a `Mapper` and accumulates the results into column
+buffers instead of keeping a dict per record around. Every `row_group_size`
+records the buffers are flushed as one row group:
+
+- a `pyarrow.Table` when pyarrow is installed,
+- otherwise a dict of column name -> `numpy` array when numpy is installed,
+- otherwise a dict of column name -> list.
+
+Columns and their types outlive the row group: every group has every column seen so
+far (None where a record didn't set it), and a column's type only ever widens (an
+int column that later gets a float is a float column from then on).
+"""
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - depends on the environment
+    pyarrow = None
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - depends on the environment
+    numpy = None
+
+from .mapper import Mapper
+
+
+def flatten_record(record, prefix="", out=None):
+    """
+    Flatten nested dicts (e.g. nested `from_type` output) into dotted column names.
+    Lists (e.g. `many` fields) are kept as list values.
+    """
+    out = {} if out is None else out
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flatten_record(value, f"{name}.", out)
+        else:
+            out[name] = value
+    return out
+
+
+_SCALARS = {bool, int, float, str}
+
+
+def observed_type(types):
+    """
+    Reduce the set of python types seen in a column to a single column type name.
+    Scalars that don't widen into one another (e.g. ints and a string `mapping`
+    default) are "mixed".
+    """
+    if not types:
+        return "null"
+    if types == {bool}:
+        return "bool"
+    if types <= {int}:
+        return "int"
+    if types <= {int, float}:
+        return "float"
+    if types == {str}:
+        return "str"
+    if types <= _SCALARS:
+        return "mixed"
+    return "object"
+
+
+def _arrow_type(column_type):
+    return {
+        "bool": pyarrow.bool_(),
+        "int": pyarrow.int64(),
+        "float": pyarrow.float64(),
+        "str": pyarrow.string(),
+        "mixed": pyarrow.string(),
+        "null": pyarrow.null(),
+    }.get(column_type)
+
+
+def _arrow_array(name, values, column_type):
+    if column_type == "mixed":
+        values = [None if value is None else str(value) for value in values]
+    try:
+        return pyarrow.array(values, type=_arrow_type(column_type))
+    except (pyarrow.ArrowException, OverflowError) as exc:
+        raise TypeError(
+            f"Unable to convert column {name!r} ({column_type}) to Arrow: {exc}"
+        ) from exc
+
+
+def _numpy_array(values, column_type, has_nulls):
+    if column_type == "float":
+        return numpy.array(
+            [numpy.nan if value is None else value for value in values],
+            dtype=numpy.float64,
+        )
+    if not has_nulls and column_type in ("bool", "int", "str"):
+        dtype = {"bool": numpy.bool_, "int": numpy.int64, "str": numpy.str_}
+        return numpy.array(values, dtype=dtype[column_type])
+    array = numpy.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+class ColumnarSink:
+    """
+    Map records and buffer them column by column.
+
+    `on_flush` is called with every flushed row group. `flatten` controls
+    whether nested dicts become dotted columns or are kept as struct values.
+    """
+
+    mapper: Mapper
+    row_group_size: int
+    on_flush: Optional[Callable[[Any], None]]
+    flatten: bool
+
+    def __init__(self, mapper, row_group_size=65536, on_flush=None, flatten=True):
+        self.mapper = mapper
+        self.row_group_size = row_group_size
+        self.on_flush = on_flush
+        self.flatten = flatten
+        self.columns: Dict[str, List[Any]] = {}
+        self.types: Dict[str, set] = {}
+        self._reset()
+
+    def _reset(self):
+        # Only the values: column names and types carry over to the next row group
+        self.columns = {name: [] for name in self.columns}
+        self.nulls: Dict[str, bool] = {name: False for name in self.columns}
+        self.num_rows = 0
+
+    def __call__(self, from_obj):
+        self.write(from_obj)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, from_obj):
+        """
+        Map a single input object and buffer the result.
+        `many` definitions buffer one row per mapped record.
+        """
+        to_obj = self.mapper(from_obj)
+        if isinstance(to_obj, list):
+            for record in to_obj:
+                self.append(record)
+        else:
+            self.append(to_obj)
+
+    def write_many(self, from_objs):
+        for from_obj in from_objs:
+            self.write(from_obj)
+
+    def append(self, record):
+        """
+        Buffer an already mapped record (dict or row).
+        """
+        if record is None:
+            return
+        if hasattr(record, "_fields"):
+            items = zip(record._fields, record)
+        elif self.flatten:
+            items = flatten_record(record).items()
+        else:
+            items = record.items()
+
+        num_rows = self.num_rows
+        for name, value in items:
+            column = self.columns.get(name)
+            if column is None:
+                # Backfill columns that show up after the first record
+                column = self.columns[name] = [None] * num_rows
+                self.types[name] = set()
+                self.nulls[name] = num_rows > 0
+            column.append(value)
+            if value is None:
+                self.nulls[name] = True
+            else:
+                self.types[name].add(type(value))
+
+        num_rows += 1
+        for name, column in self.columns.items():
+            if len(column) < num_rows:
+                column.append(None)
+                self.nulls[name] = True
+        self.num_rows = num_rows
+
+        if self.num_rows >= self.row_group_size:
+            self.flush()
+
+    def column_types(self):
+        return {name: observed_type(types) for name, types in self.types.items()}
+
+    def build_row_group(self):
+        column_types = self.column_types()
+        if pyarrow is not None:
+            arrays = [
+                _arrow_array(name, values, column_types[name])
+                for name, values in self.columns.items()
+            ]
+            return pyarrow.Table.from_arrays(arrays, names=list(self.columns))
+        if numpy is not None:
+            return {
+                name: _numpy_array(values, column_types[name], self.nulls[name])
+                for name, values in self.columns.items()
+            }
+        return self.columns
+
+    def flush(self):
+        """
+        Emit the buffered records as one row group and clear the buffers (also
+        when the row group can't be built).
+        """
+        if not self.num_rows:
+            return None
+        try:
+            row_group = self.build_row_group()
+        finally:
+            # A row group that can't be built is dropped: every later record
+            # would retry it and fail the same way
+            self._reset()
+        if self.on_flush is not None:
+            self.on_flush(row_group)
+        return row_group
+
+    def close(self):
+        self.flush()
+
+
+class ParquetSink(ColumnarSink):
+    """
+    Columnar sink writing each row group straight to a Parquet file. Requires pyarrow.
+
+    A Parquet file has a single schema: `schema` (a `pyarrow.Schema`) by default
+    that of the first row group. Later row groups are cast to it, so pass `schema`
+    when the first group can't tell a column's type (all None, or ints that later
+    become floats).
+    """
+
+    def __init__(self, mapper, path, row_group_size=65536, flatten=True, schema=None):
+        if pyarrow is None:
+            raise RuntimeError("ParquetSink requires pyarrow to be installed.")
+        super().__init__(mapper, row_group_size, self._write_row_group, flatten)
+        self.path = path
+        self.schema = schema
+        self.writer = None
+
+    def _write_row_group(self, table):
+        if self.writer is None:
+            schema = self.schema if self.schema is not None else table.schema
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, schema)
+        schema = self.writer.schema
+        if not table.schema.equals(schema):
+            table = self.conform(table, schema)
+        self.writer.write_table(table)
+
+    def conform(self, table, schema):
+        """
+        `table` with the columns and types of `schema`, missing columns as nulls.
+        """
+        extra = [name for name in table.column_names if name not in schema.names]
+        if extra:
+            raise TypeError(
+                f"Columns {', '.join(extra)} aren't in the schema of {self.path}"
+            )
+        columns = [
+            table.column(field.name)
+            if field.name in table.column_names
+            else pyarrow.nulls(table.num_rows, field.type)
+            for field in schema
+        ]
+        try:
+            return pyarrow.Table.from_arrays(columns, names=schema.names).cast(schema)
+        except pyarrow.ArrowException as exc:
+            raise TypeError(
+                f"Row group doesn't fit the schema of {self.path}: {exc}"
+            ) from exc
+
+    def close(self):
+        super().close()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
@@ -0,0 +1,74 @@
+"""
+Sampled tracing of field-level data flow.
+
+One in `sample_rate` records is traced: for every field, the input paths read,
+the values found there, the function applied, the time spent and the `on_throw`
+outcome. Traces go to a bounded ring buffer and, optionally, a JSONL file.
+Records that are not sampled only pay for a counter increment.
+"""
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class Tracer:
+    sample_rate: int
+    traces: Deque[Dict[str, Any]]
+    path: Optional[str]
+
+    def __init__(self, sample_rate=1000, capacity=1000, path=None):
+        if sample_rate < 1:
+            raise ValueError("sample_rate must be at least 1.")
+        self.sample_rate = sample_rate
+        self.traces = deque(maxlen=capacity)
+        self.path = path
+        self._count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    def should_sample(self) -> bool:
+        self._count += 1
+        return self._count % self.sample_rate == 0
+
+    def record(self, trace):
+        with self._lock:
+            self.traces.append(trace)
+            if self._file is not None:
+                self._file.write(json.dumps(trace, default=repr) + "\n")
+                self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def start_record_trace(definition):
+    return {
+        "from_type": definition.get("from_type"),
+        "to_type": definition.get("to_type"),
+        "timestamp": time.time(),
+        "fields": [],
+    }
+
+
+def start_field_trace(field_name, field_definition, from_obj, read_path):
+    paths = field_definition.get("input_paths") or field_definition.get(
+        "possible_paths"
+    )
+    function = field_definition.get("function")
+    return {
+        "field": field_name,
+        "input_paths": paths,
+        "values": [read_path(from_obj, path) for path in paths],
+        "function": getattr(function, "__name__", None) if function else None,
+        "outcome": "ok",
+    }
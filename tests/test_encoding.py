@@ -0,0 +1,112 @@
+import io
+import json
+
+import pytest
+
+from munch import munchify
+
+from pystyx.encoding import NDJSONEncoder
+from pystyx.errors import TooManyErrors
+from pystyx.mapper import Mapper
+from pystyx.tracing import Tracer
+
+
+def order_map(**extra):
+    toml_map = {
+        "from_type": "erp_order",
+        "to_type": "Order",
+        "fields": {
+            "id": {"input_paths": ["id"]},
+            "customer": {"input_paths": ["customer.name"], "on_throw": "skip"},
+            "total": {"input_paths": ["total"], "on_throw": "skip"},
+            "tags": {"input_paths": ["tags"], "function": "parse_json"},
+            "country": {"input_paths": ["const('US')"]},
+        },
+    }
+    toml_map.update(extra)
+    return Mapper(munchify(toml_map), {})
+
+
+RECORDS = [
+    {"id": 1, "customer": {"name": "Zoë \"Z\""}, "total": 9.5, "tags": "[true]"},
+    {"id": 2, "customer": None, "tags": '{"a": null}'},
+]
+
+
+def expected_lines(mapper, records, many=False):
+    to_objs = [mapper(record) for record in records]
+    if many:
+        to_objs = [to_obj for many_objs in to_objs for to_obj in many_objs]
+    return "".join(
+        json.dumps(to_obj, separators=(",", ":")) + "\n" for to_obj in to_objs
+    ).encode("utf-8")
+
+
+class TestNDJSONEncoder:
+    def test_flat_definitions_match_json_dumps(self):
+        mapper = order_map()
+        encoder = NDJSONEncoder(mapper)
+        assert encoder.direct
+        output = b"".join(encoder.encode(record) for record in RECORDS)
+        assert output == expected_lines(mapper, RECORDS)
+        assert json.loads(output.splitlines()[0])["__type__"] == "Order"
+
+    def test_nested_output_falls_back_to_the_mapped_record(self):
+        mapper = order_map(
+            fields={
+                "id": {"input_paths": ["id"]},
+                "customer.name": {"input_paths": ["customer.name"]},
+            }
+        )
+        encoder = NDJSONEncoder(mapper)
+        assert not encoder.direct
+        assert "customer.name" in encoder.blocker
+        assert encoder.encode(RECORDS[0]) == expected_lines(mapper, RECORDS[:1])
+
+    def test_many_definitions_write_a_line_per_record(self):
+        mapper = order_map(include_type=False)
+        mapper.definition.fields["many"] = True
+        encoder = NDJSONEncoder(mapper)
+        assert encoder.encode(RECORDS) == expected_lines(mapper, [RECORDS], many=True)
+
+    def test_rows_are_encoded_as_objects(self):
+        mapper = order_map(__type__="row")
+        encoder = NDJSONEncoder(mapper)
+        assert not encoder.direct
+        assert json.loads(encoder.encode(RECORDS[1]))["total"] is None
+
+    def test_unicode_output(self):
+        encoder = NDJSONEncoder(order_map(), ensure_ascii=False)
+        assert 'Zoë \\"Z\\"' in encoder.encode(RECORDS[0]).decode("utf-8")
+
+    def test_tracing_uses_the_mapper(self):
+        mapper = order_map()
+        mapper.set_tracer(Tracer(sample_rate=1.0))
+        encoder = NDJSONEncoder(mapper)
+        assert encoder.encode(RECORDS[0]) == expected_lines(mapper, RECORDS[:1])
+
+    def test_write_many_reports_errors(self):
+        out = io.BytesIO()
+        records = [RECORDS[0], {"id": 3, "tags": "[1"}, RECORDS[1]]
+        errors = []
+        with NDJSONEncoder(order_map(), out) as encoder:
+            encoder.write_many(records, errors=errors)
+        assert len(out.getvalue().splitlines()) == 2
+        assert [error.index for error in errors] == [1]
+        assert errors[0].field_name == "tags"
+
+        with pytest.raises(TooManyErrors):
+            encoder.write_many(records, errors=[], max_errors=0)
+
+    @pytest.mark.parametrize("many", [False, True])
+    def test_rejected_records_write_nothing(self, many):
+        mapper = order_map(filter={"first": {"field": "id", "value": 1}})
+        mapper.definition.fields["many"] = many
+        encoder = NDJSONEncoder(mapper)
+        (accepted, rejected) = (RECORDS[0], RECORDS[1])
+        if many:
+            [line] = encoder.encode([accepted, rejected]).splitlines()
+        else:
+            assert encoder.encode(rejected) == b""
+            line = encoder.encode(accepted)
+        assert json.loads(line)["id"] == 1
@@ -0,0 +1,53 @@
+import subprocess
+import sys
+
+IMPORT_BUDGET_MS = 50
+
+
+def imported_modules(statement):
+    code = f"import sys; {statement}; print(' '.join(sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return set(result.stdout.split())
+
+
+def import_time_ms(target):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        (_self, cumulative, name) = line[len("import time:") :].split("|")
+        if name.strip() == target:
+            return int(cumulative) / 1000
+    raise AssertionError(f"{target} was not imported")
+
+
+class TestImports:
+    def test_import_pystyx_is_lazy(self):
+        modules = imported_modules("import pystyx")
+        assert not {"pystyx.mapper", "munch", "pydash", "toml"} & modules
+
+    def test_registering_functions_does_not_load_the_runtime(self):
+        modules = imported_modules("from pystyx import styx_function")
+        assert not {"pystyx.mapper", "munch", "pydash", "toml", "asyncio"} & modules
+
+    def test_mapping_path_does_not_load_pydash_or_toml(self):
+        modules = imported_modules("from pystyx.mapper import Mapper")
+        assert not {"pydash", "toml"} & modules
+
+    def test_missing_keys_do_not_load_pydash(self):
+        modules = imported_modules(
+            "from pystyx.shared import get_path; get_path({'a': {}}, 'a.b')"
+        )
+        assert "pydash" not in modules
+
+    def test_baseline_names_are_exported(self):
+        modules = imported_modules("from pystyx import Mapper, TomlFunction")
+        assert "pystyx.mapper" in modules
+
+    def test_import_time_budget(self):
+        assert min(import_time_ms("pystyx") for _ in range(3)) < IMPORT_BUDGET_MS
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from munch import munchify
+
+from pystyx.functions import TomlFunction
+from pystyx.incremental import IncrementalMapper
+from pystyx.mapper import Mapper
+
+
+def shout(s):
+    return s.upper()
+
+
+def whisper(s):
+    return s.lower()
+
+
+@pytest.fixture
+def TomlFunctions(monkeypatch):
+    monkeypatch.setattr(TomlFunction, "_functions", {"shout": shout})
+    return TomlFunction
+
+
+def customer_map(**fields):
+    return munchify(
+        {
+            "from_type": "erp_customer",
+            "to_type": "Customer",
+            "include_type": False,
+            "fields": {
+                "id": {"input_paths": ["id"]},
+                "name": {"input_paths": ["name"], "function": "shout"},
+                **fields,
+            },
+        }
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return str(tmp_path / "store.sqlite")
+
+
+class TestIncrementalMapper:
+    def test_unchanged_records_are_skipped(self, TomlFunctions, store):
+        records = [{"id": 1, "name": "hera"}, {"id": 2, "name": "zeus"}]
+        with IncrementalMapper(Mapper(customer_map(), {}), "id", store) as mapper:
+            assert len(list(mapper.batch(records))) == 2
+
+        records[1]["name"] = "hades"
+        with IncrementalMapper(Mapper(customer_map(), {}), "id", store) as mapper:
+            assert list(mapper.batch(records)) == [{"id": 2, "name": "HADES"}]
+
+    def test_unchanged_records_served_from_cache(self, TomlFunctions, store):
+        records = [{"id": 1, "name": "hera"}]
+        with IncrementalMapper(
+            Mapper(customer_map(), {}), "id", store, unchanged="cached"
+        ) as mapper:
+            assert mapper.map(records[0]) == ({"id": 1, "name": "HERA"}, True)
+            assert mapper.map(records[0]) == ({"id": 1, "name": "HERA"}, False)
+
+    def test_definition_change_remaps(self, TomlFunctions, store):
+        record = {"id": 1, "name": "hera", "city": "Athens"}
+        with IncrementalMapper(Mapper(customer_map(), {}), "id", store) as mapper:
+            list(mapper.batch([record]))
+
+        changed_map = customer_map(city={"input_paths": ["city"]})
+        with IncrementalMapper(Mapper(changed_map, {}), "id", store) as mapper:
+            assert len(list(mapper.batch([record]))) == 1
+
+    def test_function_change_changes_version(self, TomlFunctions):
+        version = Mapper(customer_map(), {}).version
+        assert Mapper(customer_map(), {}).version == version
+
+        TomlFunctions._functions["shout"] = whisper
+        assert Mapper(customer_map(), {}).version != version
+
+    def test_lookup_file_change_changes_version(
+        self, TomlFunctions, tmp_path, monkeypatch
+    ):
+        monkeypatch.chdir(tmp_path)
+        statuses = tmp_path / "statuses.csv"
+        statuses.write_text("code,status\n1,open\n")
+        status = {"input_paths": ["status"], "mapping_file": "statuses.csv"}
+        version = Mapper(customer_map(status=status), {}).version
+
+        statuses.write_text("code,status\n1,closed\n")
+        mtime = statuses.stat().st_mtime
+        os.utime(statuses, (mtime + 1, mtime + 1))
+        assert Mapper(customer_map(status=status), {}).version != version
+
+    def test_missing_key_raises(self, TomlFunctions, store):
+        with IncrementalMapper(Mapper(customer_map(), {}), "id", store) as mapper:
+            with pytest.raises(ValueError, match="No key found for path: id"):
+                mapper({"name": "hera"})
@@ -0,0 +1,54 @@
+import pytest
+
+from pystyx import DefinitionLoadError, create_maps
+from pystyx.functions import FunctionRegistry
+from pystyx.loader import load_definitions
+
+
+def address_styx(from_type):
+    return f"""
+from_type = "{from_type}"
+to_type = "Address"
+include_type = false
+
+[fields.city]
+input_paths = ["city"]
+"""
+
+
+@pytest.fixture
+def maps_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    maps = tmp_path / "maps"
+    maps.mkdir()
+    for i in range(8):
+        (maps / f"{i:02}.styx").write_text(address_styx(f"erp_address_{i}"))
+    return maps
+
+
+class TestLoader:
+    @pytest.mark.parametrize("processes", [False, True])
+    def test_workers_load_every_definition(self, maps_dir, processes):
+        maps = create_maps(registry=FunctionRegistry(), workers=4, processes=processes)
+        assert sorted(maps) == [f"erp_address_{i}" for i in range(8)]
+        assert maps["erp_address_3"]({"city": "Austin"}) == {"city": "Austin"}
+
+    def test_definitions_come_back_in_path_order(self, maps_dir):
+        paths = sorted(maps_dir.glob("*.styx"))
+        definitions = load_definitions(paths, workers=4)
+        assert [d.from_type for d in definitions] == [
+            f"erp_address_{i}" for i in range(8)
+        ]
+
+    @pytest.mark.parametrize("workers", [None, 4])
+    def test_first_broken_file_is_reported(self, maps_dir, workers):
+        (maps_dir / "05.styx").write_text("from_type = ")
+        (maps_dir / "06.styx").write_text("from_type = ")
+        with pytest.raises(DefinitionLoadError) as exc_info:
+            create_maps(registry=FunctionRegistry(), workers=workers)
+        assert exc_info.value.path.endswith("05.styx")
+
+    def test_invalid_definition_names_the_file(self, maps_dir):
+        (maps_dir / "02.styx").write_text('from_type = "erp_address_2"')
+        with pytest.raises(TypeError, match="02.styx: 'to_type' must be declared"):
+            create_maps(registry=FunctionRegistry(), workers=2)
@@ -0,0 +1,144 @@
+import pickle
+
+import pytest
+
+from munch import munchify
+
+from pystyx.lookups import (
+    MappedLookup,
+    build_mapped_lookup,
+    clear_lookups,
+    get_lookup,
+    register_lookups,
+)
+from pystyx.mapper import Mapper
+
+
+@pytest.fixture(autouse=True)
+def lookups():
+    yield
+    clear_lookups()
+
+
+@pytest.fixture
+def countries_csv(tmp_path):
+    path = tmp_path / "countries.csv"
+    path.write_text("code,name\nUS,United States\nGR,Greece\nFR,France\n")
+    return path
+
+
+@pytest.fixture
+def statuses_json(tmp_path):
+    path = tmp_path / "statuses.json"
+    path.write_text('{"1": "open", "2": "closed", "__default__": "unknown"}')
+    return path
+
+
+class TestMappedLookup:
+    def test_build_and_get(self, countries_csv):
+        table = MappedLookup(build_mapped_lookup(countries_csv))
+        assert len(table) == 3
+        assert table.get("GR") == "Greece"
+        assert table["US"] == "United States"
+        assert table.get("DE") is None
+        assert "FR" in table
+        with pytest.raises(KeyError):
+            table["DE"]
+
+    def test_typed_keys_and_default(self, statuses_json):
+        table = MappedLookup(build_mapped_lookup(statuses_json, key_type="int"))
+        assert table.get(2) == "closed"
+        assert table.get("2") is None
+        assert table.default == "unknown"
+
+    def test_build_is_skipped_when_up_to_date(self, countries_csv):
+        target = build_mapped_lookup(countries_csv)
+        mtime = target.stat().st_mtime_ns
+        assert build_mapped_lookup(countries_csv) == target
+        assert target.stat().st_mtime_ns == mtime
+
+    def test_rebuilt_when_key_type_changes(self, statuses_json):
+        target = build_mapped_lookup(statuses_json)
+        assert MappedLookup(target).get("1") == "open"
+        assert build_mapped_lookup(statuses_json, key_type="int") == target
+        table = MappedLookup(target)
+        assert table.key_type == "int"
+        assert table.get(1) == "open"
+
+    def test_pickles_by_path(self, countries_csv):
+        table = MappedLookup(build_mapped_lookup(countries_csv))
+        assert len(pickle.dumps(table)) < 200
+        assert pickle.loads(pickle.dumps(table)).get("GR") == "Greece"
+
+    def test_register_reopens_rebuilt_table(self, statuses_json, tmp_path):
+        register_lookups({"statuses": "statuses.json"}, base=tmp_path)
+        assert get_lookup("statuses").get("1") == "open"
+        register_lookups(
+            {"statuses": {"path": "statuses.json", "key_type": "int"}}, base=tmp_path
+        )
+        assert get_lookup("statuses").get(1) == "open"
+
+    def test_register_and_map_field_with_lookup(self, statuses_json, tmp_path):
+        register_lookups(
+            {"statuses": {"path": "statuses.json", "key_type": "int"}}, base=tmp_path
+        )
+        assert get_lookup("statuses").get(1) == "open"
+
+        toml_map = munchify(
+            {
+                "from_type": "erp_status",
+                "to_type": "Status",
+                "include_type": False,
+                "fields": {"status": {"input_paths": ["code"], "lookup": "statuses"}},
+            }
+        )
+        mapper = Mapper(toml_map, {})
+        assert mapper({"code": 1}) == {"status": "open"}
+        assert mapper({"code": 9}) == {"status": "unknown"}
+
+    def test_unknown_lookup_raises(self):
+        with pytest.raises(TypeError, match="unknown lookup: missing"):
+            get_lookup("missing")
+
+    def test_definition_lookups_resolve_next_to_the_definition(
+        self, tmp_path, monkeypatch
+    ):
+        from pystyx.loader import create_maps
+
+        maps = tmp_path / "maps"
+        maps.mkdir()
+        (maps / "countries.csv").write_text("code,name\nUS,United States\n")
+        # Sorts before the definition declaring the lookup
+        (maps / "a_address.styx").write_text(
+            """
+from_type = "erp_address"
+to_type = "Address"
+include_type = false
+
+[fields.country]
+input_paths = ["country"]
+lookup = "countries"
+"""
+        )
+        (maps / "b_country.styx").write_text(
+            """
+from_type = "erp_country"
+to_type = "Country"
+include_type = false
+
+[lookups]
+countries = "countries.csv"
+
+[fields.name]
+input_paths = ["code"]
+lookup = "countries"
+"""
+        )
+        (tmp_path / "functions.styx").write_text(
+            'functions = ["parse_json", "to_camel_case", "parse_bool"]'
+        )
+        monkeypatch.chdir(tmp_path)
+        mappers = create_maps("maps")
+        address = mappers["erp_address"]({"country": "US"})
+        assert address == {"country": "United States"}
+        assert mappers["erp_country"]({"code": "US"}) == {"name": "United States"}
@@ -1,9 +1,12 @@
+import types
+
 import pytest
 
 from munch import Munch, munchify
 
-from pystyx.functions import parse_json
-from pystyx.mapper import PreprocessMapper, PostprocessMapper, FieldsMapper
+from pystyx.functions import FunctionRegistry, TomlFunction, parse_json, styx_function
+from pystyx.errors import TooManyErrors
+from pystyx.mapper import Mapper, PreprocessMapper, PostprocessMapper, FieldsMapper
 from pystyx.shared import OnThrowValue
 
 
@@ -15,6 +18,12 @@ def concat(a, b):
     return a + b
 
 
+@pytest.fixture
+def TomlFunctions(monkeypatch):
+    monkeypatch.setattr(TomlFunction, "_functions", {"parse_json": parse_json})
+    return TomlFunction
+
+
 @pytest.fixture
 def definitions():
     return munchify({})
@@ -135,9 +144,451 @@ class TestPreprocessMapper:
         pass
 
 
+@pytest.fixture
+def row_map():
+    return munchify(
+        {
+            "from_type": "erp_address",
+            "to_type": "Address",
+            "__type__": "row",
+            "fields": {
+                "city": {"input_paths": ["city"]},
+                "zip": {"input_paths": ["postalCode"], "on_throw": "skip"},
+            },
+        }
+    )
+
+
+@pytest.fixture
+def many_map():
+    return munchify(
+        {
+            "from_type": "erp_line",
+            "to_type": "Line",
+            "include_type": False,
+            "preprocess": {
+                "01_parse_line": {
+                    "input_paths": ["."],
+                    "output_path": ".",
+                    "function": "parse_json",
+                    "many": True,
+                }
+            },
+            "fields": {"many": True, "sku": {"input_paths": ["sku"]}},
+        }
+    )
+
+
 class TestFieldsMapper:
-    pass
+    def test_stream_returns_generator_for_any_iterable(
+        self, many_map, functions, TomlFunctions
+    ):
+        mapper = Mapper(many_map, functions)
+        lines = (f'{{"sku": "{i}"}}' for i in range(3))
+        result = mapper.stream(lines)
+        assert isinstance(result, types.GeneratorType)
+        assert list(result) == [{"sku": "0"}, {"sku": "1"}, {"sku": "2"}]
+
+    def test_stream_maps_lazily(self, many_map, functions, TomlFunctions):
+        mapper = Mapper(many_map, functions)
+        consumed = []
+
+        def lines():
+            for i in range(3):
+                consumed.append(i)
+                yield f'{{"sku": "{i}"}}'
+
+        result = mapper.stream(lines())
+        assert next(result) == {"sku": "0"}
+        assert consumed == [0]
+
+    def test_call_on_many_still_returns_list(self, many_map, functions, TomlFunctions):
+        mapper = Mapper(many_map, functions)
+        assert mapper(['{"sku": "a"}']) == [{"sku": "a"}]
+        assert mapper(['{"sku": "b"}']) == [{"sku": "b"}]
+
+    def test_vectorized_many_processor_is_called_once(
+        self, many_map, functions, monkeypatch
+    ):
+        monkeypatch.setattr(TomlFunction, "_functions", {})
+        monkeypatch.setattr(TomlFunction, "_metadata", {})
+        calls = []
+
+        @styx_function(vectorized=True)
+        def parse_json(lines):
+            calls.append(lines)
+            return [{"sku": line.upper()} for line in lines]
+
+        mapper = Mapper(many_map, functions)
+        assert mapper(["a", "b"]) == [{"sku": "A"}, {"sku": "B"}]
+        assert calls == [["a", "b"]]
+        assert list(mapper.stream(["c"])) == [{"sku": "C"}]
+
+    def test_vectorized_result_count_must_match(self, many_map, functions, monkeypatch):
+        monkeypatch.setattr(TomlFunction, "_functions", {})
+        monkeypatch.setattr(TomlFunction, "_metadata", {})
+
+        @styx_function(vectorized=True)
+        def parse_json(lines):
+            return [{"sku": line} for line in lines[:-1]]
+
+        mapper = Mapper(many_map, functions)
+        with pytest.raises(TypeError, match="'parse_json' returned 2 value"):
+            mapper(["a", "b", "c"])
+
+    def test_mapper_resolves_functions_in_its_registry(self, many_map, functions):
+        registry = FunctionRegistry()
+
+        @registry.function
+        def parse_json(line):
+            return {"sku": line}
+
+        mapper = Mapper(many_map, registry.functions, registry=registry)
+        assert mapper(["a"]) == [{"sku": "a"}]
+
+    def test_constant_fields_are_not_recomputed(self, functions, monkeypatch):
+        monkeypatch.setattr(TomlFunction, "_functions", {})
+        monkeypatch.setattr(TomlFunction, "_metadata", {})
+        calls = []
+
+        @styx_function(pure=True)
+        def country_name(code):
+            calls.append(code)
+            return {"US": "United States"}[code]
+
+        mapper = Mapper(
+            munchify(
+                {
+                    "from_type": "erp_address",
+                    "to_type": "Address",
+                    "include_type": False,
+                    "fields": {
+                        "city": {"input_paths": ["city"]},
+                        "country": {
+                            "input_paths": ["const('US')"],
+                            "function": "country_name",
+                        },
+                    },
+                }
+            ),
+            functions,
+        )
+        assert mapper({"city": "Dallas"}) == {
+            "city": "Dallas",
+            "country": "United States",
+        }
+        mapper({"city": "Austin"})
+        assert calls == ["US"]
+
+    def test_shared_paths_read_the_same_values(self, functions):
+        mapper = Mapper(
+            munchify(
+                {
+                    "from_type": "erp_customer",
+                    "to_type": "Customer",
+                    "include_type": False,
+                    "fields": {
+                        "city": {"input_paths": ["customer.address.city"]},
+                        "zip": {"input_paths": ["customer.address.zip"]},
+                        "first_sku": {
+                            "input_paths": ["customer.orders.0.sku"],
+                            "on_throw": "skip",
+                        },
+                        "name": {"input_paths": ["customer.name"], "on_throw": "skip"},
+                    },
+                }
+            ),
+            functions,
+        )
+        assert mapper.definition.path_plan
+        record = {
+            "customer": {
+                "address": {"city": "Dallas", "zip": "75201"},
+                "orders": [{"sku": "a"}],
+            }
+        }
+        assert mapper(record) == {"city": "Dallas", "zip": "75201", "first_sku": "a"}
+        with pytest.raises(ValueError, match="No value found for path"):
+            mapper({"customer": {"address": None}})
+
+    def test_stream_requires_many(self, row_map, functions):
+        mapper = Mapper(row_map, functions)
+        with pytest.raises(TypeError, match="Only 'many' definitions can be streamed"):
+            mapper.stream([])
+
+    def test_missing_value_with_default_policy_raises(self, functions):
+        toml_map = munchify(
+            {
+                "from_type": "erp_address",
+                "to_type": "Address",
+                "fields": {"city": {"input_paths": ["city"]}},
+            }
+        )
+        mapper = Mapper(toml_map, functions)
+        with pytest.raises(ValueError, match="No value found for path."):
+            mapper({})
+
+    def test_missing_value_policies_do_not_raise(self, functions):
+        toml_map = munchify(
+            {
+                "from_type": "erp_address",
+                "to_type": "Address",
+                "include_type": False,
+                "fields": {
+                    "city": {"input_paths": ["city"], "on_throw": "skip"},
+                    "zip": {
+                        "input_paths": ["zip"],
+                        "on_throw": "or_else",
+                        "or_else": "00000",
+                    },
+                    "state": {
+                        "possible_paths": ["a", "b"],
+                        "path_condition": {"field": "kind", "value": "state"},
+                        "on_throw": "skip",
+                    },
+                },
+            }
+        )
+        mapper = Mapper(toml_map, functions)
+        assert mapper({}) == {"zip": "00000"}
+
+    def test_function_exception_is_raised_as_is(self, functions, TomlFunctions):
+        TomlFunctions._functions["throw"] = throw
+        toml_map = munchify(
+            {
+                "from_type": "erp_address",
+                "to_type": "Address",
+                "fields": {"city": {"input_paths": ["city"], "function": "throw"}},
+            }
+        )
+        mapper = Mapper(toml_map, functions)
+        with pytest.raises(Exception, match="I threw up"):
+            mapper({"city": "Dallas"})
+
+    def test_nested_output_keys_share_sub_objects(self, functions):
+        toml_map = munchify(
+            {
+                "from_type": "erp_address",
+                "to_type": "Address",
+                "fields": {
+                    "location.geo.lat": {"input_paths": ["lat"]},
+                    "location.city": {"input_paths": ["city"]},
+                    "location.geo.lng": {"input_paths": ["lng"], "on_throw": "skip"},
+                    "zip": {"input_paths": ["zip"]},
+                    "tags[0]": {"input_paths": ["city"]},
+                },
+            }
+        )
+        mapper = Mapper(toml_map, functions)
+        result = mapper({"lat": 1.5, "city": "Dallas", "zip": "75080"})
+        assert result == {
+            "__type__": "Address",
+            "location": {"geo": {"lat": 1.5}, "city": "Dallas"},
+            "zip": "75080",
+            "tags": ["Dallas"],
+        }
+        assert list(result) == ["__type__", "location", "zip", "tags"]
+
+    def test_mapping_uses_typed_keys_and_default(self, functions):
+        toml_map = munchify(
+            {
+                "from_type": "erp_status",
+                "to_type": "Status",
+                "include_type": False,
+                "fields": {
+                    "status": {
+                        "input_paths": ["code"],
+                        "mapping": {"1": "open", "2": "closed", "__default__": "?"},
+                        "mapping_key_type": "int",
+                    }
+                },
+            }
+        )
+        mapper = Mapper(toml_map, functions)
+        assert mapper({"code": 2}) == {"status": "closed"}
+        assert mapper({"code": 3}) == {"status": "?"}
+
+    def test_row_type_returns_fixed_schema_row(self, row_map, functions):
+        mapper = Mapper(row_map, functions)
+        row = mapper({"city": "Dallas", "postalCode": "75080"})
+        assert row == ("Dallas", "75080")
+        assert row.city == "Dallas"
+        assert row._fields == ("city", "zip")
+        assert row.__type__ == "Address"
+
+    def test_row_type_skipped_fields_are_none(self, row_map, functions):
+        mapper = Mapper(row_map, functions)
+        row = mapper({"city": "Dallas"})
+        assert row._asdict() == {"city": "Dallas", "zip": None}
+
+    def test_row_type_many_shares_row_class(self, row_map, functions):
+        row_map.fields.many = True
+        mapper = Mapper(row_map, functions)
+        rows = mapper([{"city": "Dallas"}, {"city": "Austin"}])
+        assert [row.city for row in rows] == ["Dallas", "Austin"]
+        assert type(rows[0]) is type(rows[1])
 
 
 class TestPostprocessMapper:
     pass
+
+
+@pytest.fixture
+def address_mapper(functions, TomlFunctions):
+    TomlFunctions._functions["throw"] = throw
+    return Mapper(
+        munchify(
+            {
+                "from_type": "erp_address",
+                "to_type": "Address",
+                "include_type": False,
+                "preprocess": {
+                    "01_check": {
+                        "input_paths": ["check"],
+                        "output_path": "check",
+                        "function": "throw",
+                        "on_throw": "skip",
+                    }
+                },
+                "fields": {"city": {"input_paths": ["city"]}},
+            }
+        ),
+        functions,
+    )
+
+
+class TestBatch:
+    def test_batch_collects_errors_and_continues(self, address_mapper):
+        errors = []
+        records = [{"city": "Dallas"}, {}, {"city": "Austin"}]
+        result = list(address_mapper.batch(records, errors=errors))
+        assert result == [{"city": "Dallas"}, {"city": "Austin"}]
+        assert len(errors) == 1
+
+        error = errors[0]
+        assert error.index == 1
+        assert error.from_type == "erp_address"
+        assert error.field_name == "city"
+        assert error.input_paths == ["city"]
+        assert isinstance(error.exception, ValueError)
+        assert error.to_dict()["error"] == "ValueError: No value found for path."
+
+    def test_batch_reports_processor_key(self, address_mapper):
+        address_mapper.definition.preprocess["01_check"].on_throw = OnThrowValue.Throw
+        errors = []
+        list(address_mapper.batch([{"city": "Dallas"}], errors=errors))
+        assert errors[0].processor_key == "preprocess.01_check"
+        assert errors[0].field_name is None
+
+    def test_batch_aborts_after_max_errors(self, address_mapper):
+        errors = []
+        with pytest.raises(TooManyErrors) as exc_info:
+            list(address_mapper.batch([{}, {}, {}], errors=errors, max_errors=1))
+        assert len(exc_info.value.errors) == 2
+
+    def test_batch_without_errors_raises(self, address_mapper):
+        with pytest.raises(ValueError):
+            list(address_mapper.batch([{}]))
+
+    def test_batch_each_yields_indexes_of_mapped_records(self, address_mapper):
+        errors = []
+        records = [{"city": "Dallas"}, {}, {"city": "Austin"}]
+        result = address_mapper.batch_each(
+            records, lambda record: address_mapper(record)["city"], errors
+        )
+        assert list(result) == [(0, "Dallas"), (2, "Austin")]
+        assert [error.index for error in errors] == [1]
+
+
+@pytest.fixture
+def order_mapper(functions, TomlFunctions):
+    return Mapper(
+        munchify(
+            {
+                "from_type": "erp_order",
+                "to_type": "Order",
+                "include_type": False,
+                "preprocess": {
+                    "01_status": {
+                        "input_paths": ["state"],
+                        "output_path": "status",
+                        "function": "parse_json",
+                    }
+                },
+                "filter": {
+                    "active": {"field": "status", "values": ["active", "pending"]},
+                },
+                "fields": {"id": {"input_paths": ["id"]}},
+            }
+        ),
+        functions,
+    )
+
+
+class TestFilter:
+    def test_rejected_records_map_to_none(self, order_mapper):
+        assert order_mapper({"id": 1, "state": '"active"'}) == {"id": 1}
+        # Filtered after preprocess, before any field is mapped
+        assert order_mapper({"state": '"deleted"'}) is None
+
+    def test_batch_skips_rejected_records(self, order_mapper):
+        records = [
+            {"id": 1, "state": '"active"'},
+            {"id": 2, "state": '"deleted"'},
+            {"state": '"pending"'},
+            {"id": 4, "state": '"pending"'},
+        ]
+        (errors, rejected) = ([], [])
+        result = list(order_mapper.batch(records, errors=errors, rejected=rejected))
+        assert result == [{"id": 1}, {"id": 4}]
+        assert rejected == [1]
+        assert [error.index for error in errors] == [2]
+
+    def test_update_definitions_reaches_the_filter(self, order_mapper):
+        maps = {order_mapper.from_type: order_mapper}
+        order_mapper.update_definitions(maps)
+        assert order_mapper.filterMapper.definitions is maps
+
+    def test_many_definitions_filter_their_records(self, order_mapper):
+        order_mapper.definition.fields["many"] = True
+        order_mapper.definition.preprocess["01_status"].many = True
+        records = [{"id": 1, "state": '"active"'}, {"id": 2, "state": '"deleted"'}]
+        assert order_mapper(records) == [{"id": 1}]
+        assert list(order_mapper.stream(iter(records))) == [{"id": 1}]
+
+    def test_function_predicates(self, functions, monkeypatch):
+        monkeypatch.setattr(TomlFunction, "_functions", {})
+        monkeypatch.setattr(TomlFunction, "_metadata", {})
+
+        @styx_function
+        def in_stock(quantity, minimum):
+            if quantity is None:
+                raise ValueError("No quantity")
+            return quantity >= int(minimum)
+
+        mapper = Mapper(
+            munchify(
+                {
+                    "from_type": "erp_item",
+                    "to_type": "Item",
+                    "include_type": False,
+                    "filter": {
+                        "in_stock": {
+                            "function": "in_stock",
+                            "input_paths": ["stock.quantity", "const('2')"],
+                        }
+                    },
+                    "fields": {"sku": {"input_paths": ["sku"]}},
+                }
+            ),
+            functions,
+        )
+        records = [
+            {"sku": "a", "stock": {"quantity": 5}},
+            {"sku": "b", "stock": {"quantity": 1}},
+            {"sku": "c"},
+        ]
+        errors = []
+        assert list(mapper.batch(records, errors=errors)) == [{"sku": "a"}]
+        assert errors[0].index == 2
+        assert errors[0].processor_key == "filter.in_stock"
@@ -0,0 +1,129 @@
+import os
+
+import pytest
+
+from pystyx import MapSets
+from pystyx.functions import FunctionRegistry
+from pystyx.lookups import clear_lookups
+
+ADDRESS_STYX = """
+from_type = "erp_address"
+to_type = "Address"
+include_type = false
+
+[fields.city]
+input_paths = ["city"]
+function = "shout"
+"""
+
+FUNCTIONS_STYX = """
+functions = ["shout"]
+"""
+
+COUNTRY_STYX = """
+from_type = "erp_country"
+to_type = "Country"
+include_type = false
+
+[fields.name]
+input_paths = ["code"]
+lookup = "countries"
+
+[fields.status]
+input_paths = ["status"]
+mapping_file = "statuses.csv"
+"""
+
+
+def shout(s):
+    return s.upper()
+
+
+@pytest.fixture
+def tenants(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for tenant in ("acme", "globex"):
+        (tmp_path / tenant / "maps").mkdir(parents=True)
+        (tmp_path / tenant / "maps" / "address.styx").write_text(ADDRESS_STYX)
+        (tmp_path / tenant / "functions.styx").write_text(FUNCTIONS_STYX)
+    return tmp_path
+
+
+def load(map_sets, tenant, registry):
+    return map_sets.load(
+        tenant, f"{tenant}/maps", f"{tenant}/functions.styx", registry=registry
+    )
+
+
+class TestMapSets:
+    def test_identical_definitions_are_parsed_once(self, tenants):
+        registry = FunctionRegistry({"shout": shout})
+        map_sets = MapSets()
+        acme = load(map_sets, "acme", registry)
+        globex = load(map_sets, "globex", registry)
+
+        assert acme["erp_address"] is not globex["erp_address"]
+        assert acme["erp_address"].definition is globex["erp_address"].definition
+        assert len(map_sets.definition_cache) == 1
+        assert globex["erp_address"]({"city": "Austin"}) == {"city": "AUSTIN"}
+
+    def test_different_functions_are_not_shared(self, tenants):
+        map_sets = MapSets()
+        acme = load(map_sets, "acme", FunctionRegistry({"shout": shout}))
+        globex = load(map_sets, "globex", FunctionRegistry({"shout": str.lower}))
+
+        assert acme["erp_address"]({"city": "Austin"}) == {"city": "AUSTIN"}
+        assert globex["erp_address"]({"city": "Austin"}) == {"city": "austin"}
+
+    def test_unload_drops_unused_definitions(self, tenants):
+        registry = FunctionRegistry({"shout": shout})
+        map_sets = MapSets()
+        load(map_sets, "acme", registry)
+        load(map_sets, "globex", registry)
+
+        map_sets.unload("acme")
+        assert list(map_sets) == ["globex"]
+        assert len(map_sets.definition_cache) == 1
+
+        map_sets.unload("globex")
+        assert not map_sets.definition_cache
+
+
+@pytest.fixture
+def lookup_tenants(tenants):
+    clear_lookups()
+    (tenants / "statuses.csv").write_text("code,status\n1,open\n")
+    for tenant in ("acme", "globex"):
+        (tenants / tenant / "maps" / "country.styx").write_text(COUNTRY_STYX)
+        countries = tenants / tenant / "countries.csv"
+        countries.write_text(f"code,name\nUS,{tenant}-US\n")
+        (tenants / tenant / "functions.styx").write_text(
+            FUNCTIONS_STYX + 'lookups = { countries = "countries.csv" }'
+        )
+    yield tenants
+    clear_lookups()
+
+
+class TestMapSetsLookups:
+    def test_tables_of_each_map_set_are_kept_apart(self, lookup_tenants):
+        registry = FunctionRegistry({"shout": shout})
+        map_sets = MapSets()
+        acme = load(map_sets, "acme", registry)
+        globex = load(map_sets, "globex", registry)
+
+        record = {"code": "US", "status": "1"}
+        assert acme["erp_country"](record)["name"] == "acme-US"
+        assert globex["erp_country"](record)["name"] == "globex-US"
+
+    def test_reload_reads_changed_mapping_file(self, lookup_tenants):
+        registry = FunctionRegistry({"shout": shout})
+        map_sets = MapSets()
+        acme = load(map_sets, "acme", registry)
+        assert acme["erp_country"]({"code": "US", "status": "1"})["status"] == "open"
+
+        statuses = lookup_tenants / "statuses.csv"
+        statuses.write_text("code,status\n1,closed\n")
+        mtime = statuses.stat().st_mtime
+        os.utime(statuses, (mtime + 1, mtime + 1))
+        acme = load(map_sets, "acme", registry)
+        assert acme["erp_country"]({"code": "US", "status": "1"})["status"] == "closed"
@@ -0,0 +1,133 @@
+import pytest
+
+from munch import munchify
+
+from pystyx.functions import TomlFunction, parse_json
+from pystyx.mapper import Mapper
+
+
+def impure(s):
+    return s
+
+
+@pytest.fixture
+def TomlFunctions(monkeypatch):
+    monkeypatch.setattr(
+        TomlFunction, "_functions", {"parse_json": parse_json, "impure": impure}
+    )
+    return TomlFunction
+
+
+def supplier_map(memoize=True, many=False, function="parse_json"):
+    return munchify(
+        {
+            "from_type": "erp_supplier",
+            "to_type": "Supplier",
+            "include_type": False,
+            "memoize": memoize,
+            "fields": {
+                "many": many,
+                "name": {"input_paths": ["name"]},
+                "meta": {"input_paths": ["meta"], "function": function},
+            },
+        }
+    )
+
+
+def order_map(many=False):
+    return munchify(
+        {
+            "from_type": "erp_order",
+            "to_type": "Order",
+            "include_type": False,
+            "fields": {
+                "id": {"input_paths": ["id"]},
+                "suppliers": {
+                    "input_paths": ["suppliers"],
+                    "from_type": "erp_supplier",
+                },
+            },
+        }
+    )
+
+
+def link(*mappers):
+    maps = {mapper.from_type: mapper for mapper in mappers}
+    for mapper in maps.values():
+        mapper.update_definitions(maps)
+    return maps
+
+
+class TestMemoize:
+    def test_repeated_nested_objects_are_mapped_once(self, TomlFunctions):
+        maps = link(Mapper(supplier_map(), {}), Mapper(order_map(), {}))
+        supplier = {"name": "Acme", "meta": "{}"}
+        results = list(
+            maps["erp_order"].batch(
+                [
+                    {"id": 1, "suppliers": dict(supplier)},
+                    {"id": 2, "suppliers": dict(supplier)},
+                ]
+            )
+        )
+        assert results[0]["suppliers"] == results[1]["suppliers"]
+        assert results[0]["suppliers"] is not results[1]["suppliers"]
+        info = maps["erp_supplier"].memo.cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+
+    def test_many_elements_are_memoized_individually(self, TomlFunctions):
+        maps = link(Mapper(supplier_map(many=True), {}), Mapper(order_map(), {}))
+        suppliers = [{"name": "Acme", "meta": "{}"}, {"name": "Acme", "meta": "{}"}]
+        result = maps["erp_order"]({"id": 1, "suppliers": suppliers})
+        assert result["suppliers"] == [{"name": "Acme", "meta": {}}] * 2
+        assert maps["erp_supplier"].memo.cache_info().hits == 1
+
+    def test_cached_outputs_are_not_shared_between_records(self, TomlFunctions):
+        order = order_map()
+        order.postprocess = munchify(
+            {
+                "01_order_id": {
+                    "input_paths": ["id"],
+                    "output_path": "suppliers.order_id",
+                    "function": "impure",
+                }
+            }
+        )
+        maps = link(Mapper(supplier_map(), {}), Mapper(order, {}))
+        supplier = {"name": "Acme", "meta": "{}"}
+        (first, second) = maps["erp_order"].batch(
+            [{"id": 1, "suppliers": dict(supplier)}, {"id": 2, "suppliers": supplier}]
+        )
+        assert first["suppliers"]["order_id"] == 1
+        assert second["suppliers"]["order_id"] == 2
+        assert maps["erp_supplier"].memo.cache_info().hits == 1
+
+    def test_cache_is_bounded(self, TomlFunctions):
+        mapper = Mapper(supplier_map(memoize={"size": 2}), {})
+        for name in "abc":
+            mapper.map_nested({"name": name, "meta": "{}"})
+        assert mapper.memo.cache_info().currsize == 2
+
+    def test_batch_scope_is_cleared_per_batch(self, TomlFunctions):
+        supplier = Mapper(supplier_map(memoize={"scope": "batch"}), {})
+        maps = link(supplier, Mapper(order_map(), {}))
+        list(
+            maps["erp_order"].batch(
+                [{"id": 1, "suppliers": {"name": "a", "meta": "{}"}}]
+            )
+        )
+        assert supplier.memo.cache_info().currsize == 1
+        list(maps["erp_order"].batch([]))
+        assert supplier.memo.cache_info().currsize == 0
+
+    def test_memoize_requires_pure_functions(self, TomlFunctions):
+        with pytest.raises(TypeError, match="Impure functions were: impure"):
+            Mapper(supplier_map(function="impure"), {})
+
+    def test_memoize_requires_pure_nested_definitions(self, TomlFunctions):
+        nested = order_map()
+        nested.memoize = True
+        nested.fields.suppliers.from_type = "erp_supplier"
+        supplier = Mapper(supplier_map(memoize=False, function="impure"), {})
+        with pytest.raises(TypeError, match="Impure definitions were: erp_supplier"):
+            link(supplier, Mapper(nested, {}))
@@ -0,0 +1,91 @@
+from functools import lru_cache
+
+import pytest
+
+from munch import munchify
+
+from pystyx.mapper import Mapper
+from pystyx.metrics import Metrics
+
+
+@lru_cache(maxsize=None)
+def upper(s):
+    return s.upper()
+
+
+@pytest.fixture
+def metrics():
+    return Metrics(buckets=(0.5, 1.0))
+
+
+@pytest.fixture
+def mapper(metrics):
+    mapper = Mapper(
+        munchify(
+            {
+                "from_type": "erp_address",
+                "to_type": "Address",
+                "include_type": False,
+                "fields": {
+                    "city": {"input_paths": ["city"]},
+                    "zip": {"input_paths": ["postalCode"], "on_throw": "skip"},
+                },
+            }
+        ),
+        {"upper": upper},
+    )
+    mapper.set_metrics(metrics)
+    return mapper
+
+
+def samples_by_name(metrics):
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for sample in metrics.collect()
+    }
+
+
+class TestMetrics:
+    def test_counts_records_and_field_failures(self, mapper, metrics):
+        mapper({"city": "Dallas"})
+        mapper({"city": "Austin", "postalCode": "78701"})
+        samples = samples_by_name(metrics)
+        assert samples[("pystyx_records_total", (("from_type", "erp_address"),))] == 2
+        failure_labels = (
+            ("field", "zip"),
+            ("from_type", "erp_address"),
+            ("outcome", "skip"),
+        )
+        assert samples[("pystyx_field_failures_total", failure_labels)] == 1
+
+    def test_latency_histogram(self, mapper, metrics):
+        mapper({"city": "Dallas"})
+        samples = samples_by_name(metrics)
+        labels = (("from_type", "erp_address"),)
+        assert samples[("pystyx_map_seconds_count", labels)] == 1
+        inf_labels = (("from_type", "erp_address"), ("le", "+Inf"))
+        assert samples[("pystyx_map_seconds_bucket", inf_labels)] == 1
+
+    def test_function_cache_hit_rates(self, mapper, metrics):
+        upper.cache_clear()
+        upper("a")
+        upper("a")
+        samples = samples_by_name(metrics)
+        labels = (("function", "upper"),)
+        assert samples[("pystyx_function_cache_hits_total", labels)] == 1
+        assert samples[("pystyx_function_cache_misses_total", labels)] == 1
+
+    def test_render_text_exposition(self, mapper, metrics):
+        mapper({"city": "Dallas"})
+        text = metrics.render()
+        assert "# TYPE pystyx_records counter" in text
+        assert 'pystyx_records_total{from_type="erp_address"} 1' in text
+        assert "# TYPE pystyx_map_seconds histogram" in text
+        assert text.endswith("# EOF\n")
+
+    def test_on_collect_callbacks(self, mapper, metrics):
+        received = []
+        metrics.on_collect(received.append)
+        mapper({"city": "Dallas"})
+        metrics.collect()
+        assert any(sample.name == "pystyx_records_total" for sample in received[0])
@@ -0,0 +1,100 @@
+import datetime
+
+import pytest
+
+from munch import munchify
+
+from pystyx.mapper import Mapper
+from pystyx.parallel import MapperPool, batch_results
+
+ADDRESS_STYX = """
+from_type = "erp_address"
+to_type = "Address"
+include_type = false
+
+[fields.tags]
+input_paths = ["tags"]
+function = "parse_json"
+"""
+
+
+@pytest.fixture
+def maps_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "functions.styx").write_text(
+        'functions = ["parse_json", "to_camel_case", "parse_bool"]'
+    )
+    maps = tmp_path / "maps"
+    maps.mkdir()
+    (maps / "address.styx").write_text(ADDRESS_STYX)
+    (maps / "address_row.styx").write_text(
+        ADDRESS_STYX.replace('"erp_address"', '"erp_address_row"').replace(
+            "include_type = false", '__type__ = "row"'
+        )
+    )
+    return maps
+
+
+@pytest.mark.parametrize("transport", ["pickle", "shared_memory"])
+def test_pool_workers_load_the_maps(maps_dir, transport):
+    with MapperPool(processes=1, transport=transport) as pool:
+        results = pool.map_batch("erp_address", [{"tags": "[1]"}, {"tags": "[1"}])
+        unknown = pool.map_batch("erp_invoice", [{}])
+        empty = pool.map_batch("erp_address", [])
+    assert results[0] == {"result": {"tags": [1]}}
+    assert results[1]["error"].startswith("JSONDecodeError")
+    assert unknown == [{"error": "Unknown from_type: erp_invoice"}]
+    assert empty == []
+
+
+@pytest.mark.parametrize("transport", ["pickle", "shared_memory"])
+def test_rows_come_back_from_workers(maps_dir, transport):
+    with MapperPool(processes=1, transport=transport) as pool:
+        [row] = pool.map_batch("erp_address_row", [{"tags": "[1]"}])
+    assert row["result"] == ([1],)
+    assert row["result"].tags == [1]
+    assert row["result"].__type__ == "Address"
+
+
+def test_shared_memory_falls_back_to_pickle(maps_dir):
+    with MapperPool(processes=1, transport="shared_memory") as pool:
+        # Only builtin types can be marshalled: not dates, nor Munch (parse_json)
+        [mapped] = pool.map_batch(
+            "erp_address", [{"tags": "[]", "seen": datetime.date(2024, 1, 1)}]
+        )
+        [parsed] = pool.map_batch("erp_address", [{"tags": '{"a": 1}'}])
+        generated = pool.map_batch(
+            "erp_address", ({"tags": "[]", "seen": datetime.date.min} for _ in range(2))
+        )
+    assert mapped == {"result": {"tags": []}}
+    assert parsed == {"result": {"tags": {"a": 1}}}
+    assert generated == [{"result": {"tags": []}}] * 2
+
+
+def test_unknown_transport():
+    with pytest.raises(TypeError, match="Unknown transport"):
+        MapperPool(transport="carrier_pigeon")
+
+
+def test_batch_results_keep_input_positions():
+    mapper = Mapper(
+        munchify(
+            {
+                "from_type": "erp_address",
+                "to_type": "Address",
+                "include_type": False,
+                "filter": {"us": {"field": "country", "value": "US"}},
+                "fields": {"city": {"input_paths": ["city"]}},
+            }
+        ),
+        {},
+    )
+    records = [
+        {"country": "FR", "city": "Paris"},
+        {"country": "US"},
+        {"country": "US", "city": "Austin"},
+    ]
+    results = batch_results(mapper, records)
+    assert results[0] == {"result": None}
+    assert results[1]["error"].startswith("ValueError")
+    assert results[2] == {"result": {"city": "Austin"}}
@@ -2,8 +2,14 @@ import pytest
 
 from munch import Munch, munchify
 
-from pystyx.functions import TomlFunction, parse_json
-from pystyx.parser import Parser, PreprocessParser, PostprocessParser, FieldsParser
+from pystyx.functions import FunctionRegistry, TomlFunction, parse_json, styx_function
+from pystyx.parser import (
+    FieldsParser,
+    FilterParser,
+    Parser,
+    PostprocessParser,
+    PreprocessParser,
+)
 from pystyx.shared import OnThrowValue
 
 
@@ -112,6 +118,49 @@ class TestFunctions:
             TomlFunction.parse_functions(functions_obj)
 
 
+    def test_pure_functions_are_tracked(self, monkeypatch):
+        monkeypatch.setattr(TomlFunction, "_functions", {})
+        monkeypatch.setattr(TomlFunction, "_metadata", {})
+
+        @styx_function(pure=True)
+        def pure_function(value):
+            return value
+
+        @styx_function
+        def impure_function(value):
+            return value
+
+        assert pure_function(1) == 1
+        assert TomlFunction.is_pure("pure_function")
+        assert not TomlFunction.is_pure("impure_function")
+
+
+    def test_registries_are_independent(self, preprocess_parser, preprocessor_obj):
+        tenant_a = FunctionRegistry()
+        tenant_b = FunctionRegistry()
+
+        @tenant_a.function(pure=True)
+        def parse_json(value):
+            return "a"
+
+        @tenant_b.function
+        def parse_json(value):
+            return "b"
+
+        assert tenant_a.is_pure("parse_json")
+        assert not tenant_b.is_pure("parse_json")
+        assert "parse_json" not in FunctionRegistry()
+
+        action_a = PreprocessParser(tenant_a).process_action(preprocessor_obj)
+        action_b = PreprocessParser(tenant_b).process_action(preprocessor_obj)
+        assert (action_a.function(None), action_b.function(None)) == ("a", "b")
+
+    def test_registry_duplicate_names_raise(self):
+        registry = FunctionRegistry({"parse_json": parse_json})
+        with pytest.raises(RuntimeError, match="Duplicate name"):
+            registry.register(parse_json)
+
+
 class TestPreprocess:
     def test_parses_input_paths_successfully(self, preprocess_parser, preprocessor_obj):
         parsed_obj = preprocess_parser.process_action(preprocessor_obj)
@@ -159,6 +208,27 @@ class TestPreprocess:
         with pytest.raises(TypeError):
             preprocess_parser.process_action(preprocessor_obj)
 
+    def test_function_arity_is_checked(
+        self, preprocess_parser, preprocessor_obj, TomlFunctionClass
+    ):
+        preprocessor_obj.input_paths = ["foo.bar", "foo.baz"]
+        with pytest.raises(TypeError, match="takes 1 argument"):
+            preprocess_parser.process_action(preprocessor_obj)
+
+    def test_async_function_runs_synchronously(
+        self, preprocess_parser, preprocessor_obj, monkeypatch
+    ):
+        monkeypatch.setattr(TomlFunction, "_functions", {})
+        monkeypatch.setattr(TomlFunction, "_metadata", {})
+
+        @styx_function
+        async def parse_json(value):
+            return value.upper()
+
+        assert TomlFunction.metadata("parse_json").asynchronous
+        parsed_obj = preprocess_parser.process_action(preprocessor_obj)
+        assert parsed_obj.function("foo") == "FOO"
+
     def test_on_throw_parses_valid_enums(self, preprocess_parser, preprocessor_obj):
         parsed_obj = preprocess_parser.process_action(preprocessor_obj)
         assert parsed_obj["on_throw"].value == OnThrowValue.Throw.value
@@ -172,6 +242,13 @@ class TestPreprocess:
         del preprocessor_obj.on_throw
         preprocess_parser.process_action(preprocessor_obj)
 
+    def test_missing_on_throw_defaults_to_throw(
+        self, preprocess_parser, preprocessor_obj
+    ):
+        del preprocessor_obj.on_throw
+        parsed_obj = preprocess_parser.process_action(preprocessor_obj)
+        assert parsed_obj["on_throw"] is OnThrowValue.Throw
+
     def test_on_throw_with_or_else_parses_or_else_successfully(
         self, preprocess_parser, preprocessor_obj
     ):
@@ -259,10 +336,98 @@ class TestFields:
         )
         with pytest.raises(
             TypeError,
-            match="Only declared types available for __type__ are: object, list. Found: baz",
+            match="Only declared types available for __type__ are: object, list, row. Found: baz",
         ):
             _from, _to, definition = parser.parse(obj)
 
+    def test_type_can_be_row(self, parser, field_input_obj):
+        obj = munchify(
+            {
+                "from_type": "foo",
+                "to_type": "bar",
+                "__type__": "row",
+                "fields": {"key": {"input_paths": ["path"]}},
+            }
+        )
+        _from, _to, definition = parser.parse(obj)
+        assert definition.__type__ == "row"
+        assert definition.row_class._fields == ("key",)
+
+    def test_row_type_requires_identifier_field_names(self, parser, field_input_obj):
+        obj = munchify(
+            {
+                "from_type": "foo",
+                "to_type": "bar",
+                "__type__": "row",
+                "fields": {"key.nested": {"input_paths": ["path"]}},
+            }
+        )
+        with pytest.raises(TypeError, match="must be valid identifiers"):
+            parser.parse(obj)
+
+    def test_output_schema_is_derived_for_objects(self, parser, field_input_obj):
+        obj = munchify(
+            {
+                "from_type": "foo",
+                "to_type": "bar",
+                "fields": {
+                    "key": {"input_paths": ["path"]},
+                    "nested.key": {"input_paths": ["path"]},
+                    "items[0]": {"input_paths": ["path"]},
+                },
+            }
+        )
+        _from, _to, definition = parser.parse(obj)
+        assert definition.output_schema == [
+            ("key", (), "key"),
+            ("nested.key", ("nested",), "key"),
+            ("items[0]", None, "items[0]"),
+        ]
+
+    def test_shared_path_prefixes_are_planned(self, parser):
+        parsed_obj = parser.parse(
+            munchify(
+                {
+                    "from_type": "erp_customer",
+                    "to_type": "Customer",
+                    "fields": {
+                        "city": {"input_paths": ["customer.billing.address.city"]},
+                        "zip": {"input_paths": ["customer.billing.address.zip"]},
+                        "name": {"input_paths": ["customer.name"]},
+                        "id": {"input_paths": ["id"]},
+                        "country": {"input_paths": ["const('US')"]},
+                    },
+                }
+            )
+        )[2]
+        assert parsed_obj.path_plan == [
+            ("customer", None, ("customer",)),
+            ("customer.name", "customer", ("name",)),
+            ("customer.billing.address", "customer", ("billing", "address")),
+            (
+                "customer.billing.address.city",
+                "customer.billing.address",
+                ("city",),
+            ),
+            ("customer.billing.address.zip", "customer.billing.address", ("zip",)),
+        ]
+
+    def test_match_is_parsed(self, parser, field_input_obj):
+        toml_obj = munchify(
+            {
+                "from_type": "foo",
+                "to_type": "bar",
+                "match": {"path": "kind", "value": "foo"},
+                "fields": {"foo": field_input_obj},
+            }
+        )
+        parsed_obj = parser.parse(toml_obj)[2]
+        assert parsed_obj.match == {"path": "kind", "values": ["foo"]}
+
+        toml_obj.match = {"path": "kind", "value": "foo", "values": ["foo"]}
+        with pytest.raises(TypeError, match="either 'value' or 'values'"):
+            parser.parse(toml_obj)
+
     def test_fields_is_required(self, parser, field_input_obj):
         obj = munchify({"from_type": "foo", "to_type": "bar"})
         with pytest.raises(TypeError, match="'fields' is a required field"):
@@ -407,10 +572,96 @@ class TestFields:
         with pytest.raises(TypeError, match="'input_paths' must be of length 1"):
             fields_parser.parse_field(field_input_obj)
 
-    def test_extended_field_keys_get_copied_to_private_field_copy_fields(
+    def test_mapping_compiles_to_dict_with_resolved_default(
         self, fields_parser, field_input_obj
     ):
-        pass
+        field_input_obj.mapping = {"a": "Alpha", "__default__": "Unknown"}
+        parsed_obj = fields_parser.parse_field(field_input_obj)
+        assert type(parsed_obj.mapping) is dict
+        assert parsed_obj.mapping_default == "Unknown"
+
+    def test_mapping_key_type_coerces_keys(self, fields_parser, field_input_obj):
+        field_input_obj.mapping = {"1": "one", "2": "two", "__default__": "many"}
+        field_input_obj.mapping_key_type = "int"
+        parsed_obj = fields_parser.parse_field(field_input_obj)
+        assert parsed_obj.mapping[1] == "one"
+        assert parsed_obj.mapping_default == "many"
+
+    def test_mapping_key_type_invalid_key_raises(self, fields_parser, field_input_obj):
+        field_input_obj.mapping = {"one": "one"}
+        field_input_obj.mapping_key_type = "int"
+        with pytest.raises(TypeError, match="Unable to coerce 'mapping' keys to int"):
+            fields_parser.parse_field(field_input_obj)
+
+    def test_unknown_mapping_key_type_raises(self, fields_parser, field_input_obj):
+        field_input_obj.mapping = {"1": "one"}
+        field_input_obj.mapping_key_type = "decimal"
+        with pytest.raises(TypeError, match="Unknown 'mapping_key_type' given"):
+            fields_parser.parse_field(field_input_obj)
+
+    def test_mapping_file_is_loaded_once_and_merged(
+        self, fields_parser, field_input_obj, tmp_path
+    ):
+        lookup = tmp_path / "countries.csv"
+        lookup.write_text("code,name\nUS,United States\nGR,Greece\n")
+        field_input_obj.mapping_file = str(lookup)
+        first = fields_parser.parse_field(field_input_obj).mapping
+        second = fields_parser.parse_field(field_input_obj).mapping
+        assert first is second
+        assert first["GR"] == "Greece"
+
+        field_input_obj.mapping = {"GR": "Hellas"}
+        merged = fields_parser.parse_field(field_input_obj).mapping
+        assert merged["GR"] == "Hellas"
+        assert merged["US"] == "United States"
+        assert first["GR"] == "Greece"
+
+    def test_missing_mapping_file_raises(self, fields_parser, field_input_obj):
+        field_input_obj.mapping_file = "does/not/exist.json"
+        with pytest.raises(TypeError, match="Lookup file not found"):
+            fields_parser.parse_field(field_input_obj)
+
+    def test_extended_field_keys_get_copied_to_private_field_copy_fields(
+        self, fields_parser
+    ):
+        field = munchify(
+            {
+                "input_paths": ["address"],
+                "from_type": "erp_address",
+                "address": {"country": "const('US')", "customer_id": "id"},
+            }
+        )
+        field_obj = fields_parser.parse_extra_fields("address", field, Munch())
+        assert field_obj._copy_fields == ["country", "customer_id"]
+        assert field_obj._copy_constants == {"country": "US"}
+        assert field_obj._copy_paths == [("customer_id", "id")]
+
+    def test_constant_fields_are_folded(self, fields_parser, TomlFunctionClass):
+        field = munchify(
+            {"input_paths": ["const('US')"], "mapping": {"US": "United States"}}
+        )
+        assert fields_parser.parse_field(field)._constant == "United States"
+
+        field = munchify({"input_paths": ["const('1')"], "function": "parse_json"})
+        assert fields_parser.parse_field(field)._constant == 1
+
+    def test_constant_fields_with_impure_or_mutable_results_are_not_folded(
+        self, fields_parser, monkeypatch
+    ):
+        monkeypatch.setattr(TomlFunction, "_functions", {})
+        monkeypatch.setattr(TomlFunction, "_metadata", {})
+
+        @styx_function
+        def impure(value):
+            return value
+
+        @styx_function(pure=True)
+        def pure_dict(value):
+            return {"value": value}
+
+        for function in ("impure", "pure_dict"):
+            field = munchify({"input_paths": ["const('a')"], "function": function})
+            assert "_constant" not in fields_parser.parse_field(field)
 
 
 class TestPostprocess:
@@ -496,3 +747,53 @@ class TestPostprocess:
     def test_optional_or_else_skips(self, postprocess_parser, postprocessor_obj):
         del postprocessor_obj.or_else
         postprocess_parser.process_action(postprocessor_obj)
+
+
+class TestFilter:
+    def test_parses_field_predicates(self):
+        parsed_obj = FilterParser().parse(
+            munchify(
+                {
+                    "active": {"field": "status", "value": "active"},
+                    "region": {"field": "region", "values": ["EU", "US"]},
+                }
+            )
+        )
+        assert list(parsed_obj) == ["active", "region"]
+        assert parsed_obj.active == {"field": "status", "values": ["active"]}
+        assert parsed_obj.region["values"] == ["EU", "US"]
+
+    def test_parses_function_predicates(self):
+        parsed_obj = FilterParser().parse(
+            munchify({"valid": {"function": "parse_json", "input_paths": ["raw"]}})
+        )
+        assert parsed_obj.valid.function is parse_json
+        assert parsed_obj.valid.input_paths == ["raw"]
+
+    @pytest.mark.parametrize(
+        "predicate, message",
+        [
+            ({"value": 1}, "either 'field' or 'function'"),
+            ({"field": "a", "function": "parse_json"}, "either 'field' or 'function'"),
+            ({"field": "a"}, "either 'value' or 'values'"),
+            ({"field": "a", "values": []}, "non-empty list"),
+            ({"function": "parse_json"}, "input_paths must be a list of strings"),
+            ({"function": "unknown", "input_paths": ["a"]}, "unknown function"),
+            ({"function": "parse_json", "input_paths": []}, "takes 1 argument"),
+        ],
+    )
+    def test_invalid_predicates_raise(self, predicate, message):
+        with pytest.raises(TypeError, match=message):
+            FilterParser().parse(munchify({"check": predicate}))
+
+    def test_parser_parses_filter_section(self, parser):
+        toml_obj = munchify(
+            {
+                "from_type": "erp_order",
+                "to_type": "Order",
+                "filter": {"active": {"field": "status", "value": "active"}},
+                "fields": {"id": {"input_paths": ["id"]}},
+            }
+        )
+        (_from_type, _to_type, parsed_obj) = parser.parse(toml_obj)
+        assert parsed_obj.filter.active.field == "status"
@@ -0,0 +1,143 @@
+import pytest
+
+from munch import munchify
+
+from pystyx.functions import TomlFunction, styx_function
+from pystyx.mapper import Mapper
+from pystyx.pipelines import pipeline
+
+
+def raw_order_map():
+    return munchify(
+        {
+            "from_type": "raw_order",
+            "to_type": "order",
+            "include_type": False,
+            "fields": {
+                "id": {"input_paths": ["orderId"]},
+                "customer.name": {"input_paths": ["buyer.fullName"]},
+                "customer.city": {"input_paths": ["buyer.address.city"]},
+                "note": {"input_paths": ["note"], "on_throw": "skip"},
+                "total": {
+                    "input_paths": ["amount"],
+                    "function": "count_call",
+                    "on_throw": "skip",
+                },
+            },
+        }
+    )
+
+
+def order_map(**fields):
+    return munchify(
+        {
+            "from_type": "order",
+            "to_type": "WarehouseOrder",
+            "fields": {
+                "order_id": {"input_paths": ["id"]},
+                "ship_to": {"input_paths": ["customer.city"]},
+                "customer": {"input_paths": ["customer"]},
+                "note": {"input_paths": ["note"], "on_throw": "skip"},
+                **fields,
+            },
+        }
+    )
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    monkeypatch.setattr(TomlFunction, "_functions", {})
+    monkeypatch.setattr(TomlFunction, "_metadata", {})
+    calls = []
+
+    @styx_function
+    def count_call(value):
+        calls.append(value)
+        return value
+
+    return calls
+
+
+@pytest.fixture
+def record():
+    return {
+        "orderId": 7,
+        "amount": 10,
+        "buyer": {"fullName": "Hera", "address": {"city": "Athens"}},
+    }
+
+
+def maps(*toml_maps):
+    mappers = [Mapper(toml_map, {}) for toml_map in toml_maps]
+    return {mapper.from_type: mapper for mapper in mappers}
+
+
+class TestPipeline:
+    def test_fused_pipeline_matches_sequential_mapping(self, calls, record):
+        orders = pipeline(maps(raw_order_map(), order_map()), ["raw_order", "order"])
+        assert orders.fused
+        order = maps(raw_order_map())["raw_order"](record)
+        expected = maps(order_map())["order"](order)
+        assert orders(record) == expected
+        assert expected["customer"] == {"name": "Hera", "city": "Athens"}
+
+    def test_unread_fields_are_not_evaluated(self, calls, record):
+        orders = pipeline(maps(raw_order_map(), order_map()), ["raw_order", "order"])
+        orders(record)
+        assert calls == []
+
+        orders = pipeline(
+            maps(raw_order_map(), order_map(total={"input_paths": ["total"]})),
+            ["raw_order", "order"],
+        )
+        assert orders(record)["total"] == 10
+        assert calls == [10]
+
+    @pytest.mark.parametrize("fused", [True, False])
+    def test_unread_fields_still_reject_records(self, calls, record, fused):
+        raw_order = raw_order_map()
+        raw_order.fields["must"] = munchify({"input_paths": ["required"]})
+        mappers = maps(raw_order, order_map())
+        orders = pipeline(mappers, ["raw_order", "order"])
+        assert orders.fused
+        orders.fused = fused
+        assert orders({**record, "required": 1})["order_id"] == 7
+        with pytest.raises(ValueError, match="No value found for path"):
+            orders(record)
+        with pytest.raises(ValueError, match="No value found for path"):
+            mappers["order"](mappers["raw_order"](record))
+
+    def test_unfusable_stages_run_sequentially(self, calls, record):
+        order = order_map()
+        order.preprocess = munchify(
+            {
+                "01_copy": {
+                    "input_paths": ["."],
+                    "output_path": ".",
+                    "function": "count_call",
+                }
+            }
+        )
+        orders = pipeline(maps(raw_order_map(), order), ["raw_order", "order"])
+        assert not orders.fused
+        assert "preprocess" in orders.blocker
+        assert orders(record)["ship_to"] == "Athens"
+
+    def test_unknown_from_type_raises(self, calls):
+        with pytest.raises(TypeError, match="Unknown from_type in pipeline: nope"):
+            pipeline(maps(raw_order_map()), ["raw_order", "nope"])
+
+    @pytest.mark.parametrize("filtered_stage", [0, 1])
+    def test_rejected_records_leave_the_pipeline(self, calls, record, filtered_stage):
+        toml_maps = [raw_order_map(), order_map()]
+        toml_maps[filtered_stage].filter = munchify(
+            {"athens": {"field": "buyer.address.city", "value": "Athens"}}
+            if filtered_stage == 0
+            else {"athens": {"field": "customer.city", "value": "Athens"}}
+        )
+        orders = pipeline(maps(*toml_maps), ["raw_order", "order"])
+        assert orders.fused == (filtered_stage == 0)
+        buyer = {"fullName": "Io", "address": {"city": "Argos"}}
+        elsewhere = {**record, "buyer": buyer}
+        assert orders(elsewhere) is None
+        assert [order["order_id"] for order in orders.batch([elsewhere, record])] == [7]
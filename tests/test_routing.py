@@ -0,0 +1,118 @@
+import pytest
+
+from munch import munchify
+
+from pystyx.errors import TooManyErrors
+from pystyx.mapper import Mapper
+from pystyx.routing import Router
+
+
+def event_map(from_type, field, match=None):
+    toml_map = {
+        "from_type": from_type,
+        "to_type": from_type.title(),
+        "include_type": False,
+        "fields": {field: {"input_paths": [field]}},
+    }
+    if match:
+        toml_map["match"] = match
+    return munchify(toml_map)
+
+
+@pytest.fixture
+def maps():
+    mappers = [
+        Mapper(event_map("order", "sku"), {}),
+        Mapper(event_map("refund", "amount"), {}),
+        Mapper(
+            event_map(
+                "login",
+                "user",
+                match={"path": "meta.event", "values": ["login", "sso_login"]},
+            ),
+            {},
+        ),
+    ]
+    return {mapper.from_type: mapper for mapper in mappers}
+
+
+class TestRouter:
+    def test_routes_by_discriminator_and_match_rules(self, maps):
+        router = Router(maps, discriminator="kind")
+        assert router({"kind": "order", "sku": "a"}) == {"sku": "a"}
+        assert router({"meta": {"event": "sso_login"}, "user": "hera"}) == {
+            "user": "hera"
+        }
+        assert router.route({"kind": "login"}) is None
+        with pytest.raises(ValueError, match="No Mapper matches record"):
+            router({"kind": "unknown"})
+
+    def test_default_mapper(self, maps):
+        router = Router(maps, discriminator="kind", default="order")
+        assert router.route({"sku": "a"}) is maps["order"]
+
+    def test_conflicting_rules_raise(self, maps):
+        match = munchify({"path": "kind", "values": ["order"]})
+        maps["refund"].definition.match = match
+        with pytest.raises(TypeError, match="matches both order and refund"):
+            Router(maps, discriminator="kind")
+
+    def test_batch_groups_records_and_keeps_order(self, maps, monkeypatch):
+        router = Router(maps, discriminator="kind")
+        runs = []
+        for mapper in maps.values():
+            batch_each = mapper.batch_each
+
+            def record_run(records, *args, mapper=mapper, run=batch_each, **kwargs):
+                runs.append((mapper.from_type, len(records)))
+                return run(records, *args, **kwargs)
+
+            monkeypatch.setattr(mapper, "batch_each", record_run)
+
+        records = [
+            {"kind": "order", "sku": "a"},
+            {"kind": "refund", "amount": 1},
+            {"kind": "order", "sku": "b"},
+        ]
+        assert router.batch(records) == [{"sku": "a"}, {"amount": 1}, {"sku": "b"}]
+        assert runs == [("order", 2), ("refund", 1)]
+
+    def test_batch_reports_errors_with_input_indexes(self, maps):
+        router = Router(maps, discriminator="kind")
+        records = [
+            {"kind": "order", "sku": "a"},
+            {"kind": "nope"},
+            {"kind": "order"},
+            {"kind": "order", "sku": "c"},
+        ]
+        errors = []
+        assert router.batch(records, errors=errors) == [{"sku": "a"}, {"sku": "c"}]
+        assert sorted(error.index for error in errors) == [1, 2]
+
+        with pytest.raises(TooManyErrors) as exc_info:
+            router.batch(records, errors=[], max_errors=1)
+        assert sorted(error.index for error in exc_info.value.errors) == [1, 2]
+
+        with pytest.raises(TooManyErrors) as exc_info:
+            router.batch(records[1:], errors=[], max_errors=1)
+        assert sorted(error.index for error in exc_info.value.errors) == [0, 1]
+
+    def test_batch_reports_rejected_records_with_input_indexes(self, maps):
+        maps["order"] = Mapper(
+            munchify(
+                {
+                    **event_map("order", "sku"),
+                    "filter": {"in_stock": {"field": "stock", "value": True}},
+                }
+            ),
+            {},
+        )
+        router = Router(maps, discriminator="kind")
+        records = [
+            {"kind": "order", "sku": "a", "stock": False},
+            {"kind": "refund", "amount": 1},
+            {"kind": "order", "sku": "b", "stock": True},
+        ]
+        rejected = []
+        assert router.batch(records, rejected=rejected) == [{"amount": 1}, {"sku": "b"}]
+        assert rejected == [0]
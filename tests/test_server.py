@@ -0,0 +1,150 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from munch import munchify
+
+from pystyx.functions import TomlFunction, styx_function
+from pystyx.mapper import Mapper
+from pystyx.server import MappingServer
+
+
+def address_mapper():
+    toml_map = {
+        "from_type": "erp_address",
+        "to_type": "Address",
+        "include_type": False,
+        "fields": {
+            "city": {"input_paths": ["city"]},
+            "tags": {"input_paths": ["tags"], "function": "parse_json"},
+        },
+    }
+    return Mapper(munchify(toml_map), {})
+
+
+async def exchange(server, socket_path, lines):
+    listener = await server.start(socket_path=str(socket_path))
+    async with listener:
+        (reader, writer) = await asyncio.open_unix_connection(str(socket_path))
+        for line in lines:
+            writer.write(line.encode("utf-8") + b"\n")
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in lines]
+        writer.close()
+    return sorted(responses, key=lambda response: str(response["id"]))
+
+
+def request(request_id, from_type, record):
+    return json.dumps({"id": request_id, "from_type": from_type, "record": record})
+
+
+class TestMappingServer:
+    def test_concurrent_requests_share_a_batch(self, tmp_path):
+        server = MappingServer(maps={"erp_address": address_mapper()}, window=0.05)
+        lines = [
+            request(1, "erp_address", {"city": "Austin", "tags": "[]"}),
+            request(2, "erp_address", {"city": "Boston", "tags": "[1]"}),
+        ]
+        responses = asyncio.run(exchange(server, tmp_path / "styx.sock", lines))
+        assert responses == [
+            {"id": 1, "result": {"city": "Austin", "tags": []}},
+            {"id": 2, "result": {"city": "Boston", "tags": [1]}},
+        ]
+        assert server.batches == 1
+
+    def test_max_batch_flushes_early(self, tmp_path):
+        server = MappingServer(
+            maps={"erp_address": address_mapper()}, window=10, max_batch=2
+        )
+        lines = [
+            request(i, "erp_address", {"city": str(i), "tags": "[]"}) for i in range(4)
+        ]
+        responses = asyncio.run(exchange(server, tmp_path / "styx.sock", lines))
+        assert [response["result"]["city"] for response in responses] == list("0123")
+        assert server.batches == 2
+
+    def test_errors_are_returned_per_request(self, tmp_path):
+        server = MappingServer(maps={"erp_address": address_mapper()}, window=0.01)
+        lines = [
+            request(1, "erp_address", {"city": "Austin", "tags": "[]"}),
+            request(2, "erp_address", {"city": "Boston", "tags": "[1"}),
+            request(3, "erp_invoice", {}),
+            '{"id": 4}',
+            "not json",
+        ]
+        responses = asyncio.run(exchange(server, tmp_path / "styx.sock", lines))
+        by_id = {response["id"]: response for response in responses}
+        assert by_id[1] == {"id": 1, "result": {"city": "Austin", "tags": []}}
+        assert by_id[2]["error"].startswith("JSONDecodeError")
+        assert by_id[3] == {"id": 3, "error": "Unknown from_type: erp_invoice"}
+        assert by_id[4]["error"].startswith("Malformed request")
+        assert by_id[None]["error"].startswith("Malformed request")
+
+    def test_needs_maps_or_pool(self):
+        with pytest.raises(TypeError):
+            MappingServer()
+
+    def test_async_functions_run_outside_the_event_loop(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(TomlFunction, "_functions", {})
+        monkeypatch.setattr(TomlFunction, "_metadata", {})
+
+        @styx_function
+        async def shout(value):
+            await asyncio.sleep(0)
+            return value.upper()
+
+        toml_map = {
+            "from_type": "erp_address",
+            "to_type": "Address",
+            "include_type": False,
+            "fields": {"city": {"input_paths": ["city"], "function": "shout"}},
+        }
+        server = MappingServer(maps={"erp_address": Mapper(munchify(toml_map), {})})
+        lines = [request(1, "erp_address", {"city": "Austin"})]
+        responses = asyncio.run(exchange(server, tmp_path / "styx.sock", lines))
+        assert responses == [{"id": 1, "result": {"city": "AUSTIN"}}]
+
+    def test_overlong_lines_are_answered_with_an_error(self, tmp_path):
+        server = MappingServer(
+            maps={"erp_address": address_mapper()}, window=0.01, line_limit=1024
+        )
+        lines = [
+            request(1, "erp_address", {"city": "x" * 4096, "tags": "[]"}),
+            request(2, "erp_address", {"city": "Austin", "tags": "[]"}),
+        ]
+        responses = asyncio.run(exchange(server, tmp_path / "styx.sock", lines))
+        assert responses == [
+            {"id": 2, "result": {"city": "Austin", "tags": []}},
+            {"id": None, "error": "Request line longer than 1024 bytes"},
+        ]
+
+    def test_in_process_batches_do_not_overlap(self, tmp_path, monkeypatch):
+        (lock, active, overlaps) = (threading.Lock(), [], [])
+
+        def slow(value):
+            with lock:
+                active.append(value)
+                overlaps.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(value)
+            return value
+
+        monkeypatch.setattr(TomlFunction, "_functions", {"slow": slow})
+        toml_map = {
+            "from_type": "erp_address",
+            "to_type": "Address",
+            "include_type": False,
+            "fields": {"city": {"input_paths": ["city"], "function": "slow"}},
+        }
+        server = MappingServer(
+            maps={"erp_address": Mapper(munchify(toml_map), {})}, max_batch=1
+        )
+        lines = [request(i, "erp_address", {"city": str(i)}) for i in range(4)]
+        responses = asyncio.run(exchange(server, tmp_path / "styx.sock", lines))
+        server.close()
+        assert [response["result"]["city"] for response in responses] == list("0123")
+        assert max(overlaps) == 1
@@ -0,0 +1,17 @@
+from munch import munchify
+from pydash import get, set_
+
+from pystyx.shared import get_path, set_path
+
+
+class TestPaths:
+    def test_get_path_matches_pydash(self):
+        obj = munchify({"a": {"b": [{"c": 1}], "n": None}, "0": "zero"})
+        for path in ["a.b", "a.n", "a.b.0.c", "a.b[0].c", "a.x", "a.n.x", "0", "."]:
+            assert get_path(obj, path, "default") == get(obj, path, "default")
+
+    def test_set_path_matches_pydash(self):
+        for path in ["a", "a.b.c", "a.n.x", "a.l.0", "a.l[1]"]:
+            obj = {"a": {"n": None, "v": 1, "l": [0, 1]}}
+            expected = {"a": {"n": None, "v": 1, "l": [0, 1]}}
+            assert set_path(obj, path, 2) == set_(expected, path, 2)
@@ -0,0 +1,177 @@
+import pytest
+
+from munch import munchify
+
+from pystyx import sinks
+from pystyx.mapper import Mapper
+from pystyx.sinks import (
+    ColumnarSink,
+    ParquetSink,
+    flatten_record,
+    observed_type,
+)
+
+
+@pytest.fixture
+def pure_python(monkeypatch):
+    monkeypatch.setattr(sinks, "pyarrow", None)
+    monkeypatch.setattr(sinks, "numpy", None)
+
+
+@pytest.fixture
+def mapper():
+    return Mapper(
+        munchify(
+            {
+                "from_type": "erp_order",
+                "to_type": "Order",
+                "include_type": False,
+                "fields": {
+                    "id": {"input_paths": ["id"]},
+                    "total": {"input_paths": ["total"], "on_throw": "skip"},
+                    "address.city": {"input_paths": ["city"], "on_throw": "skip"},
+                },
+            }
+        ),
+        {},
+    )
+
+
+class TestColumnarSink:
+    def test_flatten_record_uses_dotted_names(self):
+        record = {"id": 1, "address": {"city": "Dallas"}, "lines": [1, 2]}
+        assert flatten_record(record) == {
+            "id": 1,
+            "address.city": "Dallas",
+            "lines": [1, 2],
+        }
+
+    def test_observed_type_widens_int_to_float(self):
+        assert observed_type({int}) == "int"
+        assert observed_type({int, float}) == "float"
+        assert observed_type({bool}) == "bool"
+        assert observed_type({int, str}) == "mixed"
+        assert observed_type({bool, int}) == "mixed"
+        assert observed_type({int, list}) == "object"
+        assert observed_type({dict}) == "object"
+
+    def test_failed_flush_drops_the_row_group(self, mapper, pure_python, monkeypatch):
+        sink = ColumnarSink(mapper, row_group_size=2)
+        sink.write({"id": 1})
+        monkeypatch.setattr(sink, "build_row_group", lambda: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            sink.write({"id": 2})
+        monkeypatch.undo()
+        sink.write({"id": 3})
+        assert sink.num_rows == 1
+        assert sink.flush() == {"id": [3]}
+
+    def test_buffers_columns_and_pads_missing_values(self, mapper, pure_python):
+        sink = ColumnarSink(mapper)
+        sink.write({"id": 1, "total": 2.5})
+        sink.write({"id": 2, "city": "Dallas"})
+        row_group = sink.flush()
+        assert row_group == {
+            "id": [1, 2],
+            "total": [2.5, None],
+            "address.city": [None, "Dallas"],
+        }
+        assert sink.num_rows == 0
+
+    def test_flushes_every_row_group(self, mapper, pure_python):
+        row_groups = []
+        with ColumnarSink(mapper, row_group_size=2, on_flush=row_groups.append) as sink:
+            sink.write_many({"id": i} for i in range(5))
+        assert [row_group["id"] for row_group in row_groups] == [[0, 1], [2, 3], [4]]
+
+    def test_struct_columns_when_not_flattened(self, mapper, pure_python):
+        sink = ColumnarSink(mapper, flatten=False)
+        sink.write({"id": 1, "city": "Dallas"})
+        assert sink.flush()["address"] == [{"city": "Dallas"}]
+
+    def test_columns_and_types_carry_over_row_groups(self, mapper, pure_python):
+        row_groups = []
+        with ColumnarSink(mapper, row_group_size=2, on_flush=row_groups.append) as sink:
+            sink.write_many(
+                [{"id": 1, "total": 2, "city": "Dallas"}, {"id": 2}, {"id": 3}]
+            )
+            sink.write({"id": 4, "total": 2.5})
+        assert row_groups[1] == {
+            "id": [3, 4],
+            "total": [None, 2.5],
+            "address.city": [None, None],
+        }
+        assert sink.column_types()["total"] == "float"
+
+    def test_numpy_row_groups_keep_columns_and_widen(self, mapper, monkeypatch):
+        numpy = pytest.importorskip("numpy")
+        monkeypatch.setattr(sinks, "pyarrow", None)
+        monkeypatch.setattr(sinks, "numpy", numpy)
+        row_groups = []
+        with ColumnarSink(mapper, row_group_size=1, on_flush=row_groups.append) as sink:
+            sink.write({"id": 1, "total": 1.5, "city": "Dallas"})
+            sink.write({"id": 2, "total": 2})
+        assert list(row_groups[1]) == ["id", "total", "address.city"]
+        assert row_groups[1]["total"].dtype == numpy.float64
+
+
+class TestParquetSink:
+    @pytest.fixture
+    def pyarrow(self, monkeypatch):
+        pyarrow = pytest.importorskip("pyarrow")
+        pytest.importorskip("pyarrow.parquet")
+        monkeypatch.setattr(sinks, "pyarrow", pyarrow)
+        return pyarrow
+
+    def test_arrow_row_groups_keep_their_schema(self, mapper, pyarrow):
+        row_groups = []
+        with ColumnarSink(mapper, row_group_size=1, on_flush=row_groups.append) as sink:
+            sink.write({"id": 1, "total": 1.5, "city": "Dallas"})
+            sink.write({"id": 2, "total": 2})
+        assert row_groups[1].schema.equals(row_groups[0].schema)
+
+    def test_mixed_scalar_columns_become_strings(self, mapper, pyarrow):
+        sink = ColumnarSink(mapper)
+        sink.write({"id": 1, "total": 2})
+        sink.write({"id": 2, "total": "unknown"})
+        table = sink.flush()
+        assert table.schema.field("total").type == pyarrow.string()
+        assert table.column("total").to_pylist() == ["2", "unknown"]
+
+    def test_unconvertible_column_is_named(self, mapper, pyarrow):
+        sink = ColumnarSink(mapper)
+        sink.write({"id": 2**64})
+        with pytest.raises(TypeError, match="'id'"):
+            sink.flush()
+        assert sink.num_rows == 0
+
+    def test_later_row_groups_are_cast_to_the_file_schema(
+        self, mapper, pyarrow, tmp_path
+    ):
+        schema = pyarrow.schema(
+            [
+                ("id", pyarrow.int64()),
+                ("total", pyarrow.float64()),
+                ("address.city", pyarrow.string()),
+            ]
+        )
+        path = tmp_path / "orders.parquet"
+        with ParquetSink(mapper, path, row_group_size=1, schema=schema) as sink:
+            sink.write({"id": 1})
+            sink.write({"id": 2, "total": 3, "city": "Dallas"})
+        table = pyarrow.parquet.read_table(path)
+        assert table.schema.equals(schema)
+        assert table.to_pydict() == {
+            "id": [1, 2],
+            "total": [None, 3.0],
+            "address.city": [None, "Dallas"],
+        }
+
+    def test_row_group_that_does_not_fit_the_file_schema(
+        self, mapper, pyarrow, tmp_path
+    ):
+        path = tmp_path / "orders.parquet"
+        with pytest.raises(TypeError, match="schema"):
+            with ParquetSink(mapper, path, row_group_size=1) as sink:
+                sink.write({"id": 1, "total": 1})
+                sink.write({"id": 2, "total": 2.5})
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from munch import munchify
+
+from pystyx.mapper import Mapper
+from pystyx.tracing import Tracer
+
+
+@pytest.fixture
+def mapper():
+    return Mapper(
+        munchify(
+            {
+                "from_type": "erp_address",
+                "to_type": "Address",
+                "include_type": False,
+                "fields": {
+                    "city": {"input_paths": ["city"]},
+                    "zip": {
+                        "input_paths": ["postalCode"],
+                        "on_throw": "or_else",
+                        "or_else": "00000",
+                    },
+                    "country": {"input_paths": ["const('US')"]},
+                },
+            }
+        ),
+        {},
+    )
+
+
+class TestTracer:
+    def test_samples_one_in_n_records(self, mapper):
+        tracer = Tracer(sample_rate=3)
+        mapper.set_tracer(tracer)
+        for i in range(7):
+            mapper({"city": f"city {i}"})
+        assert [trace["fields"][0]["values"] for trace in tracer.traces] == [
+            ["city 2"],
+            ["city 5"],
+        ]
+
+    def test_traced_records_map_the_same(self, mapper):
+        expected = mapper({"city": "Dallas"})
+        mapper.set_tracer(Tracer(sample_rate=1))
+        assert mapper({"city": "Dallas"}) == expected
+
+    def test_records_field_outcomes(self, mapper):
+        tracer = Tracer(sample_rate=1)
+        mapper.set_tracer(tracer)
+        mapper({"city": "Dallas"})
+        (trace,) = tracer.traces
+        assert trace["from_type"] == "erp_address"
+        city, zip_, country = trace["fields"]
+        assert city["outcome"] == "ok"
+        assert city["input_paths"] == ["city"]
+        assert zip_["outcome"] == "or_else"
+        assert zip_["values"] == [None]
+        assert country["values"] == ["US"]
+        assert city["elapsed_ms"] >= 0
+
+    def test_throw_outcome_is_recorded_before_raising(self, mapper):
+        tracer = Tracer(sample_rate=1)
+        mapper.set_tracer(tracer)
+        with pytest.raises(ValueError):
+            mapper({})
+        assert tracer.traces[0]["fields"][0]["outcome"] == "throw"
+
+    def test_ring_buffer_is_bounded_and_written_to_jsonl(self, mapper, tmp_path):
+        path = tmp_path / "trace.jsonl"
+        with Tracer(sample_rate=1, capacity=2, path=str(path)) as tracer:
+            mapper.set_tracer(tracer)
+            for i in range(3):
+                mapper({"city": str(i)})
+        assert len(tracer.traces) == 2
+        lines = path.read_text().splitlines()
+        assert [json.loads(line)["fields"][0]["values"] for line in lines] == [
+            ["0"],
+            ["1"],
+            ["2"],
+        ]